@@ -0,0 +1,111 @@
+"""Tareas de mantenimiento de la base de datos y el almacenamiento.
+
+Uso: python -m app.cli <comando>
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.indexes import ensure_indexes, index_report
+from app.services.blob_service import BlobService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_service import FolderService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.search_service import SearchService
+from app.services.trash_service import TrashService
+from app.services.usage_service import UsageService
+
+
+async def _migrate_blobs(args):
+    return await BlobService.migrate_legacy_objects(limit=args.limit)
+
+
+async def _collect_blobs(args):
+    return await BlobService.collect_garbage()
+
+
+async def _purge_trash(args):
+    return await TrashService.collect()
+
+
+async def _ensure_indexes(args):
+    return await ensure_indexes()
+
+
+async def _index_report(args):
+    return await index_report()
+
+
+async def _backfill_ancestors(args):
+    return await FolderService.backfill_ancestors()
+
+
+async def _rebuild_folder_stats(args):
+    return await FolderStatsService.rebuild()
+
+
+async def _rebuild_folder_rollups(args):
+    return await FolderRollupService.rebuild()
+
+
+async def _backfill_search(args):
+    return await SearchService.backfill()
+
+
+async def _reconcile_usage(args):
+    return await UsageService.reconcile()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Tareas de mantenimiento")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser(
+        "migrate-blobs", help="Re-indexa por hash de contenido los objetos anteriores a la deduplicación"
+    )
+    migrate.add_argument("--limit", type=int, default=None, help="Número máximo de objetos a migrar")
+    migrate.set_defaults(handler=_migrate_blobs)
+
+    collect = subparsers.add_parser("collect-blobs", help="Elimina del almacenamiento los blobs sin referencias")
+    collect.set_defaults(handler=_collect_blobs)
+
+    trash = subparsers.add_parser("purge-trash", help="Elimina definitivamente los archivos vencidos de la papelera")
+    trash.set_defaults(handler=_purge_trash)
+
+    indexes = subparsers.add_parser("ensure-indexes", help="Crea los índices declarados que falten")
+    indexes.set_defaults(handler=_ensure_indexes)
+
+    report = subparsers.add_parser("index-report", help="Muestra índices que faltan, no declarados o sin uso")
+    report.set_defaults(handler=_index_report)
+
+    ancestors = subparsers.add_parser(
+        "backfill-ancestors", help="Calcula rutas y ancestros de carpetas y archivos existentes"
+    )
+    ancestors.set_defaults(handler=_backfill_ancestors)
+
+    stats = subparsers.add_parser("rebuild-folder-stats", help="Recalcula los contadores de elementos por carpeta")
+    stats.set_defaults(handler=_rebuild_folder_stats)
+
+    rollups = subparsers.add_parser(
+        "rebuild-folder-rollups", help="Recalcula el tamaño y los elementos del subárbol de cada carpeta"
+    )
+    rollups.set_defaults(handler=_rebuild_folder_rollups)
+
+    search = subparsers.add_parser("backfill-search", help="Calcula los campos de búsqueda de archivos existentes")
+    search.set_defaults(handler=_backfill_search)
+
+    usage = subparsers.add_parser("reconcile-usage", help="Recalcula el uso de almacenamiento de cada usuario")
+    usage.set_defaults(handler=_reconcile_usage)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = asyncio.run(args.handler(args))
+    print(json.dumps(result, indent=2, default=str, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,43 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "mongodb://mongodb:27017")
     DATABASE_NAME: str = "file_management"
+    # Crear los índices declarados en app/indexes.py al arrancar la API
+    ENSURE_INDEXES_ON_STARTUP: bool = os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
 
     MINIO_URL: str = os.getenv("MINIO_URL", "minio:9000")
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     BUCKET_NAME: str = os.getenv("BUCKET_NAME", "files")
+    # Endpoint de MinIO accesible desde el navegador, usado para firmar URLs prefirmadas
+    MINIO_PUBLIC_URL: str = os.getenv("MINIO_PUBLIC_URL", "localhost:9000")
+    MINIO_PUBLIC_SECURE: bool = os.getenv("MINIO_PUBLIC_SECURE", "false").lower() == "true"
+    MINIO_REGION: str = os.getenv("MINIO_REGION", "us-east-1")
+    PRESIGNED_URL_EXPIRE_SECONDS: int = int(os.getenv("PRESIGNED_URL_EXPIRE_SECONDS", "300"))
+    # Los blobs sin referencias se eliminan del almacenamiento tras este periodo de gracia
+    BLOB_GC_GRACE_SECONDS: int = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+    BLOB_GC_INTERVAL_SECONDS: int = int(os.getenv("BLOB_GC_INTERVAL_SECONDS", "900"))
+    PRESIGNED_UPLOAD_EXPIRE_SECONDS: int = int(os.getenv("PRESIGNED_UPLOAD_EXPIRE_SECONDS", "3600"))
+    # Hilos dedicados a las llamadas bloqueantes del SDK de MinIO
+    STORAGE_MAX_WORKERS: int = int(os.getenv("STORAGE_MAX_WORKERS", "16"))
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change_me_dev_secret_key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
+    # Coste de bcrypt; al cambiarlo, los hashes existentes se actualizan en el siguiente login correcto
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Hilos dedicados a calcular hashes de contraseñas (máximo de hashes simultáneos)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    # Caché de usuarios por proceso: el TTL acota el retraso con el que otros workers ven un cambio de rol
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+    # Páginas de contenido de carpeta cacheadas por proceso; se invalidan por la versión de la carpeta
+    FOLDER_CONTENT_CACHE_SIZE: int = int(os.getenv("FOLDER_CONTENT_CACHE_SIZE", "2000"))
+    FOLDER_CONTENT_CACHE_TTL_SECONDS: int = int(os.getenv("FOLDER_CONTENT_CACHE_TTL_SECONDS", "300"))
 
     API_TITLE: str = "Google Drive Clone API"
     API_DESCRIPTION: str = "API para gestionar archivos, simulando la funcionalidad de Google Drive."
@@ -23,7 +47,62 @@ class Settings:
         "http://localhost:5173",
     ]
 
+    # Documentos por lote en operaciones masivas (borrado y copia de subárboles)
+    BULK_BATCH_SIZE: int = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+    # Lotes de archivos que se copian en paralelo al copiar una carpeta
+    COPY_CONCURRENCY: int = int(os.getenv("COPY_CONCURRENCY", "4"))
+
+    # Trabajos en segundo plano (eliminar y copiar carpetas grandes). Los workers se ejecutan dentro de la API
+    # o, con RUN_JOBS_IN_API=false, en un proceso aparte con `python worker.py`
+    RUN_JOBS_IN_API: bool = os.getenv("RUN_JOBS_IN_API", "true").lower() == "true"
+    # Trabajos simultáneos por proceso
+    JOB_CONCURRENCY: int = int(os.getenv("JOB_CONCURRENCY", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+    # Un trabajo cuyo worker deja de renovar el lease (caída del proceso) lo retoma otro worker
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # Tiempo que se conservan los trabajos terminados
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    # Carpetas con al menos estos elementos en su subárbol se eliminan o copian como trabajo (202)
+    JOB_FOLDER_THRESHOLD_ITEMS: int = int(os.getenv("JOB_FOLDER_THRESHOLD_ITEMS", "1000"))
+
+    # Coincidencias más recientes sobre las que se calcula la relevancia en /search
+    SEARCH_MAX_CANDIDATES: int = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+
     MAX_FILE_SIZE: int = 50 * 1024 * 1024
+    # Cuota por usuario en bytes (0 = sin límite); un usuario puede tener su propio `quota_bytes`
+    DEFAULT_USER_QUOTA_BYTES: int = int(os.getenv("DEFAULT_USER_QUOTA_BYTES", "0"))
+    # Recalcular el uso de cada usuario a partir de los archivos (corrige desviaciones de los contadores)
+    USAGE_RECONCILE_INTERVAL_SECONDS: int = int(os.getenv("USAGE_RECONCILE_INTERVAL_SECONDS", str(24 * 3600)))
+    # Papelera: días que un archivo eliminado puede restaurarse antes de purgarse (sigue contando en la cuota)
+    TRASH_RETENTION_DAYS: int = int(os.getenv("TRASH_RETENTION_DAYS", "30"))
+    # Recolector de la papelera: frecuencia, archivos por lote y pausa entre lotes para no competir con
+    # el tráfico de los usuarios en borrados masivos
+    TRASH_GC_INTERVAL_SECONDS: int = int(os.getenv("TRASH_GC_INTERVAL_SECONDS", "600"))
+    TRASH_GC_BATCH_SIZE: int = int(os.getenv("TRASH_GC_BATCH_SIZE", "500"))
+    TRASH_GC_BATCH_DELAY_SECONDS: float = float(os.getenv("TRASH_GC_BATCH_DELAY_SECONDS", "1"))
+    # Subida de varios archivos en una petición: máximo por petición y subidas simultáneas al almacenamiento
+    MAX_FILES_PER_UPLOAD: int = int(os.getenv("MAX_FILES_PER_UPLOAD", "200"))
+    UPLOAD_CONCURRENCY: int = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+    # Tamaño de cada parte al subir en streaming a MinIO (mínimo 5MB por S3)
+    UPLOAD_PART_SIZE: int = int(os.getenv("UPLOAD_PART_SIZE", str(5 * 1024 * 1024)))
+    # Sesiones de subida por partes: tiempo de vida sin actividad y frecuencia de limpieza
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    UPLOAD_SESSION_GC_INTERVAL_SECONDS: int = int(os.getenv("UPLOAD_SESSION_GC_INTERVAL_SECONDS", "3600"))
+
+    # Vista previa de texto: bytes leídos del comienzo del archivo y caché por proceso de los fragmentos
+    PREVIEW_MAX_BYTES: int = int(os.getenv("PREVIEW_MAX_BYTES", str(64 * 1024)))
+    PREVIEW_CACHE_SIZE: int = int(os.getenv("PREVIEW_CACHE_SIZE", "500"))
+    PREVIEW_CACHE_TTL_SECONDS: int = int(os.getenv("PREVIEW_CACHE_TTL_SECONDS", "300"))
+
+    # Miniaturas de imágenes: nombre de cada tamaño y lado máximo en píxeles
+    THUMBNAIL_SIZES: Dict[str, int] = {"small": 256, "large": 1024}
+    # Procesos dedicados a decodificar y redimensionar imágenes (fuera del event loop)
+    THUMBNAIL_WORKERS: int = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+    # Las imágenes más grandes no tienen miniatura (el original se lee entero en memoria)
+    THUMBNAIL_MAX_SOURCE_SIZE: int = int(os.getenv("THUMBNAIL_MAX_SOURCE_SIZE", str(50 * 1024 * 1024)))
+    # Generar las miniaturas justo después de subir una imagen, en lugar de en la primera petición
+    THUMBNAILS_ON_UPLOAD: bool = os.getenv("THUMBNAILS_ON_UPLOAD", "true").lower() == "true"
 
 
 settings = Settings()
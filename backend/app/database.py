@@ -9,11 +9,25 @@ db = client[settings.DATABASE_NAME]
 file_collection = db.get_collection("files")
 folder_collection = db.get_collection("folders")
 user_collection = db.get_collection("users")
+upload_session_collection = db.get_collection("upload_sessions")
+blob_collection = db.get_collection("blobs")
+folder_stats_collection = db.get_collection("folder_stats")
+usage_collection = db.get_collection("user_usage")
+job_collection = db.get_collection("jobs")
 
 minio_client = Minio(
     settings.MINIO_URL, access_key=settings.MINIO_ACCESS_KEY, secret_key=settings.MINIO_SECRET_KEY, secure=False
 )
 
+# Cliente solo para firmar URLs con el host público; con la región fijada no realiza llamadas de red
+minio_public_client = Minio(
+    settings.MINIO_PUBLIC_URL,
+    access_key=settings.MINIO_ACCESS_KEY,
+    secret_key=settings.MINIO_SECRET_KEY,
+    secure=settings.MINIO_PUBLIC_SECURE,
+    region=settings.MINIO_REGION,
+)
+
 
 def create_bucket_if_not_exists():
     found = minio_client.bucket_exists(settings.BUCKET_NAME)
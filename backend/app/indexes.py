@@ -0,0 +1,140 @@
+"""Registro declarativo de los índices de MongoDB.
+
+Cada colección declara aquí los índices que necesitan sus consultas. `ensure_indexes` los crea de
+forma idempotente (al arrancar y desde `python -m app.cli ensure-indexes`) y `index_report` compara
+lo declarado con lo que existe en la base de datos, señalando índices que faltan, índices que no
+están declarados y los que no se han usado desde el último reinicio de MongoDB ($indexStats).
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # AuthService.get_user en cada petición autenticada
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "folders": [
+        # Comprobación de nombre duplicado en create/move/copy
+        IndexModel(
+            [("owner", ASCENDING), ("parent_folder_id", ASCENDING), ("name", ASCENDING)],
+            name="owner_parent_name_unique",
+            unique=True,
+        ),
+        # Listados paginados (keyset sobre el campo de ordenación y _id)
+        IndexModel(
+            [("owner", ASCENDING), ("parent_folder_id", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)],
+            name="owner_parent_name_id",
+        ),
+        IndexModel(
+            [("owner", ASCENDING), ("parent_folder_id", ASCENDING), ("created_date", ASCENDING), ("_id", ASCENDING)],
+            name="owner_parent_created_id",
+        ),
+        # Recorridos recursivos (borrado, copia, actualización de rutas) y listados de administrador
+        IndexModel([("parent_folder_id", ASCENDING)], name="parent_folder_id"),
+        IndexModel([("owner", ASCENDING), ("path", ASCENDING)], name="owner_path"),
+        # Subárbol de una carpeta (mover, comprobar descendientes)
+        IndexModel([("ancestors", ASCENDING)], name="ancestors"),
+    ],
+    "files": [
+        # Listados paginados de una carpeta, uno por criterio de ordenación (keyset sobre el campo y _id).
+        # deleted_at (null fuera de la papelera) va antes del campo de orden: los archivos eliminados no se leen
+        *[
+            IndexModel(
+                [
+                    ("owner", ASCENDING),
+                    ("folder_id", ASCENDING),
+                    ("deleted_at", ASCENDING),
+                    (field, ASCENDING),
+                    ("_id", ASCENDING),
+                ],
+                name=f"owner_folder_deleted_{field}_id",
+            )
+            for field in ("filename", "size", "upload_date", "file_type")
+        ],
+        IndexModel([("folder_id", ASCENDING)], name="folder_id"),
+        # Búsqueda por prefijos de palabra (SearchService)
+        IndexModel(
+            [("owner", ASCENDING), ("deleted_at", ASCENDING), ("search_terms", ASCENDING), ("_id", ASCENDING)],
+            name="owner_deleted_search_terms_id",
+        ),
+        # Papelera del usuario: solo se indexan los archivos eliminados
+        IndexModel(
+            [("owner", ASCENDING), ("deleted_at", ASCENDING)],
+            name="owner_trash_deleted_at",
+            partialFilterExpression={"deleted_at": {"$exists": True}},
+        ),
+        # Recolector de la papelera
+        IndexModel([("purge_at", ASCENDING)], name="purge_at", sparse=True),
+        IndexModel([("ancestors", ASCENDING)], name="ancestors"),
+        # Referencias a un blob (migración y verificación de blobs)
+        IndexModel([("object_name", ASCENDING)], name="object_name"),
+    ],
+    "upload_sessions": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+        # Finalizaciones interrumpidas (limpieza periódica)
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)], name="status_updated_at"),
+    ],
+    "jobs": [
+        # Reclamar el trabajo en cola más antiguo y los abandonados (lease expirado)
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        # GET /jobs del usuario
+        IndexModel([("owner", ASCENDING), ("created_at", ASCENDING)], name="owner_created_at"),
+        # Solo los trabajos terminados tienen expires_at; MongoDB los elimina al vencer
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "blobs": [
+        # Solo los blobs huérfanos tienen orphaned_at: el índice se mantiene pequeño
+        IndexModel([("orphaned_at", ASCENDING)], name="orphaned_at", sparse=True),
+    ],
+}
+
+
+async def ensure_indexes() -> dict:
+    """Crea los índices declarados que no existan. Un índice que falla no impide crear el resto."""
+    summary = {}
+    for collection_name, models in INDEXES.items():
+        collection = db.get_collection(collection_name)
+        result = {"ensured": [], "errors": []}
+        for model in models:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+                result["ensured"].append(name)
+            except OperationFailure as e:
+                # Datos duplicados que impiden un índice único o un índice con el mismo nombre y otra definición
+                logger.error("No se pudo crear el índice %s.%s: %s", collection_name, name, e)
+                result["errors"].append({"index": name, "error": str(e)})
+        summary[collection_name] = result
+    return summary
+
+
+async def index_report() -> dict:
+    """Compara los índices declarados con los existentes y sus estadísticas de uso"""
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db.get_collection(collection_name)
+        declared = [model.document["name"] for model in models]
+        existing = [index["name"] async for index in collection.list_indexes()]
+        usage = {}
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                usage[stats["name"]] = {"ops": stats["accesses"]["ops"], "since": stats["accesses"]["since"]}
+        except OperationFailure as e:
+            logger.warning("$indexStats no disponible para %s: %s", collection_name, e)
+
+        report[collection_name] = {
+            "missing": [name for name in declared if name not in existing],
+            "undeclared": [name for name in existing if name not in declared and name != "_id_"],
+            "unused": [name for name in existing if name != "_id_" and usage.get(name, {}).get("ops") == 0],
+            "usage": usage,
+        }
+    return report
@@ -30,10 +30,18 @@ class AuthMiddleware:
 
     @staticmethod
     async def get_current_user(request: Request) -> dict:
-        """Obtiene el usuario actual desde el token de autorización"""
+        """Obtiene el usuario actual desde el token de autorización.
+
+        El middleware HTTP lo resuelve una vez y lo deja en request.state.user; las dependencias de
+        los routers reutilizan ese valor en lugar de volver a decodificar el token y consultar la base.
+        """
         if AuthMiddleware.is_public_route(request.url.path, request.method):
             return None
 
+        user = getattr(request.state, "user", None)
+        if user is not None:
+            return user
+
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.lower().startswith("bearer "):
             raise HTTPException(status_code=401, detail="No autorizado: token faltante")
@@ -0,0 +1,46 @@
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.models.base import BaseDocument
+
+# Elementos por petición en las operaciones en lote
+MAX_BATCH_ITEMS = 1000
+
+
+class BatchSelection(BaseDocument):
+    """Archivos y carpetas sobre los que se aplica una operación en lote"""
+
+    file_ids: List[str] = Field(default_factory=list, max_length=MAX_BATCH_ITEMS)
+    folder_ids: List[str] = Field(default_factory=list, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchTransfer(BatchSelection):
+    """Selección a mover o copiar a una carpeta destino"""
+
+    destination_folder_id: Optional[str] = Field(None, description="ID de la carpeta destino (null para raíz)")
+
+
+class BatchItemResult(BaseDocument):
+    """Resultado de la operación para un elemento"""
+
+    id: str
+    type: str = Field(..., description="file o folder")
+    status: str = Field(
+        ...,
+        description="ok, queued (carpeta grande, en un trabajo en segundo plano), "
+        "skipped (incluido en una carpeta seleccionada) o error",
+    )
+    detail: Optional[str] = None
+    new_id: Optional[str] = Field(None, description="ID de la copia creada")
+    job_id: Optional[str] = Field(None, description="ID del trabajo que procesa la carpeta (estado queued)")
+
+
+class BatchResult(BaseDocument):
+    """Resultado de una operación en lote, elemento a elemento"""
+
+    succeeded: int = 0
+    queued: int = 0
+    skipped: int = 0
+    failed: int = 0
+    results: List[BatchItemResult] = Field(default_factory=list)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field, field_validator
 
@@ -18,6 +18,56 @@ class FileMetadata(BaseDocument):
     folder_id: Optional[PyObjectId] = None
     path: str = "/"
     owner: Optional[str] = None
+    etag: Optional[str] = None
+    content_hash: Optional[str] = None
+    deleted_at: Optional[datetime] = Field(None, description="Fecha en que se movió a la papelera")
+    purge_at: Optional[datetime] = Field(None, description="Fecha a partir de la cual se elimina definitivamente")
+
+
+class FileSearchResult(FileMetadata):
+    """Archivo encontrado con su puntuación de relevancia"""
+
+    score: float = 0
+
+
+class SearchResults(BaseDocument):
+    """Página de resultados de búsqueda ordenados por relevancia"""
+
+    items: List[FileSearchResult] = []
+    next_cursor: Optional[str] = None
+
+
+class UploadItemResult(BaseDocument):
+    """Resultado de la subida de un archivo dentro de una subida múltiple"""
+
+    filename: str
+    status: str = Field(..., description="ok o error")
+    detail: Optional[str] = None
+    file: Optional[FileMetadata] = None
+
+
+class MultiUploadResult(BaseDocument):
+    """Resultado de una subida múltiple, archivo a archivo"""
+
+    succeeded: int = 0
+    failed: int = 0
+    results: List[UploadItemResult] = []
+
+
+class TextPreview(BaseDocument):
+    """Comienzo de un archivo de texto decodificado"""
+
+    text: str
+    encoding: str
+    truncated: bool = Field(..., description="El archivo continúa más allá del texto devuelto")
+    size: int = Field(..., description="Tamaño total del archivo en bytes")
+
+
+class PresignedUrl(BaseDocument):
+    """URL prefirmada de acceso directo al almacenamiento"""
+
+    url: str
+    expires_at: datetime
 
 
 class UpdateFileName(BaseDocument):
@@ -49,3 +99,9 @@ class CopyFile(BaseDocument):
     """Esquema para copiar archivo"""
 
     folder_id: Optional[str] = Field(None, description="ID de la carpeta destino (null para raíz)")
+
+
+class EmptyTrashResult(BaseDocument):
+    """Resultado de vaciar la papelera"""
+
+    files: int = Field(0, description="Archivos programados para eliminarse definitivamente")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field
 
@@ -14,7 +14,13 @@ class FolderMetadata(BaseDocument):
     parent_folder_id: Optional[PyObjectId] = None
     created_date: datetime = Field(default_factory=datetime.utcnow)
     path: str = "/"
+    ancestors: List[PyObjectId] = Field(
+        default_factory=list, description="IDs de las carpetas contenedoras, desde la raíz"
+    )
     owner: Optional[str] = None
+    total_size: int = Field(0, description="Bytes de todos los archivos del subárbol")
+    file_count: int = Field(0, description="Archivos en el subárbol")
+    folder_count: int = Field(0, description="Subcarpetas en el subárbol")
 
 
 class CreateFolder(BaseDocument):
@@ -34,3 +40,20 @@ class CopyFolder(BaseDocument):
     """Esquema para copiar carpeta"""
 
     parent_folder_id: Optional[str] = Field(None, description="ID de la carpeta padre destino (null para raíz)")
+
+
+class DeleteFolderSummary(BaseDocument):
+    """Resultado de eliminar una carpeta y su subárbol"""
+
+    folder_id: str
+    folders_deleted: int = 0
+    files_deleted: int = 0
+    failed: List[dict] = Field(default_factory=list, description="Lotes que no se pudieron eliminar")
+
+
+class CopyFolderResult(FolderMetadata):
+    """Carpeta creada por una copia junto con el resumen de lo copiado"""
+
+    folders_copied: int = 0
+    files_copied: int = 0
+    failed: List[dict] = Field(default_factory=list, description="Elementos que no se pudieron copiar")
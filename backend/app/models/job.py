@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import Field
+
+from app.models.base import BaseDocument, PyObjectId
+
+
+class Job(BaseDocument):
+    """Estado de un trabajo en segundo plano"""
+
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    type: str = Field(..., description="Operación: delete_folder o copy_folder")
+    status: str = Field(..., description="queued, running, completed, failed o cancelled")
+    owner: Optional[str] = None
+    progress: dict = Field(default_factory=dict, description="Resumen parcial de la operación")
+    result: Optional[dict] = Field(None, description="Resumen final cuando el trabajo termina")
+    error: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.models.base import BaseDocument, PyObjectId
+
+
+class CreateUploadSession(BaseDocument):
+    """Esquema para iniciar una sesión de subida por partes"""
+
+    filename: str = Field(..., min_length=1, max_length=255, description="Nombre del archivo")
+    size: int = Field(..., ge=0, description="Tamaño total del archivo en bytes")
+    content_type: Optional[str] = Field(None, description="Tipo MIME del archivo")
+    folder_id: Optional[str] = Field(None, description="ID de la carpeta destino (null para raíz)")
+
+
+class UploadedPart(BaseDocument):
+    """Parte ya recibida de una sesión de subida"""
+
+    part_number: int
+    size: int
+    etag: str
+
+
+class UploadSession(BaseDocument):
+    """Estado de una sesión de subida por partes"""
+
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    filename: str
+    size: int
+    file_type: str
+    folder_id: Optional[PyObjectId] = None
+    part_size: int
+    total_parts: int
+    uploaded_parts: List[UploadedPart] = []
+    mode: str = "multipart"
+    status: str = "active"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    owner: Optional[str] = None
+
+
+class DirectUploadSession(UploadSession):
+    """Subida directa al almacenamiento: el cliente hace PUT del archivo completo en `upload_url`"""
+
+    upload_url: str
+    url_expires_at: datetime
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from pydantic import Field
+
+from app.models.base import BaseDocument
+
+
+class TypeUsage(BaseDocument):
+    """Uso de un tipo de archivo (parte principal del MIME)"""
+
+    bytes: int = 0
+    files: int = 0
+
+
+class UsageSummary(BaseDocument):
+    """Uso de almacenamiento de un usuario"""
+
+    username: str
+    bytes: int = 0
+    files: int = 0
+    folders: int = 0
+    by_type: Dict[str, TypeUsage] = {}
+    quota_bytes: Optional[int] = Field(None, description="Cuota en bytes; null si no tiene límite")
+    updated_at: Optional[datetime] = None
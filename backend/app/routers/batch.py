@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from app.middleware.auth import AuthMiddleware
+from app.models.batch import BatchResult, BatchSelection, BatchTransfer
+from app.services.archive_service import ArchiveService
+from app.services.batch_service import BatchService
+from app.utils.http import content_disposition
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+
+@router.post("/move", response_model=BatchResult)
+async def move_items(data: BatchTransfer, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Mueve varios archivos y carpetas a la carpeta destino; devuelve el resultado de cada elemento"""
+    return await BatchService.move(data.file_ids, data.folder_ids, data.destination_folder_id, current_user)
+
+
+@router.post("/copy", response_model=BatchResult)
+async def copy_items(data: BatchTransfer, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Copia varios archivos y carpetas a la carpeta destino; new_id trae el ID de cada copia"""
+    return await BatchService.copy(data.file_ids, data.folder_ids, data.destination_folder_id, current_user)
+
+
+@router.post("/delete", response_model=BatchResult)
+async def delete_items(data: BatchSelection, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Elimina varios archivos y carpetas (con su contenido)"""
+    return await BatchService.delete(data.file_ids, data.folder_ids, current_user)
+
+
+@router.post("/archive")
+async def download_archive(data: BatchSelection, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Descarga la selección como un ZIP generado en streaming"""
+    filename, content = await ArchiveService.selection_archive(data.file_ids, data.folder_ids, current_user)
+    return StreamingResponse(
+        content, media_type="application/zip", headers={"Content-Disposition": content_disposition(filename)}
+    )
@@ -1,54 +1,169 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, Form, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, Query, Request, Response, UploadFile
+from fastapi.responses import RedirectResponse, StreamingResponse
 
+from app.config import settings
 from app.middleware.auth import AuthMiddleware
-from app.models.file import CopyFile, FileMetadata, MoveFile, UpdateFileName
+from app.models.file import (
+    CopyFile,
+    FileMetadata,
+    MoveFile,
+    MultiUploadResult,
+    PresignedUrl,
+    TextPreview,
+    UpdateFileName,
+)
 from app.services.file_service import FileService
+from app.services.thumbnail_service import ThumbnailService
+from app.storage import storage
+from app.utils.http import (
+    content_disposition,
+    etag_matches,
+    format_http_date,
+    is_not_modified,
+    quote_etag,
+    resolve_range,
+)
+from app.utils.pagination import SORT_PATTERN
+from app.utils.thumbnails import THUMBNAIL_CONTENT_TYPE
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
 
 @router.post("/upload", response_model=FileMetadata, status_code=201)
 async def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     folder_id: Optional[str] = Form(None),
     current_user: dict = Depends(AuthMiddleware.get_current_user),
 ):
-    return await FileService.upload_file(file, current_user, folder_id)
+    file_doc = await FileService.upload_file(file, current_user, folder_id)
+    if settings.THUMBNAILS_ON_UPLOAD:
+        background_tasks.add_task(ThumbnailService.generate_for, [file_doc])
+    return file_doc
+
+
+@router.post("/upload-many", response_model=MultiUploadResult)
+async def upload_files(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    folder_id: Optional[str] = Form(None),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Sube varios archivos a la misma carpeta; un archivo que falla no afecta al resto"""
+    result = await FileService.upload_files(files, current_user, folder_id)
+    if settings.THUMBNAILS_ON_UPLOAD:
+        uploaded = [item["file"] for item in result["results"] if item.get("file")]
+        background_tasks.add_task(ThumbnailService.generate_for, uploaded)
+    return result
 
 
 @router.get("", response_model=List[FileMetadata])
 async def list_files(
+    response: Response,
     folder_id: Optional[str] = None,
     search: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("name", pattern=SORT_PATTERN),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
     current_user: dict = Depends(AuthMiddleware.get_current_user),
 ):
-    return await FileService.list_files(current_user, folder_id, search)
+    """Lista archivos paginados; si hay más resultados, X-Next-Cursor trae el cursor de la página siguiente"""
+    files = await FileService.list_files(current_user, folder_id, search, limit, cursor, sort, order)
+    next_cursor = FileService.next_cursor(files, limit, sort, order)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return files
 
 
 @router.get("/download/{file_id}")
 async def download_file(
-    file_id: str, inline: Optional[bool] = False, current_user: dict = Depends(AuthMiddleware.get_current_user)
+    file_id: str,
+    request: Request,
+    inline: Optional[bool] = False,
+    mode: str = Query("stream", pattern="^(stream|redirect|url)$"),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
 ):
+    """Descarga un archivo. Con mode=redirect|url los datos se sirven directamente desde el almacenamiento"""
+    if mode == "redirect":
+        presigned = await FileService.get_download_url(file_id, current_user, inline=bool(inline))
+        return RedirectResponse(presigned["url"], status_code=307)
+    if mode == "url":
+        return await FileService.get_download_url(file_id, current_user, inline=bool(inline))
+
     file_doc = await FileService.get_file(file_id, current_user)
-    response = FileService.get_file_stream(file_doc)
-
-    headers = {}
-    if inline and file_doc["file_type"] in [
-        "application/pdf",
-        "image/jpeg",
-        "image/png",
-        "image/gif",
-        "image/webp",
-        "image/svg+xml",
-    ]:
-        headers["Content-Disposition"] = f"inline; filename={file_doc['filename']}"
-    else:
-        headers["Content-Disposition"] = f"attachment; filename={file_doc['filename']}"
-
-    return StreamingResponse(response.stream(32 * 1024), media_type=file_doc["file_type"], headers=headers)
+    etag = FileService.get_etag(file_doc)
+    last_modified = file_doc["upload_date"]
+
+    headers = {
+        "ETag": quote_etag(etag),
+        "Last-Modified": format_http_date(last_modified),
+        "Accept-Ranges": "bytes",
+        # Privado y con revalidación: el navegador reutiliza su copia tras un 304
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": content_disposition(
+            file_doc["filename"], inline=bool(inline and file_doc["file_type"] in FileService.INLINE_TYPES)
+        ),
+    }
+
+    # Las peticiones condicionales se resuelven con los metadatos, sin tocar el almacenamiento
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    size = file_doc["size"]
+    byte_range = resolve_range(request.headers, size, etag, last_modified)
+    if byte_range:
+        start, end = byte_range
+        response = await FileService.get_file_stream(file_doc, offset=start, length=end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            storage.iter_response(response), status_code=206, media_type=file_doc["file_type"], headers=headers
+        )
+
+    response = await FileService.get_file_stream(file_doc)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(storage.iter_response(response), media_type=file_doc["file_type"], headers=headers)
+
+
+@router.get("/{file_id}/preview", response_model=TextPreview)
+async def get_text_preview(
+    file_id: str,
+    response: Response,
+    max_bytes: Optional[int] = Query(None, ge=1024, le=1024 * 1024),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Vista previa de un archivo de texto: solo se leen los primeros bytes (PREVIEW_MAX_BYTES por defecto)"""
+    preview = await FileService.get_text_preview(file_id, current_user, max_bytes)
+    response.headers["Cache-Control"] = f"private, max-age={settings.PREVIEW_CACHE_TTL_SECONDS}"
+    return preview
+
+
+@router.get("/{file_id}/thumbnail")
+async def get_thumbnail(
+    file_id: str,
+    request: Request,
+    size: str = Query("small", pattern="^[a-z]+$"),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Miniatura WebP de una imagen. El contenido de un archivo no cambia, así que se cachea sin revalidar"""
+    file_doc, rendition = await ThumbnailService.get_thumbnail(file_id, size, current_user)
+    etag = f"{FileService.get_etag(file_doc)}-{size}"
+    headers = {"ETag": quote_etag(etag), "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response = await ThumbnailService.open(rendition)
+    return StreamingResponse(storage.iter_response(response), media_type=THUMBNAIL_CONTENT_TYPE, headers=headers)
+
+
+@router.get("/{file_id}/download-url", response_model=PresignedUrl)
+async def get_download_url(
+    file_id: str, inline: Optional[bool] = False, current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """URL prefirmada de corta duración para descargar sin pasar por la API"""
+    return await FileService.get_download_url(file_id, current_user, inline=bool(inline))
 
 
 @router.put("/edit/{file_id}", response_model=FileMetadata)
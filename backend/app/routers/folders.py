@@ -1,10 +1,22 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.middleware.auth import AuthMiddleware
-from app.models.folder import CopyFolder, CreateFolder, FolderMetadata, MoveFolder
+from app.models.folder import (
+    CopyFolder,
+    CopyFolderResult,
+    CreateFolder,
+    DeleteFolderSummary,
+    FolderMetadata,
+    MoveFolder,
+)
+from app.models.job import Job
+from app.services.archive_service import ArchiveService
 from app.services.folder_service import FolderService
+from app.utils.http import content_disposition, etag_matches, quote_etag
+from app.utils.pagination import SORT_PATTERN
 
 router = APIRouter(prefix="/folders", tags=["Folders"])
 
@@ -16,10 +28,20 @@ async def create_folder(folder: CreateFolder, current_user: dict = Depends(AuthM
 
 @router.get("", response_model=List[FolderMetadata])
 async def list_folders(
-    parent_folder_id: Optional[str] = None, current_user: dict = Depends(AuthMiddleware.get_current_user)
+    response: Response,
+    parent_folder_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("name", pattern=SORT_PATTERN),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
 ):
-    """Lista carpetas en un directorio específico"""
-    return await FolderService.list_folders(current_user, parent_folder_id)
+    """Lista carpetas en un directorio específico; X-Next-Cursor trae el cursor de la página siguiente"""
+    folders = await FolderService.list_folders(current_user, parent_folder_id, limit, cursor, sort, order)
+    next_cursor = FolderService.next_cursor(folders, limit, sort, order)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return folders
 
 
 @router.get("/{folder_id}", response_model=FolderMetadata)
@@ -28,14 +50,66 @@ async def get_folder(folder_id: str, current_user: dict = Depends(AuthMiddleware
 
 
 @router.get("/{folder_id}/content")
-async def get_folder_content(folder_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
-    return await FolderService.get_folder_content(folder_id, current_user)
-
+async def get_folder_content(
+    request: Request,
+    response: Response,
+    folder_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("name", pattern=SORT_PATTERN),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Contenido paginado: subcarpetas primero y después archivos; next_cursor es null en la última página.
+
+    Responde 304 si el If-None-Match coincide con la versión actual de la carpeta.
+    """
+    etag = await FolderService.content_etag(folder_id, current_user, limit, cursor, sort, order)
+    if etag:
+        # Privado y con revalidación: el navegador reutiliza su copia tras un 304
+        headers = {"ETag": quote_etag(etag), "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return await FolderService.get_folder_content(folder_id, current_user, limit, cursor, sort, order, etag)
+
+
+@router.get("/{folder_id}/archive")
+async def download_folder_archive(folder_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Descarga la carpeta y su subárbol como un ZIP generado en streaming"""
+    filename, content = await ArchiveService.folder_archive(folder_id, current_user)
+    return StreamingResponse(
+        content, media_type="application/zip", headers={"Content-Disposition": content_disposition(filename)}
+    )
+
+
+def job_accepted(job: dict) -> JSONResponse:
+    """202 con el trabajo encolado; su estado se consulta en /jobs/{id}"""
+    content = Job.model_validate(job).model_dump(mode="json", by_alias=True)
+    return JSONResponse(status_code=202, content=content, headers={"Location": f"/jobs/{job['_id']}"})
+
+
+BACKGROUND_QUERY = Query(
+    None,
+    description="true para ejecutarla como trabajo en segundo plano, false para hacerla en la petición; "
+    "por defecto depende del tamaño del subárbol",
+)
+
+
+@router.delete("/{folder_id}", response_model=DeleteFolderSummary, responses={202: {"model": Job}})
+async def delete_folder(
+    folder_id: str,
+    background: Optional[bool] = BACKGROUND_QUERY,
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Elimina la carpeta y su contenido; devuelve cuántos elementos se eliminaron y los lotes fallidos.
 
-@router.delete("/{folder_id}", status_code=204)
-async def delete_folder(folder_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
-    await FolderService.delete_folder(folder_id, current_user)
-    return
+    Las carpetas grandes se eliminan en segundo plano y la respuesta es 202 con el trabajo.
+    """
+    job = await FolderService.delete_folder_job(folder_id, current_user, background)
+    if job is not None:
+        return job_accepted(job)
+    return await FolderService.delete_folder(folder_id, current_user)
 
 
 @router.patch("/{folder_id}/move", response_model=FolderMetadata)
@@ -45,8 +119,15 @@ async def move_folder(
     return await FolderService.move_folder(folder_id, move_data.parent_folder_id, current_user)
 
 
-@router.post("/{folder_id}/copy", response_model=FolderMetadata, status_code=201)
+@router.post("/{folder_id}/copy", response_model=CopyFolderResult, status_code=201, responses={202: {"model": Job}})
 async def copy_folder(
-    folder_id: str, copy_data: CopyFolder, current_user: dict = Depends(AuthMiddleware.get_current_user)
+    folder_id: str,
+    copy_data: CopyFolder,
+    background: Optional[bool] = BACKGROUND_QUERY,
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
 ):
+    """Copia la carpeta y su contenido; las carpetas grandes se copian en segundo plano (202 con el trabajo)"""
+    job = await FolderService.copy_folder_job(folder_id, copy_data.parent_folder_id, current_user, background)
+    if job is not None:
+        return job_accepted(job)
     return await FolderService.copy_folder(folder_id, copy_data.parent_folder_id, current_user)
@@ -2,7 +2,8 @@ from datetime import datetime
 
 from fastapi import APIRouter
 
-from app.database import file_collection, minio_client
+from app.database import file_collection
+from app.storage import storage
 
 router = APIRouter(tags=["Health"])
 
@@ -25,9 +26,7 @@ async def health_check():
 
     try:
         # Check MinIO connection
-        from app.config import settings
-
-        minio_client.bucket_exists(settings.BUCKET_NAME)
+        await storage.bucket_exists()
         storage_status = "connected"
     except Exception:
         storage_status = "disconnected"
@@ -0,0 +1,29 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from app.middleware.auth import AuthMiddleware
+from app.models.job import Job
+from app.services.job_service import JobService
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("", response_model=List[Job])
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=200), current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """Trabajos en segundo plano más recientes del usuario"""
+    return await JobService.list_jobs(current_user, limit)
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Estado y progreso de un trabajo"""
+    return await JobService.get_job(job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+async def cancel_job(job_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Cancela el trabajo; si ya está en ejecución se detiene en su siguiente lote"""
+    return await JobService.cancel_job(job_id, current_user)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.middleware.auth import AuthMiddleware
+from app.models.file import SearchResults
+from app.services.search_service import SearchService
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("", response_model=SearchResults)
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar en el nombre"),
+    folder_id: Optional[str] = Query(None, description="Limitar a una carpeta y sus subcarpetas"),
+    type: Optional[str] = Query(None, description="Tipo MIME exacto o familia terminada en '/' (p. ej. image/)"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    size_min: Optional[int] = Query(None, ge=0),
+    size_max: Optional[int] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(AuthMiddleware.get_current_user),
+):
+    """Busca archivos por prefijos de palabra del nombre, sin distinguir mayúsculas ni acentos"""
+    return await SearchService.search(
+        current_user,
+        q,
+        limit=limit,
+        cursor=cursor,
+        folder_id=folder_id,
+        file_type=type,
+        date_from=date_from,
+        date_to=date_to,
+        size_min=size_min,
+        size_max=size_max,
+    )
@@ -0,0 +1,29 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from app.middleware.auth import AuthMiddleware
+from app.models.file import EmptyTrashResult, FileMetadata
+from app.services.trash_service import TrashService
+
+router = APIRouter(prefix="/trash", tags=["Trash"])
+
+
+@router.get("", response_model=List[FileMetadata])
+async def list_trash(
+    limit: int = Query(100, ge=1, le=1000), current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """Archivos eliminados que aún pueden restaurarse, los más recientes primero"""
+    return await TrashService.list_trash(current_user, limit)
+
+
+@router.post("/{file_id}/restore", response_model=FileMetadata)
+async def restore_file(file_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Devuelve el archivo a su carpeta (o a la raíz si ya no existe)"""
+    return await TrashService.restore_file(file_id, current_user)
+
+
+@router.delete("", response_model=EmptyTrashResult)
+async def empty_trash(current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Vacía la papelera; los archivos se eliminan definitivamente en segundo plano"""
+    return await TrashService.empty_trash(current_user)
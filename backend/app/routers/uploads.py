@@ -0,0 +1,56 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+
+from app.config import settings
+from app.middleware.auth import AuthMiddleware
+from app.models.file import FileMetadata
+from app.models.upload_session import CreateUploadSession, DirectUploadSession, UploadedPart, UploadSession
+from app.services.thumbnail_service import ThumbnailService
+from app.services.upload_session_service import UploadSessionService
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+
+@router.post("", response_model=UploadSession, status_code=201)
+async def create_upload_session(
+    data: CreateUploadSession, current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """Inicia una subida reanudable por partes"""
+    return await UploadSessionService.create_session(data, current_user)
+
+
+@router.post("/direct", response_model=DirectUploadSession, status_code=201)
+async def create_direct_upload(
+    data: CreateUploadSession, current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """Reserva una subida directa al almacenamiento; se confirma después con /uploads/{id}/complete"""
+    return await UploadSessionService.create_direct_session(data, current_user)
+
+
+@router.get("/{session_id}", response_model=UploadSession)
+async def get_upload_session(session_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Estado de la sesión, incluyendo las partes ya recibidas para reanudar"""
+    return await UploadSessionService.get_session(session_id, current_user)
+
+
+@router.put("/{session_id}/parts/{part_number}", response_model=UploadedPart)
+async def upload_part(
+    session_id: str, part_number: int, request: Request, current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    """Sube una parte con el cuerpo binario de la petición; puede reintentarse o enviarse en paralelo"""
+    return await UploadSessionService.upload_part(session_id, part_number, request.stream(), current_user)
+
+
+@router.post("/{session_id}/complete", response_model=FileMetadata, status_code=201)
+async def complete_upload_session(
+    session_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(AuthMiddleware.get_current_user)
+):
+    file_doc = await UploadSessionService.complete_session(session_id, current_user)
+    if settings.THUMBNAILS_ON_UPLOAD:
+        background_tasks.add_task(ThumbnailService.generate_for, [file_doc])
+    return file_doc
+
+
+@router.delete("/{session_id}", status_code=204)
+async def abort_upload_session(session_id: str, current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    await UploadSessionService.abort_session(session_id, current_user)
+    return
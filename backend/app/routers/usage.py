@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+
+from app.middleware.auth import AuthMiddleware
+from app.models.usage import UsageSummary
+from app.services.usage_service import UsageService
+
+router = APIRouter(prefix="/usage", tags=["Usage"])
+
+
+@router.get("", response_model=UsageSummary)
+async def get_usage(current_user: dict = Depends(AuthMiddleware.get_current_user)):
+    """Espacio usado por el usuario actual, con desglose por tipo y su cuota"""
+    return await UsageService.get_usage(current_user)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.database import file_collection, folder_collection
+from app.services.base_service import BaseService
+from app.services.batch_service import BatchService
+from app.storage import storage
+from app.utils.validators import validate_object_id
+from app.utils.zipstream import ZipStream, is_compressed_type
+
+logger = logging.getLogger(__name__)
+
+# Campos de los archivos necesarios para escribirlos en el ZIP
+ARCHIVE_FILE_FIELDS = {"filename": 1, "path": 1, "object_name": 1, "file_type": 1, "upload_date": 1, "size": 1}
+
+# Entrada del ZIP: (nombre dentro del archivo, documento del archivo o None si es un directorio, fecha)
+ArchiveEntry = Tuple[str, Optional[dict], object]
+
+
+def _safe_component(name: str) -> str:
+    """Componente de ruta que no puede salirse del directorio de extracción"""
+    name = name.replace("/", "_").replace("\\", "_").strip()
+    return "_" if name in ("", ".", "..") else name
+
+
+class ArchiveService(BaseService):
+    """Descarga de carpetas y selecciones como un ZIP generado al vuelo.
+
+    Los archivos se leen de MinIO en streaming mientras se recorre el subárbol; el objeto siguiente
+    se abre mientras se escribe el actual. Nada se guarda en disco y la memoria no depende del tamaño
+    del archivo: solo del número de entradas (directorio central).
+    """
+
+    @staticmethod
+    async def folder_archive(folder_id: str, current_user: dict) -> Tuple[str, AsyncIterator[bytes]]:
+        """Nombre del ZIP y su contenido; la carpeta se valida antes de empezar a enviar datos"""
+        folder_oid = validate_object_id(folder_id, "ID de carpeta")
+        folder = await folder_collection.find_one({"_id": folder_oid})
+        ArchiveService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        return f"{folder['name']}.zip", ArchiveService._stream(ArchiveService._folder_entries(folder))
+
+    @staticmethod
+    async def selection_archive(
+        file_ids: List[str], folder_ids: List[str], current_user: dict
+    ) -> Tuple[str, AsyncIterator[bytes]]:
+        """ZIP con los archivos seleccionados en la raíz y cada carpeta seleccionada con su subárbol.
+
+        Los elementos que no existen o no pertenecen al usuario se omiten.
+        """
+        folders, files, _ = await BatchService.load_selection(file_ids, folder_ids, current_user)
+        return "archivos.zip", ArchiveService._stream(ArchiveService._selection_entries(folders, files))
+
+    @staticmethod
+    async def _folder_entries(folder: dict) -> AsyncIterator[ArchiveEntry]:
+        """Directorios y archivos del subárbol con rutas relativas a la carpeta"""
+        root = f"{_safe_component(folder['name'])}/"
+        base_length = len(folder["path"])
+
+        def relative(path: str) -> str:
+            parts = [_safe_component(part) for part in path[base_length:].split("/") if part]
+            return root + "".join(f"{part}/" for part in parts)
+
+        yield root, None, folder.get("created_date")
+        async for subfolder in folder_collection.find({"ancestors": folder["_id"]}, {"path": 1, "created_date": 1}):
+            yield relative(subfolder["path"]), None, subfolder.get("created_date")
+        async for file_doc in file_collection.find(
+            {"ancestors": folder["_id"], "deleted_at": None}, ARCHIVE_FILE_FIELDS
+        ):
+            name = relative(file_doc["path"]) + _safe_component(file_doc["filename"])
+            yield name, file_doc, file_doc.get("upload_date")
+
+    @staticmethod
+    async def _selection_entries(folders: List[dict], files: List[dict]) -> AsyncIterator[ArchiveEntry]:
+        included = set()
+        for folder in folders:
+            if BatchService.inside(folder, included):
+                continue
+            included.add(folder["_id"])
+            async for entry in ArchiveService._folder_entries(folder):
+                yield entry
+        for file_doc in files:
+            if not BatchService.inside(file_doc, included):
+                yield _safe_component(file_doc["filename"]), file_doc, file_doc.get("upload_date")
+
+    @staticmethod
+    def _unique(name: str, used: set) -> str:
+        """Evita entradas repetidas: 'informe.pdf' -> 'informe (1).pdf'"""
+        if name not in used:
+            used.add(name)
+            return name
+        stem, dot, extension = name.rpartition(".")
+        if not dot or "/" in extension or stem.endswith("/"):
+            stem, dot, extension = name, "", ""
+        counter = 1
+        while True:
+            candidate = f"{stem} ({counter}){dot}{extension}"
+            if candidate not in used:
+                used.add(candidate)
+                return candidate
+            counter += 1
+
+    @staticmethod
+    async def _stream(entries: AsyncIterator[ArchiveEntry]) -> AsyncIterator[bytes]:
+        zip_stream = ZipStream()
+        used = set()
+        pending = None  # (nombre, documento, fecha, tarea que abre el objeto)
+        try:
+            async for name, file_doc, modified in entries:
+                if file_doc is None:
+                    if name not in used:
+                        used.add(name)
+                        yield zip_stream.add_directory(name, modified)
+                    continue
+                # Se abre el objeto siguiente antes de escribir el actual
+                opening = asyncio.ensure_future(storage.get_object(file_doc["object_name"]))
+                current, pending = pending, (name, file_doc, modified, opening)
+                if current:
+                    async for chunk in ArchiveService._write_file(zip_stream, used, *current):
+                        yield chunk
+            if pending:
+                current, pending = pending, None
+                async for chunk in ArchiveService._write_file(zip_stream, used, *current):
+                    yield chunk
+            yield zip_stream.finish()
+        finally:
+            # Cliente desconectado o error: se cierra el objeto que se estaba abriendo
+            if pending:
+                ArchiveService._discard(pending[3])
+
+    @staticmethod
+    async def _write_file(
+        zip_stream: ZipStream, used: set, name: str, file_doc: dict, modified, opening: asyncio.Future
+    ) -> AsyncIterator[bytes]:
+        try:
+            response = await opening
+        except Exception:
+            logger.exception("No se pudo leer %s para el ZIP; se omite", file_doc["object_name"])
+            return
+        yield zip_stream.start_file(
+            ArchiveService._unique(name, used),
+            modified,
+            compress=not is_compressed_type(file_doc.get("file_type")),
+            size_hint=file_doc.get("size", 0),
+        )
+        async for chunk in storage.iter_response(response):
+            yield zip_stream.write(chunk)
+        yield zip_stream.end_file()
+
+    @staticmethod
+    def _discard(opening: asyncio.Future):
+        """Cierra el objeto abierto por adelantado en cuanto termine de abrirse"""
+
+        def close(future: asyncio.Future):
+            if not future.cancelled() and future.exception() is None:
+                response = future.result()
+                response.close()
+                response.release_conn()
+
+        opening.add_done_callback(close)
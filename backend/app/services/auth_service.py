@@ -1,9 +1,14 @@
 from typing import Optional
 
+from app.config import settings
 from app.database import user_collection
 from app.models.user import Token, UserCreate
+from app.utils.cache import TTLCache
 from app.utils.exceptions import ConflictException, UnauthorizedException
-from app.utils.security import create_access_token, get_password_hash, verify_password
+from app.utils.security import create_access_token, hash_password, verify_and_update_password
+
+# Usuarios resueltos recientemente; se invalida al cambiar su rol o contraseña
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
 
 
 class AuthService:
@@ -11,15 +16,36 @@ class AuthService:
 
     @staticmethod
     async def get_user(username: str) -> Optional[dict]:
-        """Obtiene usuario por username"""
-        return await user_collection.find_one({"username": username})
+        """Obtiene usuario por username, desde la caché del proceso si está disponible"""
+        user = user_cache.get(username)
+        if user is None:
+            user = await user_collection.find_one({"username": username})
+            if user:
+                user_cache.set(username, user)
+        return dict(user) if user else None
+
+    @staticmethod
+    async def update_user(username: str, fields: dict):
+        """Actualiza campos del usuario (rol, contraseña...) e invalida su entrada en caché"""
+        await user_collection.update_one({"username": username}, {"$set": fields})
+        AuthService.invalidate_user(username)
+
+    @staticmethod
+    def invalidate_user(username: str):
+        user_cache.delete(username)
 
     @staticmethod
     async def authenticate_user(username: str, password: str) -> dict:
         """Autentica usuario y retorna datos del usuario"""
         user = await AuthService.get_user(username)
-        if not user or not verify_password(password, user.get("hashed_password", "")):
+        if not user or not user.get("hashed_password"):
+            raise UnauthorizedException("Credenciales inválidas")
+        valid, new_hash = await verify_and_update_password(password, user["hashed_password"])
+        if not valid:
             raise UnauthorizedException("Credenciales inválidas")
+        if new_hash:
+            # El hash se creó con otra política (coste de bcrypt): se reemplaza de forma transparente
+            await AuthService.update_user(username, {"hashed_password": new_hash})
         return user
 
     @staticmethod
@@ -31,7 +57,7 @@ class AuthService:
             raise ConflictException("El usuario ya existe")
 
         # Crear usuario
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         user_doc = {"username": user_data.username, "hashed_password": hashed_password, "role": "user"}
 
         await user_collection.insert_one(user_doc)
@@ -0,0 +1,291 @@
+import logging
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.database import file_collection, folder_collection
+from app.services.base_service import BaseService
+from app.services.blob_service import BlobService
+from app.services.file_service import FileService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_service import FolderService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.trash_service import TrashService
+from app.services.usage_service import UsageService
+from app.utils.exceptions import AppException, InternalServerException, ValidationException
+from app.utils.validators import validate_object_id
+
+logger = logging.getLogger(__name__)
+
+
+class BatchService(BaseService):
+    """Mover, copiar y eliminar varios archivos y carpetas en una sola petición.
+
+    Los elementos se cargan con una consulta `$in` por colección y el destino una sola vez. Los
+    archivos se procesan con una única escritura en lote; las carpetas, que arrastran su subárbol,
+    con las mismas operaciones que los endpoints individuales; al copiar o eliminar, las que superan
+    JOB_FOLDER_THRESHOLD_ITEMS se encolan como trabajos (estado `queued` con su `job_id`), igual que en
+    esos endpoints. Un elemento cuya carpeta contenedora
+    también está seleccionada y se procesó con éxito se marca como `skipped`, porque la operación
+    sobre la carpeta ya lo incluye. Cada elemento tiene su propio resultado: un fallo no detiene el resto.
+    """
+
+    @staticmethod
+    def _result(item_id, kind: str, status: str, detail: Optional[str] = None, new_id=None, job_id=None) -> dict:
+        return {
+            "id": str(item_id),
+            "type": kind,
+            "status": status,
+            "detail": detail,
+            "new_id": str(new_id) if new_id else None,
+            "job_id": str(job_id) if job_id else None,
+        }
+
+    @staticmethod
+    async def _load(
+        collection, ids: List[str], kind: str, current_user: dict, label: str, not_found: str
+    ) -> Tuple[List[dict], List[dict]]:
+        """Carga los elementos con una sola consulta y devuelve (válidos, errores)"""
+        errors, oids = [], {}
+        for item_id in dict.fromkeys(ids):
+            try:
+                oids[item_id] = validate_object_id(item_id, label)
+            except ValidationException as e:
+                errors.append(BatchService._result(item_id, kind, "error", e.detail))
+
+        docs = {}
+        if oids:
+            # Los archivos de la papelera no se pueden seleccionar (las carpetas no tienen deleted_at)
+            found = await collection.find({"_id": {"$in": list(oids.values())}, "deleted_at": None}).to_list(None)
+            docs = {doc["_id"]: doc for doc in found}
+
+        loaded = []
+        for item_id, oid in oids.items():
+            try:
+                BatchService._check_ownership(docs.get(oid), current_user, not_found)
+            except AppException as e:
+                errors.append(BatchService._result(item_id, kind, "error", e.detail))
+            else:
+                loaded.append(docs[oid])
+        return loaded, errors
+
+    @staticmethod
+    async def load_selection(file_ids: List[str], folder_ids: List[str], current_user: dict):
+        """Carpetas y archivos seleccionados del usuario y los errores de los que no se pudieron cargar"""
+        folders, folder_errors = await BatchService._load(
+            folder_collection, folder_ids, "folder", current_user, "ID de carpeta", "Carpeta no encontrada"
+        )
+        files, file_errors = await BatchService._load(
+            file_collection, file_ids, "file", current_user, "ID de archivo", "Archivo no encontrado"
+        )
+        # Las carpetas de arriba hacia abajo, para saber si un contenedor ya se procesó
+        folders.sort(key=lambda folder: len(folder.get("ancestors", [])))
+        return folders, files, folder_errors + file_errors
+
+    @staticmethod
+    async def _load_destination(destination_folder_id: Optional[str], current_user: dict) -> Optional[dict]:
+        """Carpeta destino (None para la raíz); un destino inválido hace fallar toda la petición"""
+        if not destination_folder_id or destination_folder_id == "root":
+            return None
+        destination_oid = validate_object_id(destination_folder_id, "ID de carpeta destino")
+        destination = await folder_collection.find_one({"_id": destination_oid})
+        BatchService._check_ownership(destination, current_user, "Carpeta destino no encontrada")
+        return destination
+
+    @staticmethod
+    def inside(doc: dict, processed: set) -> bool:
+        """Indica si `doc` está dentro de alguna de las carpetas de `processed`"""
+        return any(ancestor in processed for ancestor in doc.get("ancestors", []))
+
+    @staticmethod
+    def _summary(results: List[dict]) -> dict:
+        counts = {"ok": 0, "queued": 0, "skipped": 0, "error": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return {
+            "succeeded": counts["ok"],
+            "queued": counts["queued"],
+            "skipped": counts["skipped"],
+            "failed": counts["error"],
+            "results": results,
+        }
+
+    @staticmethod
+    async def _each_folder(folders: List[dict], results: List[dict], skipped_detail: str, operation) -> set:
+        """Aplica `operation` a cada carpeta no contenida en otra ya procesada; devuelve las procesadas.
+
+        `operation` devuelve los campos de su resultado: new_id o, si encoló un trabajo, el estado queued
+        y el job_id. Lo contenido en una carpeta encolada lo procesa su trabajo.
+        """
+        processed = set()
+        for folder in folders:
+            if BatchService.inside(folder, processed):
+                results.append(BatchService._result(folder["_id"], "folder", "skipped", skipped_detail))
+                continue
+            try:
+                fields = {"status": "ok", **(await operation(folder) or {})}
+            except AppException as e:
+                results.append(BatchService._result(folder["_id"], "folder", "error", e.detail))
+            except Exception as e:
+                logger.exception("Error en la operación en lote sobre la carpeta %s", folder["_id"])
+                results.append(BatchService._result(folder["_id"], "folder", "error", str(e)))
+            else:
+                processed.add(folder["_id"])
+                results.append(BatchService._result(folder["_id"], "folder", **fields))
+        return processed
+
+    @staticmethod
+    async def move(
+        file_ids: List[str], folder_ids: List[str], destination_folder_id: Optional[str], current_user: dict
+    ) -> dict:
+        destination = await BatchService._load_destination(destination_folder_id, current_user)
+        folders, files, results = await BatchService.load_selection(file_ids, folder_ids, current_user)
+        owner = current_user.get("username")
+
+        async def move_folder(folder: dict):
+            if destination:
+                FolderService.check_not_inside(folder, destination)
+            await FolderService.move_into(folder, destination, owner)
+
+        moved = await BatchService._each_folder(folders, results, "Movido con su carpeta", move_folder)
+
+        pending = []
+        for file_doc in files:
+            if BatchService.inside(file_doc, moved):
+                results.append(BatchService._result(file_doc["_id"], "file", "skipped", "Movido con su carpeta"))
+            else:
+                pending.append(file_doc)
+        if pending:
+            await BatchService._move_files(pending, destination, results)
+        return BatchService._summary(results)
+
+    @staticmethod
+    async def _move_files(files: List[dict], destination: Optional[dict], results: List[dict]):
+        """Todos los archivos reciben la misma ubicación: una sola actualización"""
+        destination_id = destination["_id"] if destination else None
+        location = FolderService.child_location(destination)
+        try:
+            await file_collection.update_many(
+                {"_id": {"$in": [file_doc["_id"] for file_doc in files]}},
+                {"$set": {"folder_id": destination_id, **location}},
+            )
+        except Exception as e:
+            results.extend(BatchService._result(file_doc["_id"], "file", "error", str(e)) for file_doc in files)
+            return
+
+        deltas, rollups = {}, {}
+        for file_doc in files:
+            results.append(BatchService._result(file_doc["_id"], "file", "ok"))
+            if file_doc.get("folder_id") != destination_id:
+                owner = file_doc.get("owner")
+                source_key = FolderStatsService.key(file_doc.get("folder_id"), owner)
+                destination_key = FolderStatsService.key(destination_id, owner)
+                deltas.setdefault(source_key, {"files": 0})["files"] -= 1
+                deltas.setdefault(destination_key, {"files": 0})["files"] += 1
+                FolderRollupService.add_files(rollups, [file_doc], sign=-1)
+                FolderRollupService.add_files(rollups, [{**file_doc, **location}])
+        await FolderStatsService.adjust_many(deltas)
+        await FolderRollupService.apply(rollups, files[0].get("owner"))
+
+    @staticmethod
+    async def copy(
+        file_ids: List[str], folder_ids: List[str], destination_folder_id: Optional[str], current_user: dict
+    ) -> dict:
+        destination = await BatchService._load_destination(destination_folder_id, current_user)
+        folders, files, results = await BatchService.load_selection(file_ids, folder_ids, current_user)
+        owner = current_user.get("username")
+        await UsageService.check_quota(current_user, BatchService._copy_size(folders, files))
+
+        async def copy_folder(folder: dict):
+            if FolderService.runs_as_job(folder):
+                job = await FolderService.enqueue_copy(folder, destination, owner)
+                return {"status": "queued", "job_id": job["_id"], "new_id": job["params"]["copy_root_id"]}
+            copied = await FolderService.copy_into(folder, destination, owner)
+            if copied.get("failed"):
+                logger.warning("Copia incompleta de la carpeta %s: %s", folder["_id"], copied["failed"])
+            return {"new_id": copied["_id"]}
+
+        copied = await BatchService._each_folder(folders, results, "Copiado con su carpeta", copy_folder)
+
+        pending = []
+        for file_doc in files:
+            if BatchService.inside(file_doc, copied):
+                results.append(BatchService._result(file_doc["_id"], "file", "skipped", "Copiado con su carpeta"))
+            else:
+                pending.append(file_doc)
+        if pending:
+            await BatchService._copy_files(pending, destination, owner, results)
+        return BatchService._summary(results)
+
+    @staticmethod
+    def _copy_size(folders: List[dict], files: List[dict]) -> int:
+        """Bytes que añade copiar la selección; lo contenido en otra carpeta seleccionada se cuenta una sola vez"""
+        selected, size = set(), 0
+        for folder in folders:
+            if not BatchService.inside(folder, selected):
+                selected.add(folder["_id"])
+                size += folder.get("total_size", 0)
+        return size + sum(file_doc["size"] for file_doc in files if not BatchService.inside(file_doc, selected))
+
+    @staticmethod
+    async def _copy_files(files: List[dict], destination: Optional[dict], owner: str, results: List[dict]):
+        """Copias insertadas en lote; comparten el blob del original"""
+        docs = []
+        for file_doc in files:
+            docs.append({"_id": ObjectId(), **FileService.copy_metadata(file_doc, destination, owner)})
+        try:
+            await BlobService.acquire_many(doc["object_name"] for doc in docs)
+        except Exception as e:
+            results.extend(BatchService._result(file_doc["_id"], "file", "error", str(e)) for file_doc in files)
+            return
+
+        summary = {"files_copied": 0, "failed": []}
+        failed, _ = await FolderService.insert_copies(file_collection, docs, summary, "files_copied", "file")
+        errors = {entry["id"]: entry["error"] for entry in summary["failed"]}
+        for file_doc, doc in zip(files, docs):
+            if doc["_id"] in failed:
+                results.append(BatchService._result(file_doc["_id"], "file", "error", errors.get(str(doc["_id"]))))
+            else:
+                results.append(BatchService._result(file_doc["_id"], "file", "ok", new_id=doc["_id"]))
+        if failed:
+            await BlobService.release_many(doc["object_name"] for doc in docs if doc["_id"] in failed)
+        await FolderService.count_copies(
+            [{**doc, "folder_id": FolderStatsService.key(doc["folder_id"], owner)} for doc in docs],
+            failed,
+            "folder_id",
+            "files",
+        )
+
+    @staticmethod
+    async def delete(file_ids: List[str], folder_ids: List[str], current_user: dict) -> dict:
+        folders, files, results = await BatchService.load_selection(file_ids, folder_ids, current_user)
+
+        async def delete_folder(folder: dict):
+            if FolderService.runs_as_job(folder):
+                job = await FolderService.enqueue_delete(folder)
+                return {"status": "queued", "job_id": job["_id"]}
+            summary = await FolderService.delete_subtree(folder)
+            if summary["failed"]:
+                raise InternalServerException("Eliminación incompleta de la carpeta")
+
+        deleted = await BatchService._each_folder(folders, results, "Eliminado con su carpeta", delete_folder)
+
+        pending = []
+        for file_doc in files:
+            if BatchService.inside(file_doc, deleted):
+                results.append(BatchService._result(file_doc["_id"], "file", "skipped", "Eliminado con su carpeta"))
+            else:
+                pending.append(file_doc)
+        if pending:
+            await BatchService._delete_files(pending, results)
+        return BatchService._summary(results)
+
+    @staticmethod
+    async def _delete_files(files: List[dict], results: List[dict]):
+        """Mueve los archivos a la papelera con una sola escritura"""
+        try:
+            await TrashService.trash_files(files)
+        except Exception as e:
+            results.extend(BatchService._result(file_doc["_id"], "file", "error", str(e)) for file_doc in files)
+            return
+        results.extend(BatchService._result(file_doc["_id"], "file", "ok") for file_doc in files)
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.database import blob_collection, file_collection
+from app.storage import storage
+from app.utils.streams import LimitedReader
+from app.utils.thumbnails import is_thumbnail_source, rendition_name
+
+logger = logging.getLogger(__name__)
+
+
+class BlobService:
+    """Blobs de contenido direccionados por hash con conteo de referencias.
+
+    Cada documento de `blobs` usa como _id el object_name en el almacenamiento. Los blobs subidos
+    a través de la API se guardan en `blobs/<sha256>`, de modo que el contenido idéntico se almacena
+    una sola vez; los subidos directamente al almacenamiento (sesiones, URLs prefirmadas) conservan
+    su clave hasta que `python -m app.cli migrate-blobs` los re-indexa por hash.
+
+    Subir, copiar y eliminar archivos solo ajusta `refcount`. Un blob que llega a cero referencias
+    queda marcado con `orphaned_at` y el recolector lo elimina tras BLOB_GC_GRACE_SECONDS, lo que
+    evita carreras con una subida concurrente del mismo contenido.
+    """
+
+    PREFIX = "blobs/"
+
+    @staticmethod
+    def object_name_for(sha256: str) -> str:
+        return f"{BlobService.PREFIX}{sha256}"
+
+    @staticmethod
+    async def _acquire_ready(object_name: str, count: int = 1) -> bool:
+        result = await blob_collection.update_one(
+            {"_id": object_name, "state": {"$ne": "deleting"}},
+            {"$inc": {"refcount": count}, "$unset": {"orphaned_at": ""}},
+        )
+        return result.matched_count > 0
+
+    @staticmethod
+    async def store_stream(stream: BinaryIO, content_type: str, max_size: int, max_size_message: str) -> dict:
+        """Sube un stream calculando su SHA-256 en la misma pasada y lo registra como blob.
+
+        Devuelve el object_name del blob, el tamaño y el hash. Si el contenido ya existía, el objeto
+        temporal se elimina y solo se incrementa la referencia del blob existente.
+        """
+        temp_name = f"tmp/{ObjectId()}"
+        reader = LimitedReader(stream, max_size, max_size_message)
+        await storage.put_object(temp_name, reader, length=-1, content_type=content_type)
+
+        sha256 = reader.hexdigest()
+        object_name = BlobService.object_name_for(sha256)
+        try:
+            await BlobService._claim(object_name, temp_name, reader.bytes_read, content_type, sha256)
+        finally:
+            await storage.remove_object(temp_name)
+        return {"object_name": object_name, "size": reader.bytes_read, "sha256": sha256}
+
+    @staticmethod
+    async def _claim(object_name: str, source_name: str, size: int, content_type: str, sha256: str, count: int = 1):
+        """Añade `count` referencias al blob, creándolo a partir de `source_name` si aún no existe"""
+        while True:
+            if await BlobService._acquire_ready(object_name, count):
+                return
+            existing = await blob_collection.find_one({"_id": object_name}, {"state": 1})
+            if existing and existing.get("state") == "deleting":
+                # El recolector está borrando este blob; se espera a que termine para recrearlo
+                await asyncio.sleep(0.2)
+                continue
+            await storage.copy_object(object_name, source_name)
+            try:
+                await blob_collection.insert_one(
+                    {
+                        "_id": object_name,
+                        "sha256": sha256,
+                        "size": size,
+                        "content_type": content_type,
+                        "refcount": count,
+                        "state": "ready",
+                        "created_at": datetime.utcnow(),
+                    }
+                )
+                return
+            except DuplicateKeyError:
+                continue  # Otra subida concurrente registró el mismo contenido
+
+    @staticmethod
+    async def register(object_name: str, size: int, content_type: str):
+        """Registra un objeto existente (sin hash) como blob con una referencia"""
+        try:
+            await blob_collection.insert_one(
+                {
+                    "_id": object_name,
+                    "sha256": None,
+                    "size": size,
+                    "content_type": content_type,
+                    "refcount": 1,
+                    "state": "ready",
+                    "created_at": datetime.utcnow(),
+                }
+            )
+        except DuplicateKeyError:
+            await BlobService._acquire_ready(object_name)
+
+    @staticmethod
+    async def is_registered(object_name: str) -> bool:
+        return await blob_collection.find_one({"_id": object_name}, {"_id": 1}) is not None
+
+    @staticmethod
+    async def acquire(object_name: str, count: int = 1):
+        """Añade referencias a un blob (copias de archivos)"""
+        while not await BlobService._acquire_ready(object_name, count):
+            try:
+                # Objeto anterior a la tabla de blobs: tiene exactamente una referencia previa
+                await blob_collection.insert_one(
+                    {
+                        "_id": object_name,
+                        "sha256": None,
+                        "refcount": 1 + count,
+                        "state": "ready",
+                        "created_at": datetime.utcnow(),
+                    }
+                )
+                return
+            except DuplicateKeyError:
+                await asyncio.sleep(0.05)
+
+    @staticmethod
+    async def acquire_many(object_names: Iterable[str]):
+        """Añade una referencia por cada aparición de object_name en lote"""
+        counts = {}
+        for name in object_names:
+            counts[name] = counts.get(name, 0) + 1
+        if not counts:
+            return
+        result = await blob_collection.bulk_write(
+            [
+                UpdateOne({"_id": name, "state": {"$ne": "deleting"}}, {"$inc": {"refcount": n}})
+                for name, n in counts.items()
+            ],
+            ordered=False,
+        )
+        if result.matched_count < len(counts):
+            existing = await blob_collection.distinct("_id", {"_id": {"$in": list(counts)}, "state": "ready"})
+            for name in set(counts) - set(existing):
+                await BlobService.acquire(name, counts[name])
+
+    @staticmethod
+    async def release(object_name: str, count: int = 1):
+        await BlobService.release_many([object_name] * count)
+
+    @staticmethod
+    async def release_many(object_names: Iterable[str]):
+        """Quita una referencia por cada aparición de object_name; los que quedan a cero pasan a huérfanos"""
+        counts = {}
+        for name in object_names:
+            counts[name] = counts.get(name, 0) + 1
+        if not counts:
+            return
+        now = datetime.utcnow()
+        await blob_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": name},
+                    {"$inc": {"refcount": -n}, "$setOnInsert": {"sha256": None, "state": "ready", "created_at": now}},
+                    # Los objetos anteriores a la tabla de blobs se registran ya sin referencias
+                    upsert=True,
+                )
+                for name, n in counts.items()
+            ],
+            ordered=False,
+        )
+        await blob_collection.update_many(
+            {"_id": {"$in": list(counts)}, "refcount": {"$lte": 0}, "orphaned_at": {"$exists": False}},
+            {"$set": {"orphaned_at": now}},
+        )
+
+    @staticmethod
+    async def collect_garbage(now: Optional[datetime] = None, batch_size: int = 1000) -> dict:
+        """Elimina del almacenamiento, en lotes multi-objeto, los blobs huérfanos tras el periodo de gracia"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.BLOB_GC_GRACE_SECONDS)
+        summary = {"removed": 0, "failed": []}
+        while True:
+            candidates = await blob_collection.find(
+                {"refcount": {"$lte": 0}, "orphaned_at": {"$lt": cutoff}, "state": "ready"},
+                {"_id": 1, "content_type": 1},
+            ).to_list(batch_size)
+            if not candidates:
+                break
+            ids = [doc["_id"] for doc in candidates]
+            # Solo se borran los que siguen sin referencias en el momento de marcarlos
+            await blob_collection.update_many(
+                {"_id": {"$in": ids}, "refcount": {"$lte": 0}, "state": "ready"}, {"$set": {"state": "deleting"}}
+            )
+            deleting = await blob_collection.distinct("_id", {"_id": {"$in": ids}, "state": "deleting"})
+            removed = await BlobService._remove_objects(deleting, summary)
+            await blob_collection.delete_many({"_id": {"$in": removed}})
+            await BlobService._remove_thumbnails(removed, candidates)
+            summary["removed"] += len(removed)
+            if len(candidates) < batch_size:
+                break
+        return summary
+
+    @staticmethod
+    async def _remove_objects(object_names: List[str], summary: dict) -> List[str]:
+        failed = set(await storage.remove_objects(object_names))
+        if failed:
+            # Se reintentan en la siguiente pasada del recolector
+            await blob_collection.update_many({"_id": {"$in": list(failed)}}, {"$set": {"state": "ready"}})
+            summary["failed"].extend(sorted(failed))
+        return [name for name in object_names if name not in failed]
+
+    @staticmethod
+    async def _remove_thumbnails(removed: List[str], candidates: List[dict]):
+        """Elimina las miniaturas derivadas de los blobs borrados (los de tipo desconocido incluidos)"""
+        content_types = {doc["_id"]: doc.get("content_type") for doc in candidates}
+        names = [
+            rendition_name(object_name, size)
+            for object_name in removed
+            if content_types.get(object_name) is None or is_thumbnail_source(content_types[object_name])
+            for size in settings.THUMBNAIL_SIZES
+        ]
+        failed = await storage.remove_objects(names)
+        if failed:
+            # Sin el blob nadie las referencia; solo ocupan espacio
+            logger.warning("No se pudieron eliminar %d miniaturas huérfanas", len(failed))
+
+    @staticmethod
+    async def migrate_legacy_objects(limit: Optional[int] = None) -> dict:
+        """Re-indexa por hash los objetos que no están en `blobs/`.
+
+        Cada objeto se lee una vez para calcular su SHA-256, se copia a `blobs/<sha256>` (o se reutiliza
+        el blob existente) y los archivos que lo referencian pasan a apuntar a la nueva clave. El objeto
+        antiguo pierde sus referencias y lo elimina el recolector tras el periodo de gracia.
+        """
+        summary = {"migrated": 0, "deduplicated": 0, "files_updated": 0, "failed": []}
+        pipeline = [
+            {"$match": {"object_name": {"$not": {"$regex": f"^{BlobService.PREFIX}"}}}},
+            {"$group": {"_id": "$object_name", "count": {"$sum": 1}, "file_type": {"$first": "$file_type"}}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+
+        async for group in file_collection.aggregate(pipeline, allowDiskUse=True):
+            old_name, count = group["_id"], group["count"]
+            try:
+                sha256 = hashlib.sha256()
+                size = 0
+                response = await storage.get_object(old_name)
+                async for chunk in storage.iter_response(response, chunk_size=1024 * 1024):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                digest = sha256.hexdigest()
+                new_name = BlobService.object_name_for(digest)
+
+                if await blob_collection.find_one({"_id": new_name, "state": "ready"}, {"_id": 1}):
+                    summary["deduplicated"] += 1
+                await BlobService._claim(new_name, old_name, size, group.get("file_type"), digest, count=count)
+
+                result = await file_collection.update_many(
+                    {"object_name": old_name},
+                    {
+                        "$set": {"object_name": new_name, "content_hash": digest, "etag": digest},
+                        # Las miniaturas cuelgan del blob antiguo y se eliminan con él
+                        "$unset": {"thumbnails": ""},
+                    },
+                )
+                await BlobService.release(old_name, count)
+                summary["migrated"] += 1
+                summary["files_updated"] += result.modified_count
+            except Exception as e:
+                summary["failed"].append({"object_name": old_name, "error": str(e)})
+        return summary
@@ -1,72 +1,227 @@
-from datetime import datetime
-from typing import List, Optional
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from bson import ObjectId
 from fastapi import UploadFile
-from minio.api import CopySource
+from pymongo.errors import BulkWriteError
 
 from app.config import settings
-from app.database import file_collection, folder_collection, minio_client
+from app.database import file_collection, folder_collection
 from app.models.file import CopyFile, FileMetadata, MoveFile, UpdateFileName
 from app.services.auth_service import AuthService
 from app.services.base_service import BaseService
-from app.utils.exceptions import InternalServerException, NotFoundException, ValidationException
+from app.services.blob_service import BlobService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_service import FolderService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.trash_service import TrashService
+from app.services.usage_service import UsageService
+from app.storage import storage
+from app.utils.cache import TTLCache
+from app.utils.exceptions import (
+    AppException,
+    InternalServerException,
+    NotFoundException,
+    QuotaExceededException,
+    ValidationException,
+)
+from app.utils.http import content_disposition
+from app.utils.pagination import FILE_SORT_FIELDS, check_cursor, cursor_for, decode_cursor, keyset_filter, sort_spec
+from app.utils.search import query_terms, search_fields
+from app.utils.text import decode_text
 from app.utils.validators import validate_object_id
 
+# Vistas previas de texto por (objeto, bytes leídos); el contenido de un objeto no cambia
+preview_cache = TTLCache(settings.PREVIEW_CACHE_SIZE, settings.PREVIEW_CACHE_TTL_SECONDS)
+
 
 class FileService(BaseService):
+    # Tipos que el navegador puede mostrar directamente con Content-Disposition: inline
+    INLINE_TYPES = [
+        "application/pdf",
+        "image/jpeg",
+        "image/png",
+        "image/gif",
+        "image/webp",
+        "image/svg+xml",
+    ]
+
     @staticmethod
     async def upload_file(file: UploadFile, current_user: dict, folder_id: Optional[str] = None) -> dict:
         if not file.filename:
             raise ValidationException("El archivo debe tener un nombre")
 
-        folder_path = "/"
-        if folder_id:
-            folder_oid = validate_object_id(folder_id, "ID de carpeta")
-            folder = await folder_collection.find_one({"_id": folder_oid})
-            FileService._check_ownership(folder, current_user, "Carpeta no encontrada")
-            folder_path = folder["path"]
-
-        contents = await file.read()
-        if len(contents) > settings.MAX_FILE_SIZE:
-            raise ValidationException("El archivo es demasiado grande (máximo 50MB)")
-
+        folder = await FileService._upload_folder(folder_id, current_user)
+        # La cuota se comprueba antes de enviar ningún byte al almacenamiento
+        remaining = await UsageService.check_quota(current_user, file.size or 0)
         try:
-            object_name = f"{ObjectId()}-{file.filename}"
-
-            await file.seek(0)
-
-            minio_client.put_object(
-                settings.BUCKET_NAME,
-                object_name,
-                data=file.file,
-                length=len(contents),
-                content_type=file.content_type or "application/octet-stream",
-            )
-
-            file_metadata = {
-                "filename": file.filename,
-                "size": len(contents),
-                "upload_date": datetime.utcnow(),
-                "file_type": file.content_type or "application/octet-stream",
-                "object_name": object_name,
-                "folder_id": ObjectId(folder_id) if folder_id else None,
-                "path": folder_path,
-                "owner": current_user.get("username"),
-            }
-
-            result = await file_collection.insert_one(file_metadata)
+            file_metadata = await FileService._store_upload(file, folder, current_user, remaining)
+            try:
+                result = await file_collection.insert_one(file_metadata)
+            except Exception:
+                # Sin metadatos, la referencia añadida al subir el contenido ya no se usa
+                await BlobService.release(file_metadata["object_name"])
+                raise
+            await FolderStatsService.adjust(file_metadata["folder_id"], file_metadata["owner"], files=1)
+            await UsageService.files_added([file_metadata])
+            await FolderRollupService.files_changed([file_metadata])
             created_file = await file_collection.find_one({"_id": result.inserted_id})
             return created_file
 
+        except AppException:
+            raise
         except Exception as e:
             raise InternalServerException(f"Error al subir el archivo: {str(e)}")
 
+    @staticmethod
+    async def _upload_folder(folder_id: Optional[str], current_user: dict) -> Optional[dict]:
+        """Carpeta destino de una subida (None para la raíz)"""
+        if not folder_id:
+            return None
+        folder_oid = validate_object_id(folder_id, "ID de carpeta")
+        folder = await folder_collection.find_one({"_id": folder_oid})
+        FileService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        return folder
+
+    @staticmethod
+    async def _store_upload(
+        file: UploadFile, folder: Optional[dict], current_user: dict, remaining_quota: Optional[int] = None
+    ) -> dict:
+        """Sube el contenido al almacenamiento y devuelve los metadatos del archivo, aún sin insertar.
+
+        `remaining_quota` cubre las subidas sin tamaño declarado: si el contenido no cabía, el blob se libera.
+        """
+        max_size_message = f"El archivo es demasiado grande (máximo {settings.MAX_FILE_SIZE // (1024 * 1024)}MB)"
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise ValidationException(max_size_message)
+
+        # El contenido se envía en partes de tamaño fijo (memoria acotada a UPLOAD_PART_SIZE)
+        # y se calcula su hash en la misma pasada para deduplicarlo
+        content_type = file.content_type or "application/octet-stream"
+        blob = await BlobService.store_stream(file.file, content_type, settings.MAX_FILE_SIZE, max_size_message)
+        if remaining_quota is not None and blob["size"] > remaining_quota:
+            await BlobService.release(blob["object_name"])
+            raise QuotaExceededException()
+
+        location = FolderService.child_location(folder)
+        return {
+            "filename": file.filename,
+            "size": blob["size"],
+            "upload_date": datetime.utcnow(),
+            "file_type": content_type,
+            "object_name": blob["object_name"],
+            "folder_id": folder["_id"] if folder else None,
+            "path": location["path"],
+            "ancestors": location["ancestors"],
+            "owner": current_user.get("username"),
+            "etag": blob["sha256"],
+            "content_hash": blob["sha256"],
+            **search_fields(file.filename),
+        }
+
+    @staticmethod
+    def _upload_results(files: List[UploadFile], stored: list) -> Tuple[List[dict], List[dict], List[int]]:
+        """Resultado por archivo de una subida múltiple y metadatos (con su posición) de los que se almacenaron"""
+        results = [{"filename": file.filename or "", "status": "ok", "detail": None, "file": None} for file in files]
+        docs, positions = [], []
+        for position, outcome in enumerate(stored):
+            if isinstance(outcome, BaseException):
+                detail = (
+                    outcome.detail if isinstance(outcome, AppException) else f"Error al subir el archivo: {outcome}"
+                )
+                results[position].update(status="error", detail=detail)
+            else:
+                docs.append(outcome)
+                positions.append(position)
+        return results, docs, positions
+
+    @staticmethod
+    async def _insert_uploads(docs: List[dict]) -> Dict[int, str]:
+        """Inserta los metadatos con un solo insert_many y devuelve los errores por índice en `docs`"""
+        failed = {}
+        if docs:
+            try:
+                await file_collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error.get("errmsg") for error in e.details.get("writeErrors", [])}
+            except Exception as e:
+                failed = {index: str(e) for index in range(len(docs))}
+
+        unused = [doc["object_name"] for index, doc in enumerate(docs) if index in failed]
+        if unused:
+            # Sin metadatos, las referencias añadidas al subir el contenido ya no se usan
+            await BlobService.release_many(unused)
+        return failed
+
+    @staticmethod
+    async def upload_files(files: List[UploadFile], current_user: dict, folder_id: Optional[str] = None) -> dict:
+        """Sube varios archivos a la misma carpeta en una sola petición.
+
+        La carpeta se resuelve una vez, el contenido se envía al almacenamiento con concurrencia
+        acotada (UPLOAD_CONCURRENCY) y los metadatos se insertan con un solo insert_many. Un archivo
+        que falla se reporta en su resultado sin afectar al resto.
+        """
+        if len(files) > settings.MAX_FILES_PER_UPLOAD:
+            raise ValidationException(f"Se pueden subir como máximo {settings.MAX_FILES_PER_UPLOAD} archivos a la vez")
+        folder = await FileService._upload_folder(folder_id, current_user)
+        remaining = await UsageService.check_quota(current_user, sum(file.size or 0 for file in files))
+
+        semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+        # Bytes ya aceptados en la petición: el tamaño declarado de un archivo puede faltar o ser menor que su contenido
+        consumed = 0
+
+        async def store(file: UploadFile) -> dict:
+            nonlocal consumed
+            if not file.filename:
+                raise ValidationException("El archivo debe tener un nombre")
+            async with semaphore:
+                available = None if remaining is None else remaining - consumed
+                file_metadata = await FileService._store_upload(file, folder, current_user, available)
+                if remaining is not None:
+                    # Otras subidas de la petición pudieron terminar mientras se enviaba este contenido
+                    consumed += file_metadata["size"]
+                    if consumed > remaining:
+                        consumed -= file_metadata["size"]
+                        await BlobService.release(file_metadata["object_name"])
+                        raise QuotaExceededException()
+                return file_metadata
+
+        stored = await asyncio.gather(*(store(file) for file in files), return_exceptions=True)
+
+        results, docs, positions = FileService._upload_results(files, stored)
+        failed = await FileService._insert_uploads(docs)
+        for index, (doc, position) in enumerate(zip(docs, positions)):
+            if index in failed:
+                results[position].update(status="error", detail=f"Error al guardar el archivo: {failed[index]}")
+            else:
+                results[position]["file"] = doc
+
+        inserted = len(docs) - len(failed)
+        if inserted:
+            await FolderStatsService.adjust(
+                folder["_id"] if folder else None, current_user.get("username"), files=inserted
+            )
+            inserted_docs = [doc for index, doc in enumerate(docs) if index not in failed]
+            await UsageService.files_added(inserted_docs)
+            await FolderRollupService.files_changed(inserted_docs)
+
+        succeeded = sum(1 for result in results if result["status"] == "ok")
+        return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
     @staticmethod
     async def list_files(
-        current_user: dict, folder_id: Optional[str] = None, search: Optional[str] = None
+        current_user: dict,
+        folder_id: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
     ) -> List[dict]:
-        query = {}
+        """Página de archivos ordenada; la siguiente se pide con el cursor de FileService.next_cursor"""
+        # Los archivos de la papelera no aparecen en ningún listado (deleted_at forma parte de los índices)
+        query = {"deleted_at": None}
 
         if not AuthService.is_admin(current_user):
             query["owner"] = current_user.get("username")
@@ -79,115 +234,205 @@ class FileService(BaseService):
                 query["folder_id"] = folder_oid
 
         if search:
-            query["filename"] = {"$regex": search, "$options": "i"}
-
-        files = await file_collection.find(query).to_list(1000)
+            # Búsqueda por prefijos de palabra sobre el índice de search_terms (ver SearchService)
+            query["search_terms"] = {"$all": query_terms(search)}
+
+        after = check_cursor(decode_cursor(cursor), sort, order) if cursor else None
+        field = FILE_SORT_FIELDS[sort]
+        files = (
+            await file_collection.find(keyset_filter(query, field, order, after))
+            .sort(sort_spec(field, order))
+            .to_list(limit)
+        )
         return files
 
+    @staticmethod
+    def next_cursor(files: List[dict], limit: int, sort: str = "name", order: str = "asc") -> Optional[str]:
+        """Cursor de la página siguiente, o None si la página no está completa"""
+        if len(files) < limit:
+            return None
+        return cursor_for(files[-1], FILE_SORT_FIELDS[sort], sort=sort, order=order)
+
     @staticmethod
     async def get_file(file_id: str, current_user: dict) -> dict:
         file_oid = validate_object_id(file_id, "ID de archivo")
-        file_doc = await file_collection.find_one({"_id": file_oid})
+        file_doc = await file_collection.find_one({"_id": file_oid, "deleted_at": None})
         FileService._check_ownership(file_doc, current_user, "Archivo no encontrado")
         return file_doc
 
     @staticmethod
     async def update_filename(file_id: str, update_data: UpdateFileName, current_user: dict) -> dict:
         file_oid = validate_object_id(file_id, "ID de archivo")
-        file_doc = await file_collection.find_one({"_id": file_oid})
+        file_doc = await file_collection.find_one({"_id": file_oid, "deleted_at": None})
         FileService._check_ownership(file_doc, current_user, "Archivo no encontrado")
 
         update_result = await file_collection.update_one(
-            {"_id": file_oid}, {"$set": {"filename": update_data.new_filename}}
+            {"_id": file_oid},
+            {"$set": {"filename": update_data.new_filename, **search_fields(update_data.new_filename)}},
         )
 
         if update_result.matched_count == 0:
             raise NotFoundException("Archivo no encontrado")
+        await FolderStatsService.touch(file_doc.get("folder_id"), file_doc.get("owner"))
 
         updated_file = await file_collection.find_one({"_id": file_oid})
         return updated_file
 
     @staticmethod
     async def delete_file(file_id: str, current_user: dict):
+        """Mueve el archivo a la papelera; el recolector lo elimina definitivamente al vencer"""
         file_oid = validate_object_id(file_id, "ID de archivo")
-        file_doc = await file_collection.find_one({"_id": file_oid})
+        file_doc = await file_collection.find_one({"_id": file_oid, "deleted_at": None})
         FileService._check_ownership(file_doc, current_user, "Archivo no encontrado")
 
         try:
-            minio_client.remove_object(settings.BUCKET_NAME, file_doc["object_name"])
-            await file_collection.delete_one({"_id": file_oid})
+            await TrashService.trash_files([file_doc])
         except Exception as e:
             raise InternalServerException(f"Error al eliminar el archivo: {str(e)}")
 
     @staticmethod
-    def get_file_stream(file_doc: dict):
+    def get_etag(file_doc: dict) -> str:
+        """ETag estable del contenido; los archivos sin ETag almacenado usan uno derivado del objeto"""
+        if file_doc.get("etag"):
+            return file_doc["etag"]
+        return hashlib.md5(f"{file_doc['object_name']}:{file_doc['size']}".encode()).hexdigest()
+
+    @staticmethod
+    async def get_download_url(file_id: str, current_user: dict, inline: bool = False) -> dict:
+        """Valida la propiedad del archivo y devuelve una URL prefirmada de corta duración"""
+        file_doc = await FileService.get_file(file_id, current_user)
+        expires_seconds = settings.PRESIGNED_URL_EXPIRE_SECONDS
+        url = storage.presigned_get_url(
+            file_doc["object_name"],
+            expires_seconds,
+            response_headers={
+                "response-content-type": file_doc["file_type"],
+                "response-content-disposition": content_disposition(
+                    file_doc["filename"], inline=inline and file_doc["file_type"] in FileService.INLINE_TYPES
+                ),
+            },
+        )
+        return {"url": url, "expires_at": datetime.utcnow() + timedelta(seconds=expires_seconds)}
+
+    @staticmethod
+    async def get_file_stream(file_doc: dict, offset: int = 0, length: int = 0):
         try:
-            return minio_client.get_object(settings.BUCKET_NAME, file_doc["object_name"])
+            return await storage.get_object(file_doc["object_name"], offset=offset, length=length)
         except Exception as e:
             raise InternalServerException(f"Error al descargar el archivo: {str(e)}")
 
+    @staticmethod
+    async def get_text_preview(file_id: str, current_user: dict, max_bytes: Optional[int] = None) -> dict:
+        """Primeros `max_bytes` del archivo decodificados como texto, sin descargarlo entero.
+
+        Solo se lee ese rango del almacenamiento; `truncated` indica si el archivo sigue y `size` es
+        su tamaño total.
+        """
+        file_doc = await FileService.get_file(file_id, current_user)
+        max_bytes = max_bytes or settings.PREVIEW_MAX_BYTES
+        key = (file_doc["object_name"], max_bytes)
+        preview = preview_cache.get(key)
+        if preview is None:
+            size = file_doc["size"]
+            truncated = size > max_bytes
+            data = bytearray()
+            if size:
+                response = await FileService.get_file_stream(file_doc, length=min(size, max_bytes))
+                async for chunk in storage.iter_response(response):
+                    data += chunk
+            text, encoding = decode_text(bytes(data[:max_bytes]), truncated, file_doc.get("file_type"))
+            preview = {"text": text, "encoding": encoding, "truncated": truncated, "size": size}
+            preview_cache.set(key, preview)
+        return preview
+
     @staticmethod
     async def move_file(file_id: str, folder_id: Optional[str], current_user: dict) -> dict:
         file_oid = validate_object_id(file_id, "ID de archivo")
-        file_doc = await file_collection.find_one({"_id": file_oid})
+        file_doc = await file_collection.find_one({"_id": file_oid, "deleted_at": None})
         FileService._check_ownership(file_doc, current_user, "Archivo no encontrado")
 
-        new_folder_path = "/"
+        folder = None
         if folder_id and folder_id != "root":
             folder_oid = validate_object_id(folder_id, "ID de carpeta destino")
             folder = await folder_collection.find_one({"_id": folder_oid})
             FileService._check_ownership(folder, current_user, "Carpeta destino no encontrada")
-            new_folder_path = folder["path"]
             folder_id = folder_oid
         else:
             folder_id = None
+        location = FolderService.child_location(folder)
 
         update_result = await file_collection.update_one(
-            {"_id": file_oid}, {"$set": {"folder_id": folder_id, "path": new_folder_path}}
+            {"_id": file_oid}, {"$set": {"folder_id": folder_id, **location}}
         )
 
         if update_result.matched_count == 0:
             raise NotFoundException("Archivo no encontrado")
 
+        if file_doc.get("folder_id") != folder_id:
+            owner = file_doc.get("owner")
+            await FolderStatsService.adjust_many(
+                {
+                    FolderStatsService.key(file_doc.get("folder_id"), owner): {"files": -1},
+                    FolderStatsService.key(folder_id, owner): {"files": 1},
+                }
+            )
+            # Las carpetas comunes a ambas ubicaciones se compensan y no se escriben
+            rollups = FolderRollupService.add_files({}, [file_doc], sign=-1)
+            FolderRollupService.add_files(rollups, [{**file_doc, **location}])
+            await FolderRollupService.apply(rollups, owner)
+
         updated_file = await file_collection.find_one({"_id": file_oid})
         return updated_file
 
+    @staticmethod
+    def copy_metadata(file_doc: dict, folder: Optional[dict], owner: str) -> dict:
+        """Metadatos de una copia de `file_doc` dentro de `folder` (None para la raíz); comparte el blob"""
+        location = FolderService.child_location(folder)
+        return {
+            "filename": file_doc["filename"],
+            "size": file_doc["size"],
+            "upload_date": datetime.utcnow(),
+            "file_type": file_doc["file_type"],
+            "object_name": file_doc["object_name"],
+            "folder_id": folder["_id"] if folder else None,
+            "path": location["path"],
+            "ancestors": location["ancestors"],
+            "owner": owner,
+            "etag": file_doc.get("etag"),
+            "content_hash": file_doc.get("content_hash"),
+            "thumbnails": file_doc.get("thumbnails"),
+            **search_fields(file_doc["filename"]),
+        }
+
     @staticmethod
     async def copy_file(file_id: str, folder_id: Optional[str], current_user: dict) -> dict:
         file_oid = validate_object_id(file_id, "ID de archivo")
-        file_doc = await file_collection.find_one({"_id": file_oid})
+        file_doc = await file_collection.find_one({"_id": file_oid, "deleted_at": None})
         FileService._check_ownership(file_doc, current_user, "Archivo no encontrado")
 
-        new_folder_path = "/"
+        folder = None
         if folder_id and folder_id != "root":
             folder_oid = validate_object_id(folder_id, "ID de carpeta destino")
             folder = await folder_collection.find_one({"_id": folder_oid})
             FileService._check_ownership(folder, current_user, "Carpeta destino no encontrada")
-            new_folder_path = folder["path"]
             folder_id = folder_oid
         else:
             folder_id = None
+        await UsageService.check_quota(current_user, file_doc["size"])
 
         try:
-            original_object_name = file_doc["object_name"]
-            new_object_name = f"{ObjectId()}-{file_doc['filename']}"
-
-            minio_client.copy_object(
-                settings.BUCKET_NAME, new_object_name, CopySource(settings.BUCKET_NAME, original_object_name)
-            )
-
-            new_file_metadata = {
-                "filename": file_doc["filename"],
-                "size": file_doc["size"],
-                "upload_date": datetime.utcnow(),
-                "file_type": file_doc["file_type"],
-                "object_name": new_object_name,
-                "folder_id": folder_id,
-                "path": new_folder_path,
-                "owner": current_user.get("username"),
-            }
-
-            result = await file_collection.insert_one(new_file_metadata)
+            # La copia comparte el blob del original: solo se añade una referencia
+            await BlobService.acquire(file_doc["object_name"])
+
+            new_file_metadata = FileService.copy_metadata(file_doc, folder, current_user.get("username"))
+            try:
+                result = await file_collection.insert_one(new_file_metadata)
+            except Exception:
+                await BlobService.release(file_doc["object_name"])
+                raise
+            await FolderStatsService.adjust(folder_id, new_file_metadata["owner"], files=1)
+            await UsageService.files_added([new_file_metadata])
+            await FolderRollupService.files_changed([new_file_metadata])
             copied_file = await file_collection.find_one({"_id": result.inserted_id})
             return copied_file
 
@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import file_collection, folder_collection
+from app.services.folder_stats_service import FolderStatsService
+
+ROLLUP_FIELDS = ("total_size", "file_count", "folder_count")
+
+RollupDeltas = Dict[ObjectId, Dict[str, int]]
+
+
+class FolderRollupService:
+    """Totales recursivos de cada carpeta guardados en su propio documento.
+
+    `total_size`, `file_count` y `folder_count` cuentan todo el subárbol. Cada elemento que se crea o
+    se elimina suma o resta en todas las carpetas de su `ancestors` (que ya incluye a su carpeta
+    directa), así que una operación se traduce en una sola escritura en lote sobre las carpetas
+    afectadas y los listados devuelven los tamaños sin consultas adicionales. Los datos anteriores se
+    calculan con `python -m app.cli rebuild-folder-rollups`.
+    """
+
+    @staticmethod
+    def add_files(deltas: RollupDeltas, file_docs: Iterable[dict], sign: int = 1) -> RollupDeltas:
+        for file_doc in file_docs:
+            for ancestor in file_doc.get("ancestors", []):
+                delta = deltas.setdefault(ancestor, {})
+                delta["total_size"] = delta.get("total_size", 0) + sign * file_doc.get("size", 0)
+                delta["file_count"] = delta.get("file_count", 0) + sign
+        return deltas
+
+    @staticmethod
+    def add_folders(deltas: RollupDeltas, ancestors: List[ObjectId], count: int = 1) -> RollupDeltas:
+        """Carpetas vacías creadas (o eliminadas, con count negativo) bajo `ancestors`"""
+        for ancestor in ancestors:
+            delta = deltas.setdefault(ancestor, {})
+            delta["folder_count"] = delta.get("folder_count", 0) + count
+        return deltas
+
+    @staticmethod
+    def add_subtree(deltas: RollupDeltas, folder: dict, ancestors: List[ObjectId], sign: int = 1) -> RollupDeltas:
+        """Una carpeta con todo su contenido que entra en (o sale de) `ancestors`"""
+        for ancestor in ancestors:
+            delta = deltas.setdefault(ancestor, {})
+            delta["total_size"] = delta.get("total_size", 0) + sign * folder.get("total_size", 0)
+            delta["file_count"] = delta.get("file_count", 0) + sign * folder.get("file_count", 0)
+            delta["folder_count"] = delta.get("folder_count", 0) + sign * (folder.get("folder_count", 0) + 1)
+        return deltas
+
+    @staticmethod
+    async def apply(deltas: RollupDeltas, owner: Optional[str] = None):
+        """Escribe los incrementos en una sola operación en lote.
+
+        Los listados que muestran estas carpetas (las propias carpetas afectadas y la raíz de `owner`)
+        cambian de versión para que su caché no sirva tamaños antiguos.
+        """
+        increments = {}
+        for folder_id, delta in deltas.items():
+            inc = {field: value for field, value in delta.items() if value}
+            if inc:
+                increments[folder_id] = inc
+        if not increments:
+            return
+        operations = [UpdateOne({"_id": folder_id}, {"$inc": inc}) for folder_id, inc in increments.items()]
+        await folder_collection.bulk_write(operations, ordered=False)
+        keys = list(increments)
+        if owner is not None:
+            keys.append(FolderStatsService.key(None, owner))
+        await FolderStatsService.touch_many(keys)
+
+    @staticmethod
+    async def files_changed(file_docs: Iterable[dict], sign: int = 1, owner: Optional[str] = None):
+        file_docs = list(file_docs)
+        if owner is None and file_docs:
+            owner = file_docs[0].get("owner")
+        await FolderRollupService.apply(FolderRollupService.add_files({}, file_docs, sign), owner)
+
+    @staticmethod
+    async def rebuild() -> dict:
+        """Recalcula los totales de todas las carpetas a partir de los archivos y carpetas existentes"""
+        totals: Dict[ObjectId, Dict[str, int]] = {}
+        file_pipeline = [
+            {"$match": {"deleted_at": None}},
+            {"$unwind": "$ancestors"},
+            {"$group": {"_id": "$ancestors", "total_size": {"$sum": "$size"}, "file_count": {"$sum": 1}}},
+        ]
+        async for group in file_collection.aggregate(file_pipeline, allowDiskUse=True):
+            totals.setdefault(group["_id"], {}).update(total_size=group["total_size"], file_count=group["file_count"])
+        folder_pipeline = [{"$unwind": "$ancestors"}, {"$group": {"_id": "$ancestors", "folder_count": {"$sum": 1}}}]
+        async for group in folder_collection.aggregate(folder_pipeline, allowDiskUse=True):
+            totals.setdefault(group["_id"], {})["folder_count"] = group["folder_count"]
+
+        await folder_collection.update_many({}, {"$set": {field: 0 for field in ROLLUP_FIELDS}})
+        operations = [UpdateOne({"_id": folder_id}, {"$set": values}) for folder_id, values in totals.items()]
+        for start in range(0, len(operations), 1000):
+            await folder_collection.bulk_write(operations[start : start + 1000], ordered=False)
+        return {"folders_updated": len(operations)}
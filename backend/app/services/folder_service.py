@@ -1,19 +1,61 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
 from datetime import datetime
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 from bson import ObjectId
-from minio.api import CopySource
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from app.config import settings
-from app.database import file_collection, folder_collection, minio_client
+from app.database import file_collection, folder_collection
 from app.models.folder import CreateFolder, FolderMetadata
 from app.services.auth_service import AuthService
 from app.services.base_service import BaseService
+from app.services.blob_service import BlobService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.job_service import JobService
+from app.services.usage_service import UsageService
+from app.utils.cache import TTLCache
 from app.utils.exceptions import ConflictException, InternalServerException, NotFoundException, ValidationException
+from app.utils.pagination import (
+    FILE_SORT_FIELDS,
+    FOLDER_SORT_FIELDS,
+    check_cursor,
+    cursor_for,
+    decode_cursor,
+    keyset_filter,
+    sort_spec,
+)
+from app.utils.search import search_fields
 from app.utils.validators import validate_object_id
 
+logger = logging.getLogger(__name__)
+
+# Páginas de contenido de carpeta ya calculadas, indexadas por su ETag (carpeta, versión, ámbito y página)
+content_cache = TTLCache(settings.FOLDER_CONTENT_CACHE_SIZE, settings.FOLDER_CONTENT_CACHE_TTL_SECONDS)
+
+# Punto de control de un trabajo en segundo plano: recibe el resumen parcial y puede detener la operación
+Checkpoint = Optional[Callable[[dict], Awaitable[None]]]
+
 
 class FolderService(BaseService):
+    @staticmethod
+    def child_location(folder: Optional[dict]) -> dict:
+        """Ruta y ancestros de un elemento contenido directamente en `folder` (None para la raíz).
+
+        Cada carpeta y archivo guarda en `ancestors` los IDs de todas las carpetas que lo contienen,
+        de la raíz hacia abajo; así un subárbol completo se consulta o actualiza con un solo filtro
+        `{"ancestors": folder_id}`.
+        """
+        if folder is None:
+            return {"path": "/", "ancestors": []}
+        return {"path": folder["path"], "ancestors": folder.get("ancestors", []) + [folder["_id"]]}
+
     @staticmethod
     async def create_folder(folder_data: CreateFolder, current_user: dict) -> dict:
         query = {"name": folder_data.name, "owner": current_user.get("username")}
@@ -27,28 +69,46 @@ class FolderService(BaseService):
         if existing_folder:
             raise ConflictException("Ya existe una carpeta con ese nombre en este directorio")
 
-        parent_path = "/"
+        parent_folder = None
         if folder_data.parent_folder_id:
             parent_folder = await folder_collection.find_one({"_id": parent_oid})
             FolderService._check_ownership(parent_folder, current_user, "Carpeta padre no encontrada")
-            parent_path = parent_folder["path"]
 
-        new_path = f"{parent_path.rstrip('/')}/{folder_data.name}/"
+        location = FolderService.child_location(parent_folder)
+        new_path = f"{location['path'].rstrip('/')}/{folder_data.name}/"
 
         folder_metadata = {
             "name": folder_data.name,
             "parent_folder_id": ObjectId(folder_data.parent_folder_id) if folder_data.parent_folder_id else None,
             "created_date": datetime.utcnow(),
             "path": new_path,
+            "ancestors": location["ancestors"],
             "owner": current_user.get("username"),
         }
 
-        result = await folder_collection.insert_one(folder_metadata)
+        try:
+            result = await folder_collection.insert_one(folder_metadata)
+        except DuplicateKeyError:
+            # Creación concurrente con el mismo nombre (índice owner_parent_name_unique)
+            raise ConflictException("Ya existe una carpeta con ese nombre en este directorio")
+        await FolderStatsService.adjust(folder_metadata["parent_folder_id"], folder_metadata["owner"], folders=1)
+        await UsageService.folders_changed({folder_metadata["owner"]: 1})
+        await FolderRollupService.apply(
+            FolderRollupService.add_folders({}, folder_metadata["ancestors"]), folder_metadata["owner"]
+        )
         created_folder = await folder_collection.find_one({"_id": result.inserted_id})
         return created_folder
 
     @staticmethod
-    async def list_folders(current_user: dict, parent_folder_id: Optional[str] = None) -> List[dict]:
+    async def list_folders(
+        current_user: dict,
+        parent_folder_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
+    ) -> List[dict]:
+        """Página de carpetas ordenada; la siguiente se pide con el cursor de FolderService.next_cursor"""
         query = {}
 
         if not AuthService.is_admin(current_user):
@@ -63,9 +123,22 @@ class FolderService(BaseService):
         else:
             query["parent_folder_id"] = None
 
-        folders = await folder_collection.find(query).to_list(1000)
+        after = check_cursor(decode_cursor(cursor), sort, order) if cursor else None
+        field = FOLDER_SORT_FIELDS[sort]
+        folders = (
+            await folder_collection.find(keyset_filter(query, field, order, after))
+            .sort(sort_spec(field, order))
+            .to_list(limit)
+        )
         return folders
 
+    @staticmethod
+    def next_cursor(folders: List[dict], limit: int, sort: str = "name", order: str = "asc") -> Optional[str]:
+        """Cursor de la página siguiente, o None si la página no está completa"""
+        if len(folders) < limit:
+            return None
+        return cursor_for(folders[-1], FOLDER_SORT_FIELDS[sort], sort=sort, order=order)
+
     @staticmethod
     async def get_folder(folder_id: str, current_user: dict) -> dict:
         folder_oid = validate_object_id(folder_id, "ID de carpeta")
@@ -74,57 +147,272 @@ class FolderService(BaseService):
         return folder
 
     @staticmethod
-    async def get_folder_content(folder_id: str, current_user: dict) -> dict:
+    async def _content_scope(folder_id: str, current_user: dict) -> Tuple[Optional[ObjectId], Optional[str]]:
+        """Carpeta cuyo contenido se lista (None para la raíz) y propietario al que se limita el listado.
+
+        Los contadores y la versión de una carpeta no dependen del usuario, así que se comprueba que
+        la carpeta sea suya antes de leerlos.
+        """
+        owner = None if AuthService.is_admin(current_user) else current_user.get("username")
+        if folder_id == "root":
+            return None, owner
+        folder_oid = validate_object_id(folder_id, "ID de carpeta")
+        folder = await folder_collection.find_one({"_id": folder_oid}, {"owner": 1})
+        FolderService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        return folder_oid, owner
+
+    @staticmethod
+    async def content_etag(
+        folder_id: str,
+        current_user: dict,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
+    ) -> Optional[str]:
+        """ETag de una página de contenido a partir de la versión de la carpeta, sin leer su contenido.
+
+        El listado solo depende del propietario (los administradores ven lo mismo), así que el ámbito
+        forma parte del ETag en lugar del usuario concreto. None si la carpeta no tiene versión.
+        """
+        folder_oid, owner = await FolderService._content_scope(folder_id, current_user)
+        version = await FolderStatsService.version(folder_oid, owner)
+        if version is None:
+            return None
+        key = json.dumps([folder_id, version, owner, limit, cursor, sort, order])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    async def get_folder_content(
+        folder_id: str,
+        current_user: dict,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "name",
+        order: str = "asc",
+        etag: Optional[str] = None,
+    ) -> dict:
+        """Página del contenido de una carpeta: primero las subcarpetas y después los archivos.
+
+        El cursor indica en qué fase (carpetas o archivos) y tras qué elemento continúa la página
+        siguiente. total_items sale de los contadores mantenidos, sin contar documentos. Con el
+        `etag` de content_etag la página se sirve desde la caché mientras la carpeta no cambie.
+        """
+        if etag:
+            cached = content_cache.get(etag)
+            if cached is not None:
+                return cached
+
+        folder_oid, owner = await FolderService._content_scope(folder_id, current_user)
+
         # Base queries para carpetas y archivos
-        base_folder_query = {
-            "parent_folder_id": None if folder_id == "root" else validate_object_id(folder_id, "ID de carpeta")
-        }
-        base_file_query = {"folder_id": None if folder_id == "root" else validate_object_id(folder_id, "ID de carpeta")}
+        base_folder_query = {"parent_folder_id": folder_oid}
+        base_file_query = {"folder_id": folder_oid, "deleted_at": None}
 
         # Filtrar por ownership a menos que sea admin
-        if not AuthService.is_admin(current_user):
-            base_folder_query["owner"] = current_user.get("username")
-            base_file_query["owner"] = current_user.get("username")
+        if owner:
+            base_folder_query["owner"] = owner
+            base_file_query["owner"] = owner
+
+        after = check_cursor(decode_cursor(cursor), sort, order) if cursor else None
+        folders, files, next_cursor = await FolderService._content_page(
+            base_folder_query, base_file_query, limit, after, sort, order
+        )
+        FolderService._strip_internal_fields(folders, files)
+
+        total_items = await FolderStatsService.total_items(folder_oid, owner)
 
-        folders = await folder_collection.find(base_folder_query).to_list(1000)
-        files = await file_collection.find(base_file_query).to_list(1000)
+        content = {
+            "folders": folders,
+            "files": files,
+            "folder_id": folder_id,
+            "total_items": total_items,
+            "next_cursor": next_cursor,
+        }
+        if etag:
+            content_cache.set(etag, content)
+        return content
+
+    @staticmethod
+    async def _content_page(
+        folder_query: dict, file_query: dict, limit: int, after: Optional[dict], sort: str, order: str
+    ) -> Tuple[List[dict], List[dict], Optional[str]]:
+        """Subcarpetas y archivos de la página tras `after` y el cursor de la siguiente"""
+        phase = after.get("phase", "folders") if after else "folders"
+        folders, files, next_cursor = [], [], None
+        if phase == "folders":
+            folder_field = FOLDER_SORT_FIELDS[sort]
+            folders = (
+                await folder_collection.find(keyset_filter(folder_query, folder_field, order, after))
+                .sort(sort_spec(folder_field, order))
+                .to_list(limit)
+            )
+            if len(folders) == limit:
+                next_cursor = cursor_for(folders[-1], folder_field, phase="folders", sort=sort, order=order)
+            after = None
+
+        remaining = limit - len(folders)
+        if remaining > 0:
+            file_field = FILE_SORT_FIELDS[sort]
+            files = (
+                await file_collection.find(keyset_filter(file_query, file_field, order, after))
+                .sort(sort_spec(file_field, order))
+                .to_list(remaining)
+            )
+            if len(files) == remaining:
+                next_cursor = cursor_for(files[-1], file_field, phase="files", sort=sort, order=order)
+        return folders, files, next_cursor
 
+    @staticmethod
+    def _strip_internal_fields(folders: List[dict], files: List[dict]):
+        """Convierte los IDs a texto y quita los campos internos (ancestros y términos de búsqueda)"""
         for folder in folders:
             folder["_id"] = str(folder["_id"])
             if folder.get("parent_folder_id"):
                 folder["parent_folder_id"] = str(folder["parent_folder_id"])
+            folder.pop("ancestors", None)
 
         for file in files:
             file["_id"] = str(file["_id"])
             if file.get("folder_id"):
                 file["folder_id"] = str(file["folder_id"])
+            for internal_field in ("ancestors", "search_name", "search_terms"):
+                file.pop(internal_field, None)
 
-        return {"folders": folders, "files": files, "folder_id": folder_id, "total_items": len(folders) + len(files)}
+    @staticmethod
+    async def delete_folder(folder_id: str, current_user: dict) -> dict:
+        """Elimina una carpeta y todo su subárbol.
+
+        El subárbol se obtiene con una sola consulta sobre `ancestors`. Los archivos se borran en lotes
+        con delete_many y sus blobs se liberan en bloque; el recolector de blobs elimina después los
+        objetos sin referencias con borrados multi-objeto. Un lote que falla se reporta y no detiene
+        el resto; en ese caso las carpetas se conservan para que los archivos pendientes sigan accesibles.
+        Los archivos que ya estaban en la papelera no se borran: pasan a la raíz y se purgan a su tiempo.
+        """
+        folder_oid = validate_object_id(folder_id, "ID de carpeta")
+        folder = await folder_collection.find_one({"_id": folder_oid})
+        FolderService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        return await FolderService.delete_subtree(folder)
+
+    @staticmethod
+    def runs_as_job(folder: dict, background: Optional[bool] = None) -> bool:
+        """Si `background` es None decide el tamaño del subárbol, según los totales de la propia carpeta"""
+        if background is not None:
+            return background
+        return folder.get("file_count", 0) + folder.get("folder_count", 0) >= settings.JOB_FOLDER_THRESHOLD_ITEMS
 
     @staticmethod
-    async def delete_folder(folder_id: str, current_user: dict):
-        """Elimina una carpeta y todo su contenido recursivamente"""
+    async def delete_folder_job(
+        folder_id: str, current_user: dict, background: Optional[bool] = None
+    ) -> Optional[dict]:
+        """Encola la eliminación de una carpeta grande y devuelve el trabajo; None si debe hacerse en la petición"""
         folder_oid = validate_object_id(folder_id, "ID de carpeta")
         folder = await folder_collection.find_one({"_id": folder_oid})
         FolderService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        if not FolderService.runs_as_job(folder, background):
+            return None
+        return await FolderService.enqueue_delete(folder)
 
-        try:
-            # Eliminar archivos en la carpeta
-            files_in_folder = await file_collection.find({"folder_id": folder_oid}).to_list(1000)
-            for file_doc in files_in_folder:
-                minio_client.remove_object(settings.BUCKET_NAME, file_doc["object_name"])
-                await file_collection.delete_one({"_id": file_doc["_id"]})
+    @staticmethod
+    async def enqueue_delete(folder: dict) -> dict:
+        """Encola la eliminación de una carpeta ya cargada y validada"""
+        return await JobService.enqueue("delete_folder", {"folder_id": folder["_id"]}, folder.get("owner"))
 
-            # Eliminar subcarpetas recursivamente
-            subfolders = await folder_collection.find({"parent_folder_id": folder_oid}).to_list(1000)
-            for subfolder in subfolders:
-                await FolderService.delete_folder(str(subfolder["_id"]), current_user)
+    @staticmethod
+    async def run_delete_job(job: dict) -> dict:
+        """Ejecuta un trabajo de eliminación; al retomarlo solo quedan por borrar los elementos restantes"""
+        folder_oid = job["params"]["folder_id"]
+        summary = {"folder_id": str(folder_oid), "folders_deleted": 0, "files_deleted": 0, "failed": []}
+        # Un intento anterior interrumpido ya eliminó parte del subárbol: se continúa su recuento
+        summary.update(job.get("progress") or {}, failed=[])
+        folder = await folder_collection.find_one({"_id": folder_oid})
+        if folder is None:
+            return summary
+        return await FolderService.delete_subtree(
+            folder, checkpoint=lambda progress: JobService.report(job, progress), summary=summary
+        )
 
-            # Eliminar la carpeta
-            await folder_collection.delete_one({"_id": folder_oid})
+    @staticmethod
+    async def delete_subtree(folder: dict, checkpoint: Checkpoint = None, summary: Optional[dict] = None) -> dict:
+        """Elimina una carpeta ya cargada y validada junto con su subárbol.
+
+        `checkpoint` se llama tras cada lote de archivos; si lanza una excepción, la operación se detiene
+        con las carpetas intactas, igual que cuando falla un lote.
+        """
+        folder_oid = folder["_id"]
+        if summary is None:
+            summary = {"folder_id": str(folder_oid), "folders_deleted": 0, "files_deleted": 0, "failed": []}
+        batch = []
+        # Los archivos de la papelera no se borran aquí: se conservan hasta su purge_at (ver abajo)
+        cursor = file_collection.find(
+            {"ancestors": folder_oid, "deleted_at": None},
+            {"_id": 1, "object_name": 1, "folder_id": 1, "ancestors": 1, "owner": 1, "size": 1, "file_type": 1},
+        )
+        async for file_doc in cursor.batch_size(settings.BULK_BATCH_SIZE):
+            batch.append(file_doc)
+            if len(batch) >= settings.BULK_BATCH_SIZE:
+                await FolderService._delete_file_batch(batch, summary)
+                batch = []
+                if checkpoint:
+                    await checkpoint(summary)
+        if batch:
+            await FolderService._delete_file_batch(batch, summary)
+
+        if summary["failed"]:
+            return summary
 
+        try:
+            # Los archivos de la papelera pasan a la raíz, donde se restaurarán si se recuperan
+            await file_collection.update_many(
+                {"ancestors": folder_oid, "deleted_at": {"$ne": None}},
+                {"$set": {"folder_id": None, **FolderService.child_location(None)}},
+            )
+            subtree = {"$or": [{"_id": folder_oid}, {"ancestors": folder_oid}]}
+            folder_ids = await folder_collection.distinct("_id", subtree)
+            result = await folder_collection.delete_many(subtree)
+            summary["folders_deleted"] = result.deleted_count
+            await FolderStatsService.adjust(folder.get("parent_folder_id"), folder.get("owner"), folders=-1)
+            await FolderStatsService.remove(folder_ids)
+            # El subárbol pertenece al propietario de la carpeta; la conciliación corrige los casos mixtos
+            await UsageService.folders_changed({folder.get("owner"): -result.deleted_count})
+            await FolderRollupService.apply(
+                FolderRollupService.add_folders({}, folder.get("ancestors", []), -result.deleted_count),
+                folder.get("owner"),
+            )
         except Exception as e:
-            raise InternalServerException(f"Error al eliminar la carpeta: {str(e)}")
+            summary["failed"].append({"stage": "folders", "error": str(e)})
+        return summary
+
+    @staticmethod
+    async def _delete_file_batch(files: List[dict], summary: dict):
+        ids = [file_doc["_id"] for file_doc in files]
+        try:
+            result = await file_collection.delete_many({"_id": {"$in": ids}, "deleted_at": None})
+            if result.deleted_count < len(ids):
+                # Otra petición movió alguno a la papelera entretanto: se conserva como el resto de la papelera
+                kept = set(await file_collection.distinct("_id", {"_id": {"$in": ids}}))
+                files = [file_doc for file_doc in files if file_doc["_id"] not in kept]
+        except Exception as e:
+            summary["failed"].append({"stage": "files", "count": len(ids), "error": str(e)})
+            return
+        summary["files_deleted"] += result.deleted_count
+        try:
+            await BlobService.release_many(file_doc["object_name"] for file_doc in files)
+        except Exception as e:
+            # Los metadatos ya no existen: los blobs quedan con referencias de más, nunca sin contenido
+            summary["failed"].append({"stage": "blobs", "count": len(ids), "error": str(e)})
+
+        # Las carpetas que se conservan si falla otro lote mantienen sus contadores al día
+        deltas = {}
+        for file_doc in files:
+            deltas.setdefault(file_doc["folder_id"], {"files": 0})["files"] -= 1
+        try:
+            await FolderStatsService.adjust_many(deltas)
+            await UsageService.files_removed(files)
+            await FolderRollupService.files_changed(files, sign=-1)
+        except Exception:
+            logger.exception("No se pudieron actualizar los contadores de la carpeta %s", summary["folder_id"])
+        logger.info("Eliminación de carpeta %s: %d archivos eliminados", summary["folder_id"], summary["files_deleted"])
 
     @staticmethod
     async def move_folder(folder_id: str, parent_folder_id: Optional[str], current_user: dict) -> dict:
@@ -134,27 +422,33 @@ class FolderService(BaseService):
         FolderService._check_ownership(folder, current_user, "Carpeta no encontrada")
 
         # Validar carpeta padre destino si se proporciona
-        new_parent_path = "/"
+        parent_folder = None
         if parent_folder_id and parent_folder_id != "root":
             parent_oid = validate_object_id(parent_folder_id, "ID de carpeta padre")
             parent_folder = await folder_collection.find_one({"_id": parent_oid})
             FolderService._check_ownership(parent_folder, current_user, "Carpeta padre no encontrada")
+            FolderService.check_not_inside(folder, parent_folder)
 
-            # Verificar que no estemos moviendo una carpeta dentro de sí misma
-            if str(parent_oid) == folder_id:
-                raise ValidationException("No se puede mover una carpeta dentro de sí misma")
+        return await FolderService.move_into(folder, parent_folder, current_user.get("username"))
 
-            new_parent_path = parent_folder["path"]
-            parent_folder_id = parent_oid
-        else:
-            parent_folder_id = None
+    @staticmethod
+    def check_not_inside(folder: dict, parent_folder: dict):
+        """Verifica que el destino no sea la propia carpeta ni uno de sus descendientes"""
+        if parent_folder["_id"] == folder["_id"] or folder["_id"] in parent_folder.get("ancestors", []):
+            raise ValidationException("No se puede mover una carpeta dentro de sí misma")
+
+    @staticmethod
+    async def move_into(folder: dict, parent_folder: Optional[dict], owner: str) -> dict:
+        """Mueve una carpeta ya validada dentro de `parent_folder` (None para la raíz)"""
+        folder_oid = folder["_id"]
+        parent_folder_id = parent_folder["_id"] if parent_folder else None
 
         # Verificar que no exista una carpeta con el mismo nombre en el destino
         existing_folder = await folder_collection.find_one(
             {
                 "name": folder["name"],
                 "parent_folder_id": parent_folder_id,
-                "owner": current_user.get("username"),
+                "owner": owner,
                 "_id": {"$ne": folder_oid},
             }
         )
@@ -162,141 +456,473 @@ class FolderService(BaseService):
             raise ConflictException("Ya existe una carpeta con ese nombre en el destino")
 
         # Construir nueva ruta
-        new_path = f"{new_parent_path.rstrip('/')}/{folder['name']}/"
+        location = FolderService.child_location(parent_folder)
+        new_path = f"{location['path'].rstrip('/')}/{folder['name']}/"
 
         # Actualizar carpeta
-        update_result = await folder_collection.update_one(
-            {"_id": folder_oid}, {"$set": {"parent_folder_id": parent_folder_id, "path": new_path}}
-        )
+        try:
+            update_result = await folder_collection.update_one(
+                {"_id": folder_oid},
+                {"$set": {"parent_folder_id": parent_folder_id, "path": new_path, "ancestors": location["ancestors"]}},
+            )
+        except DuplicateKeyError:
+            raise ConflictException("Ya existe una carpeta con ese nombre en el destino")
 
         if update_result.matched_count == 0:
             raise NotFoundException("Carpeta no encontrada")
 
-        # Actualizar rutas de subcarpetas y archivos recursivamente
-        await FolderService._update_paths_recursively(folder_oid, new_path)
+        # Actualizar rutas y ancestros de todo el subárbol
+        await FolderService._rebase_subtree(folder, new_path, location["ancestors"])
+        # Los listados del subárbol incluyen las rutas que acaban de cambiar
+        await FolderStatsService.touch_subtree(folder_oid, settings.BULK_BATCH_SIZE)
+
+        if folder.get("parent_folder_id") != parent_folder_id:
+            await FolderStatsService.adjust_many(
+                {
+                    FolderStatsService.key(folder.get("parent_folder_id"), folder.get("owner")): {"folders": -1},
+                    FolderStatsService.key(parent_folder_id, folder.get("owner")): {"folders": 1},
+                }
+            )
+            # El subárbol entero sale de los ancestros antiguos y entra en los nuevos
+            rollups = FolderRollupService.add_subtree({}, folder, folder.get("ancestors", []), sign=-1)
+            FolderRollupService.add_subtree(rollups, folder, location["ancestors"])
+            await FolderRollupService.apply(rollups, folder.get("owner"))
 
         updated_folder = await folder_collection.find_one({"_id": folder_oid})
         return updated_folder
 
     @staticmethod
     async def copy_folder(folder_id: str, parent_folder_id: Optional[str], current_user: dict) -> dict:
-        """Copia una carpeta a otra ubicación"""
+        """Copia una carpeta y su subárbol a otra ubicación.
+
+        Devuelve la carpeta creada junto con el resumen de la copia (carpetas y archivos copiados y
+        elementos que fallaron).
+        """
+        folder, parent_folder = await FolderService._load_copy(folder_id, parent_folder_id, current_user)
+        return await FolderService.copy_into(folder, parent_folder, current_user.get("username"))
+
+    @staticmethod
+    async def _load_copy(folder_id: str, parent_folder_id: Optional[str], current_user: dict):
+        """Carpeta origen y carpeta padre destino (None para la raíz) validadas, con la cuota comprobada"""
         folder_oid = validate_object_id(folder_id, "ID de carpeta")
         folder = await folder_collection.find_one({"_id": folder_oid})
         FolderService._check_ownership(folder, current_user, "Carpeta no encontrada")
 
         # Validar carpeta padre destino si se proporciona
-        new_parent_path = "/"
+        parent_folder = None
         if parent_folder_id and parent_folder_id != "root":
             parent_oid = validate_object_id(parent_folder_id, "ID de carpeta padre")
             parent_folder = await folder_collection.find_one({"_id": parent_oid})
             FolderService._check_ownership(parent_folder, current_user, "Carpeta padre no encontrada")
-            new_parent_path = parent_folder["path"]
-            parent_folder_id = parent_oid
-        else:
-            parent_folder_id = None
+        await UsageService.check_quota(current_user, folder.get("total_size", 0))
+        return folder, parent_folder
 
-        # Generar nombre único si ya existe
-        base_name = folder["name"]
-        counter = 1
+    @staticmethod
+    async def copy_folder_job(
+        folder_id: str, parent_folder_id: Optional[str], current_user: dict, background: Optional[bool] = None
+    ) -> Optional[dict]:
+        """Encola la copia de una carpeta grande y devuelve el trabajo; None si debe hacerse en la petición"""
+        folder, parent_folder = await FolderService._load_copy(folder_id, parent_folder_id, current_user)
+        if not FolderService.runs_as_job(folder, background):
+            return None
+        return await FolderService.enqueue_copy(folder, parent_folder, current_user.get("username"))
+
+    @staticmethod
+    async def enqueue_copy(folder: dict, parent_folder: Optional[dict], owner: str) -> dict:
+        """Encola la copia de una carpeta ya validada dentro de `parent_folder` (None para la raíz)"""
+        params = {
+            "folder_id": folder["_id"],
+            "parent_folder_id": parent_folder["_id"] if parent_folder else None,
+            # El ID de la copia se fija al encolar: un intento retomado continúa la misma copia
+            "copy_root_id": ObjectId(),
+        }
+        return await JobService.enqueue("copy_folder", params, owner)
+
+    @staticmethod
+    async def run_copy_job(job: dict) -> dict:
+        """Ejecuta un trabajo de copia.
+
+        Al retomarlo se reutiliza la carpeta raíz ya creada y se recorre de nuevo el origen: los IDs
+        deterministas de las copias hacen que lo ya copiado cuente como copiado sin duplicarse.
+        """
+        params, owner = job["params"], job["owner"]
+        folder = await folder_collection.find_one({"_id": params["folder_id"]})
+        if folder is None:
+            raise NotFoundException("Carpeta no encontrada")
+        dest_root = await folder_collection.find_one({"_id": params["copy_root_id"]})
+        if dest_root is None:
+            parent_folder = None
+            if params["parent_folder_id"] is not None:
+                parent_folder = await folder_collection.find_one({"_id": params["parent_folder_id"]})
+                if parent_folder is None:
+                    raise NotFoundException("Carpeta padre no encontrada")
+            dest_root = await FolderService._create_copy_root(folder, parent_folder, owner, params["copy_root_id"])
+
+        summary = await FolderService._copy_subtree(
+            folder, dest_root, owner, checkpoint=lambda progress: JobService.report(job, progress)
+        )
+        return {"folder_id": str(dest_root["_id"]), **summary}
+
+    @staticmethod
+    async def copy_into(folder: dict, parent_folder: Optional[dict], owner: str) -> dict:
+        """Copia una carpeta ya validada dentro de `parent_folder` (None para la raíz)"""
+        new_folder_metadata = await FolderService._create_copy_root(folder, parent_folder, owner)
+        try:
+            summary = await FolderService._copy_subtree(folder, new_folder_metadata, owner)
+        except Exception as e:
+            raise InternalServerException(f"Error al copiar la carpeta: {str(e)}")
+
+        copied_folder = await folder_collection.find_one({"_id": new_folder_metadata["_id"]})
+        return {**copied_folder, **summary}
+
+    @staticmethod
+    async def _create_copy_root(
+        folder: dict, parent_folder: Optional[dict], owner: str, copy_root_id: Optional[ObjectId] = None
+    ) -> dict:
+        """Crea la carpeta raíz de una copia con un nombre libre en el destino"""
+        parent_folder_id = parent_folder["_id"] if parent_folder else None
+        new_name = await FolderService._unique_name(folder["name"], parent_folder_id, owner)
+
+        # Construir nueva ruta
+        location = FolderService.child_location(parent_folder)
+        new_folder_metadata = {
+            "name": new_name,
+            "parent_folder_id": parent_folder_id,
+            "created_date": datetime.utcnow(),
+            "path": f"{location['path'].rstrip('/')}/{new_name}/",
+            "ancestors": location["ancestors"],
+            "owner": owner,
+        }
+        if copy_root_id is not None:
+            new_folder_metadata["_id"] = copy_root_id
+        try:
+            result = await folder_collection.insert_one(new_folder_metadata)
+        except DuplicateKeyError:
+            raise ConflictException("Ya existe una carpeta con ese nombre en el destino")
+        new_folder_metadata["_id"] = result.inserted_id
+        await FolderStatsService.adjust(parent_folder_id, owner, folders=1)
+        await UsageService.folders_changed({owner: 1})
+        await FolderRollupService.apply(FolderRollupService.add_folders({}, location["ancestors"]), owner)
+        return new_folder_metadata
+
+    @staticmethod
+    async def _unique_name(base_name: str, parent_folder_id: Optional[ObjectId], owner: str) -> str:
+        """Primer nombre libre entre `base`, `base (1)`, `base (2)`... con una sola consulta"""
+        taken = set(
+            await folder_collection.distinct(
+                "name",
+                {
+                    "owner": owner,
+                    "parent_folder_id": parent_folder_id,
+                    "name": {"$regex": f"^{re.escape(base_name)}( \\(\\d+\\))?$"},
+                },
+            )
+        )
         new_name = base_name
-        while await folder_collection.find_one(
-            {"name": new_name, "parent_folder_id": parent_folder_id, "owner": current_user.get("username")}
-        ):
+        counter = 1
+        while new_name in taken:
             new_name = f"{base_name} ({counter})"
             counter += 1
+        return new_name
 
-        # Construir nueva ruta
-        new_path = f"{new_parent_path.rstrip('/')}/{new_name}/"
+    @staticmethod
+    def _derived_id(copy_root_id: ObjectId, source_id: ObjectId) -> ObjectId:
+        """ID determinista de la copia de `source_id` dentro de una copia: reintentarla no duplica elementos.
 
-        try:
-            # Crear nueva carpeta
-            new_folder_metadata = {
-                "name": new_name,
-                "parent_folder_id": parent_folder_id,
-                "created_date": datetime.utcnow(),
-                "path": new_path,
-                "owner": current_user.get("username"),
-            }
+        Conserva la marca de tiempo de la carpeta raíz de la copia para que los IDs sigan ordenados.
+        """
+        digest = hashlib.sha1(copy_root_id.binary + source_id.binary).digest()
+        return ObjectId(copy_root_id.binary[:4] + digest[:8])
 
-            result = await folder_collection.insert_one(new_folder_metadata)
-            new_folder_id = result.inserted_id
+    @staticmethod
+    async def _copy_subtree(source: dict, dest_root: dict, owner: str, checkpoint: Checkpoint = None) -> dict:
+        """Copia el contenido de `source` dentro de `dest_root` recorriendo el árbol origen una sola vez.
+
+        Las carpetas se insertan por niveles con insert_many; los archivos se leen con un único cursor
+        y se insertan en lotes de BULK_BATCH_SIZE, con hasta COPY_CONCURRENCY lotes en paralelo. Las
+        copias comparten los blobs del original, así que no se copia ningún objeto en el almacenamiento.
+        `checkpoint` se llama tras cada nivel de carpetas y antes de cada lote de archivos.
+        """
+        summary = {"folders_copied": 1, "files_copied": 0, "failed": []}
+        now = datetime.utcnow()
+        # Si la copia se hace dentro del propio subárbol, excluye su raíz y lo que se va creando en ella
+        subtree = {
+            "$and": [
+                {"ancestors": source["_id"]},
+                {"_id": {"$ne": dest_root["_id"]}},
+                {"ancestors": {"$ne": dest_root["_id"]}},
+            ]
+        }
 
-            # Copiar contenido recursivamente
-            await FolderService._copy_folder_content(folder_oid, new_folder_id, new_path, current_user)
+        copies = {source["_id"]: dest_root}
+        failed_folders = set()
+        levels = {}
+        async for folder in folder_collection.find(subtree, {"name": 1, "parent_folder_id": 1, "ancestors": 1}):
+            levels.setdefault(len(folder["ancestors"]), []).append(folder)
 
-            copied_folder = await folder_collection.find_one({"_id": new_folder_id})
-            return copied_folder
+        for depth in sorted(levels):
+            await FolderService._copy_folder_level(
+                levels[depth], copies, failed_folders, dest_root["_id"], owner, now, summary
+            )
+            if checkpoint:
+                await checkpoint(summary)
 
-        except Exception as e:
-            raise InternalServerException(f"Error al copiar la carpeta: {str(e)}")
+        await FolderService._copy_subtree_files(
+            {**subtree, "deleted_at": None}, copies, failed_folders, dest_root["_id"], owner, summary, checkpoint
+        )
+        return summary
 
     @staticmethod
-    async def _update_paths_recursively(folder_id: ObjectId, new_path: str):
-        """Actualiza las rutas de subcarpetas y archivos recursivamente"""
-        # Actualizar archivos en esta carpeta
-        await file_collection.update_many({"folder_id": folder_id}, {"$set": {"path": new_path}})
+    async def _copy_folder_level(
+        folders: List[dict],
+        copies: dict,
+        failed_folders: set,
+        copy_root_id: ObjectId,
+        owner: str,
+        now: datetime,
+        summary: dict,
+    ):
+        """Inserta las copias de un nivel del árbol, cuyas carpetas padre ya están copiadas"""
+        pending = []
+        for folder in folders:
+            parent_copy = copies.get(folder["parent_folder_id"])
+            if parent_copy is None or folder["parent_folder_id"] in failed_folders:
+                failed_folders.add(folder["_id"])
+                summary["failed"].append(
+                    {
+                        "type": "folder",
+                        "id": str(folder["_id"]),
+                        "name": folder["name"],
+                        "error": "Carpeta padre no copiada",
+                    }
+                )
+                continue
+            location = FolderService.child_location(parent_copy)
+            copy = {
+                "_id": FolderService._derived_id(copy_root_id, folder["_id"]),
+                "name": folder["name"],
+                "parent_folder_id": parent_copy["_id"],
+                "created_date": now,
+                "path": f"{location['path'].rstrip('/')}/{folder['name']}/",
+                "ancestors": location["ancestors"],
+                "owner": owner,
+            }
+            copies[folder["_id"]] = copy
+            pending.append((folder["_id"], copy))
 
-        # Actualizar subcarpetas
-        subfolders = await folder_collection.find({"parent_folder_id": folder_id}).to_list(1000)
-        for subfolder in subfolders:
-            subfolder_new_path = f"{new_path.rstrip('/')}/{subfolder['name']}/"
-            await folder_collection.update_one({"_id": subfolder["_id"]}, {"$set": {"path": subfolder_new_path}})
-            # Recursión para subcarpetas
-            await FolderService._update_paths_recursively(subfolder["_id"], subfolder_new_path)
+        for start in range(0, len(pending), settings.BULK_BATCH_SIZE):
+            chunk = pending[start : start + settings.BULK_BATCH_SIZE]
+            failed, duplicated = await FolderService.insert_copies(
+                folder_collection, [copy for _, copy in chunk], summary, "folders_copied", "folder"
+            )
+            failed_folders.update(source_id for source_id, copy in chunk if copy["_id"] in failed)
+            await FolderService.count_copies(
+                [copy for _, copy in chunk], failed | duplicated, "parent_folder_id", "folders"
+            )
 
     @staticmethod
-    async def _copy_folder_content(
-        source_folder_id: ObjectId, dest_folder_id: ObjectId, dest_path: str, current_user: dict
+    async def _copy_subtree_files(
+        query: dict,
+        copies: dict,
+        failed_folders: set,
+        copy_root_id: ObjectId,
+        owner: str,
+        summary: dict,
+        checkpoint: Checkpoint = None,
     ):
-        """Copia el contenido de una carpeta recursivamente"""
-        from app.services.file_service import FileService
+        """Lee los archivos con un único cursor y copia lotes de BULK_BATCH_SIZE, COPY_CONCURRENCY a la vez"""
+        semaphore = asyncio.Semaphore(settings.COPY_CONCURRENCY)
+        tasks = []
 
-        # Copiar archivos
-        files = await file_collection.find({"folder_id": source_folder_id}).to_list(1000)
-        for file_doc in files:
+        async def copy_batch(batch: List[dict]):
             try:
-                # Copiar archivo en MinIO
-                original_object_name = file_doc["object_name"]
-                new_object_name = f"{ObjectId()}-{file_doc['filename']}"
+                await FolderService._copy_file_batch(batch, copies, failed_folders, copy_root_id, owner, summary)
+            finally:
+                semaphore.release()
 
-                # Usar copy_object con la sintaxis correcta de MinIO
-                minio_client.copy_object(
-                    settings.BUCKET_NAME, new_object_name, CopySource(settings.BUCKET_NAME, original_object_name)
-                )
+        batch = []
+        try:
+            async for file_doc in file_collection.find(query).batch_size(settings.BULK_BATCH_SIZE):
+                batch.append(file_doc)
+                if len(batch) >= settings.BULK_BATCH_SIZE:
+                    if checkpoint:
+                        await checkpoint(summary)
+                    await semaphore.acquire()
+                    tasks.append(asyncio.create_task(copy_batch(batch)))
+                    batch = []
+            if batch:
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(copy_batch(batch)))
+        finally:
+            # Aunque el punto de control detenga la copia, los lotes ya lanzados terminan y se cuentan
+            await asyncio.gather(*tasks)
 
-                # Crear nueva entrada de archivo
-                new_file_metadata = {
+    @staticmethod
+    async def _copy_file_batch(
+        files: List[dict], copies: dict, failed_folders: set, copy_root_id: ObjectId, owner: str, summary: dict
+    ):
+        now = datetime.utcnow()
+        docs = []
+        for file_doc in files:
+            if file_doc["folder_id"] in failed_folders or file_doc["folder_id"] not in copies:
+                summary["failed"].append(
+                    {
+                        "type": "file",
+                        "id": str(file_doc["_id"]),
+                        "name": file_doc["filename"],
+                        "error": "Carpeta no copiada",
+                    }
+                )
+                continue
+            location = FolderService.child_location(copies[file_doc["folder_id"]])
+            docs.append(
+                {
+                    "_id": FolderService._derived_id(copy_root_id, file_doc["_id"]),
                     "filename": file_doc["filename"],
                     "size": file_doc["size"],
-                    "upload_date": datetime.utcnow(),
+                    "upload_date": now,
                     "file_type": file_doc["file_type"],
-                    "object_name": new_object_name,
-                    "folder_id": dest_folder_id,
-                    "path": dest_path,
-                    "owner": current_user.get("username"),
+                    "object_name": file_doc["object_name"],
+                    "folder_id": copies[file_doc["folder_id"]]["_id"],
+                    "path": location["path"],
+                    "ancestors": location["ancestors"],
+                    "owner": owner,
+                    "etag": file_doc.get("etag"),
+                    "content_hash": file_doc.get("content_hash"),
+                    "thumbnails": file_doc.get("thumbnails"),
+                    **search_fields(file_doc["filename"]),
                 }
-                await file_collection.insert_one(new_file_metadata)
-            except Exception:
-                continue  # Si falla un archivo, continuar con los demás
-
-        # Copiar subcarpetas recursivamente
-        subfolders = await folder_collection.find({"parent_folder_id": source_folder_id}).to_list(1000)
-        for subfolder in subfolders:
-            subfolder_new_path = f"{dest_path.rstrip('/')}/{subfolder['name']}/"
-
-            # Crear subcarpeta
-            new_subfolder_metadata = {
-                "name": subfolder["name"],
-                "parent_folder_id": dest_folder_id,
-                "created_date": datetime.utcnow(),
-                "path": subfolder_new_path,
-                "owner": current_user.get("username"),
-            }
-            result = await folder_collection.insert_one(new_subfolder_metadata)
-            new_subfolder_id = result.inserted_id
+            )
+        if not docs:
+            return
+
+        # Las copias comparten el blob del original: solo se añaden referencias
+        try:
+            await BlobService.acquire_many(doc["object_name"] for doc in docs)
+        except Exception as e:
+            summary["failed"].extend(
+                {"type": "file", "id": str(doc["_id"]), "name": doc["filename"], "error": str(e)} for doc in docs
+            )
+            return
+        failed, duplicated = await FolderService.insert_copies(file_collection, docs, summary, "files_copied", "file")
+        unused = [doc["object_name"] for doc in docs if doc["_id"] in failed or doc["_id"] in duplicated]
+        if unused:
+            await BlobService.release_many(unused)
+        await FolderService.count_copies(docs, failed | duplicated, "folder_id", "files")
+
+    @staticmethod
+    async def count_copies(docs: List[dict], skipped: set, parent_field: str, counter: str):
+        """Suma a los contadores de cada carpeta destino y al uso del propietario las copias insertadas"""
+        inserted = [doc for doc in docs if doc["_id"] not in skipped]
+        deltas = {}
+        for doc in inserted:
+            deltas.setdefault(doc[parent_field], {counter: 0})[counter] += 1
+        await FolderStatsService.adjust_many(deltas)
+        if counter == "files":
+            await UsageService.files_added(inserted)
+            await FolderRollupService.files_changed(inserted)
+        else:
+            owners, rollups = {}, {}
+            for doc in inserted:
+                owners[doc.get("owner")] = owners.get(doc.get("owner"), 0) + 1
+                FolderRollupService.add_folders(rollups, doc.get("ancestors", []))
+            await UsageService.folders_changed(owners)
+            await FolderRollupService.apply(rollups, inserted[0].get("owner") if inserted else None)
 
-            # Copiar contenido de la subcarpeta
-            await FolderService._copy_folder_content(
-                subfolder["_id"], new_subfolder_id, subfolder_new_path, current_user
+    @staticmethod
+    async def insert_copies(collection, docs: List[dict], summary: dict, counter: str, kind: str):
+        """Inserta copias en lote y devuelve los IDs que fallaron y los que ya existían.
+
+        Un ID duplicado significa que esa copia ya se hizo en un intento anterior: cuenta como copiada.
+        """
+        failed, duplicated = set(), set()
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                doc = docs[error["index"]]
+                if error.get("code") == 11000 and "_id_" in error.get("errmsg", ""):
+                    duplicated.add(doc["_id"])
+                    continue
+                failed.add(doc["_id"])
+                summary["failed"].append(
+                    {
+                        "type": kind,
+                        "id": str(doc["_id"]),
+                        "name": doc.get("name") or doc.get("filename"),
+                        "error": error.get("errmsg"),
+                    }
+                )
+        except Exception as e:
+            failed = {doc["_id"] for doc in docs}
+            summary["failed"].extend(
+                {"type": kind, "id": str(doc["_id"]), "name": doc.get("name") or doc.get("filename"), "error": str(e)}
+                for doc in docs
             )
+        summary[counter] += len(docs) - len(failed)
+        return failed, duplicated
+
+    @staticmethod
+    async def _rebase_subtree(folder: dict, new_path: str, new_ancestors: List[ObjectId]):
+        """Reescribe path y ancestors de todos los descendientes de una carpeta movida.
+
+        Los descendientes comparten el prefijo de ruta y de ancestros de la carpeta, así que basta
+        sustituir ese prefijo con una actualización por colección, sin recorrer el árbol.
+        """
+        old_path = folder["path"]
+        old_depth = len(folder.get("ancestors", []))
+        rebase = [
+            {
+                "$set": {
+                    "path": {
+                        "$concat": [
+                            new_path,
+                            {"$substrCP": ["$path", len(old_path), {"$strLenCP": "$path"}]},
+                        ]
+                    },
+                    "ancestors": {
+                        "$concatArrays": [
+                            new_ancestors,
+                            {"$slice": ["$ancestors", old_depth, {"$size": "$ancestors"}]},
+                        ]
+                    },
+                }
+            }
+        ]
+        await folder_collection.update_many({"ancestors": folder["_id"]}, rebase)
+        await file_collection.update_many({"ancestors": folder["_id"]}, rebase)
+
+    @staticmethod
+    async def backfill_ancestors() -> dict:
+        """Calcula `ancestors` para carpetas y archivos creados antes de que existiera el campo.
+
+        Recorre el árbol por niveles desde la raíz con una escritura en lote por nivel.
+        """
+        summary = {"folders": 0, "files": 0}
+        level = [None]
+        locations = {None: FolderService.child_location(None)}
+        while level:
+            children = await folder_collection.find(
+                {"parent_folder_id": {"$in": level}}, {"_id": 1, "name": 1, "parent_folder_id": 1}
+            ).to_list(None)
+            folder_updates = []
+            for child in children:
+                parent_location = locations[child["parent_folder_id"]]
+                path = f"{parent_location['path'].rstrip('/')}/{child['name']}/"
+                ancestors = parent_location["ancestors"]
+                locations[child["_id"]] = {"path": path, "ancestors": ancestors + [child["_id"]]}
+                folder_updates.append(
+                    UpdateOne({"_id": child["_id"]}, {"$set": {"path": path, "ancestors": ancestors}})
+                )
+            if folder_updates:
+                await folder_collection.bulk_write(folder_updates, ordered=False)
+                summary["folders"] += len(folder_updates)
+
+            file_updates = [UpdateMany({"folder_id": folder_id}, {"$set": locations[folder_id]}) for folder_id in level]
+            result = await file_collection.bulk_write(file_updates, ordered=False)
+            summary["files"] += result.modified_count
+
+            for folder_id in level:
+                locations.pop(folder_id, None)
+            level = [child["_id"] for child in children]
+        return summary
@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, Optional, Union
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import file_collection, folder_collection, folder_stats_collection
+
+StatsKey = Union[ObjectId, str]
+
+
+class FolderStatsService:
+    """Contadores de hijos directos por carpeta, mantenidos con $inc en cada operación.
+
+    Cada documento de `folder_stats` usa como _id el ID de la carpeta; la raíz de cada usuario se
+    representa con `root:<owner>`. Permiten calcular total_items sin contar documentos. Los datos
+    anteriores a los contadores se inicializan con `python -m app.cli rebuild-folder-stats`.
+
+    `version` aumenta con cada cambio en el contenido directo de la carpeta y sirve para invalidar
+    los listados cacheados. Se incrementa siempre después de escribir los documentos afectados.
+    """
+
+    ROOT_PREFIX = "root:"
+
+    @staticmethod
+    def key(folder_id: Optional[ObjectId], owner: Optional[str]) -> StatsKey:
+        return folder_id if folder_id is not None else f"{FolderStatsService.ROOT_PREFIX}{owner}"
+
+    @staticmethod
+    async def adjust(folder_id: Optional[ObjectId], owner: Optional[str], files: int = 0, folders: int = 0):
+        await FolderStatsService.adjust_many(
+            {FolderStatsService.key(folder_id, owner): {"files": files, "folders": folders}}
+        )
+
+    @staticmethod
+    async def touch(folder_id: Optional[ObjectId], owner: Optional[str]):
+        """Marca el contenido de la carpeta como modificado sin cambiar los contadores (p. ej. un renombrado)"""
+        await FolderStatsService.adjust(folder_id, owner)
+
+    @staticmethod
+    async def adjust_many(deltas: Dict[StatsKey, Dict[str, int]]):
+        """Aplica varios incrementos en una sola escritura en lote; cada carpeta incluida cambia de versión"""
+        operations = []
+        for key, delta in deltas.items():
+            inc = {field: value for field, value in delta.items() if value}
+            operations.append(UpdateOne({"_id": key}, {"$inc": {**inc, "version": 1}}, upsert=True))
+        if operations:
+            await folder_stats_collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def touch_many(keys: Iterable[StatsKey]):
+        """Cambia la versión de varias carpetas con una sola escritura (sus listados han cambiado)"""
+        keys = list(keys)
+        if keys:
+            await folder_stats_collection.update_many({"_id": {"$in": keys}}, {"$inc": {"version": 1}})
+
+    @staticmethod
+    async def touch_subtree(folder_id: ObjectId, batch_size: int = 1000):
+        """Cambia la versión de una carpeta y de todas sus descendientes (sus rutas han cambiado)"""
+        batch = [folder_id]
+        cursor = folder_collection.find({"ancestors": folder_id}, {"_id": 1})
+        async for folder in cursor.batch_size(batch_size):
+            batch.append(folder["_id"])
+            if len(batch) >= batch_size:
+                await folder_stats_collection.update_many({"_id": {"$in": batch}}, {"$inc": {"version": 1}})
+                batch = []
+        if batch:
+            await folder_stats_collection.update_many({"_id": {"$in": batch}}, {"$inc": {"version": 1}})
+
+    @staticmethod
+    async def remove(folder_ids: Iterable[ObjectId]):
+        ids = list(folder_ids)
+        if ids:
+            await folder_stats_collection.delete_many({"_id": {"$in": ids}})
+
+    @staticmethod
+    async def total_items(folder_id: Optional[ObjectId], owner: Optional[str]) -> int:
+        """Carpetas y archivos contenidos directamente en la carpeta (o en la raíz del usuario).
+
+        Con owner=None (administrador en la raíz) se suman las raíces de todos los usuarios.
+        """
+        if folder_id is None and owner is None:
+            pipeline = [
+                {"$match": {"_id": {"$regex": f"^{FolderStatsService.ROOT_PREFIX}"}}},
+                {"$group": {"_id": None, "files": {"$sum": "$files"}, "folders": {"$sum": "$folders"}}},
+            ]
+            stats = await folder_stats_collection.aggregate(pipeline).to_list(1)
+            stats = stats[0] if stats else None
+        else:
+            stats = await folder_stats_collection.find_one({"_id": FolderStatsService.key(folder_id, owner)})
+        if not stats:
+            return 0
+        return stats.get("files", 0) + stats.get("folders", 0)
+
+    @staticmethod
+    async def version(folder_id: Optional[ObjectId], owner: Optional[str]) -> Optional[int]:
+        """Versión del contenido de la carpeta; None si aún no tiene contadores.
+
+        Para el administrador en la raíz se suman las versiones de todas las raíces, que solo crecen.
+        """
+        if folder_id is None and owner is None:
+            pipeline = [
+                {"$match": {"_id": {"$regex": f"^{FolderStatsService.ROOT_PREFIX}"}}},
+                {"$group": {"_id": None, "version": {"$sum": "$version"}}},
+            ]
+            stats = await folder_stats_collection.aggregate(pipeline).to_list(1)
+            stats = stats[0] if stats else None
+        else:
+            stats = await folder_stats_collection.find_one(
+                {"_id": FolderStatsService.key(folder_id, owner)}, {"version": 1}
+            )
+        return stats.get("version", 0) if stats else None
+
+    @staticmethod
+    async def rebuild() -> dict:
+        """Recalcula todos los contadores a partir de los documentos existentes"""
+        counts: Dict[StatsKey, Dict[str, int]] = {}
+        sources = [
+            (file_collection, "$folder_id", "files"),
+            (folder_collection, "$parent_folder_id", "folders"),
+        ]
+        for collection, parent_field, counter in sources:
+            pipeline = [
+                # Los archivos de la papelera no cuentan (las carpetas no tienen deleted_at)
+                {"$match": {"deleted_at": None}},
+                {
+                    "$group": {
+                        "_id": {"parent": parent_field, "owner": {"$cond": [parent_field, None, "$owner"]}},
+                        "count": {"$sum": 1},
+                    }
+                },
+            ]
+            async for group in collection.aggregate(pipeline, allowDiskUse=True):
+                key = FolderStatsService.key(group["_id"].get("parent"), group["_id"].get("owner"))
+                counts.setdefault(key, {"files": 0, "folders": 0})[counter] = group["count"]
+
+        await folder_stats_collection.update_many({}, {"$set": {"files": 0, "folders": 0}, "$inc": {"version": 1}})
+        operations = [
+            UpdateOne({"_id": key}, {"$set": values, "$inc": {"version": 1}}, upsert=True)
+            for key, values in counts.items()
+        ]
+        if operations:
+            await folder_stats_collection.bulk_write(operations, ordered=False)
+        return {"folders_updated": len(operations)}
@@ -0,0 +1,175 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.database import job_collection
+from app.services.auth_service import AuthService
+from app.services.base_service import BaseService
+from app.utils.exceptions import ConflictException
+from app.utils.validators import validate_object_id
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobInterrupted(Exception):
+    """El trabajo debe detenerse en el punto de control actual"""
+
+
+class JobCancelled(JobInterrupted):
+    """El usuario pidió cancelar el trabajo"""
+
+
+class JobLeaseLost(JobInterrupted):
+    """El lease expiró y otro worker retomó el trabajo; este worker no debe escribir más"""
+
+
+class JobService(BaseService):
+    """Cola persistente de trabajos en la colección `jobs`.
+
+    Un worker reclama el trabajo en cola más antiguo con find_one_and_update, que lo marca como
+    `running` con un lease de JOB_LEASE_SECONDS que renueva mientras lo ejecuta. Si el proceso cae, el
+    lease expira y otro worker lo retoma (hasta JOB_MAX_ATTEMPTS intentos), así que cada operación debe
+    poder repetirse sin duplicar efectos. La cancelación es cooperativa: se marca `cancel_requested` y
+    el trabajo se detiene en su siguiente punto de control (`report`).
+    """
+
+    @staticmethod
+    async def enqueue(job_type: str, params: dict, owner: Optional[str]) -> dict:
+        job = {
+            "type": job_type,
+            "params": params,
+            "owner": owner,
+            "status": JOB_QUEUED,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "cancel_requested": False,
+            "created_at": datetime.utcnow(),
+        }
+        result = await job_collection.insert_one(job)
+        job["_id"] = result.inserted_id
+        logger.info("Trabajo %s (%s) en cola", job["_id"], job_type)
+        return job
+
+    @staticmethod
+    async def get_job(job_id: str, current_user: dict) -> dict:
+        job = await job_collection.find_one({"_id": validate_object_id(job_id, "ID de trabajo")})
+        JobService._check_ownership(job, current_user, "Trabajo no encontrado")
+        return job
+
+    @staticmethod
+    async def list_jobs(current_user: dict, limit: int = 50) -> List[dict]:
+        """Trabajos más recientes del usuario (todos para un administrador)"""
+        query = {} if AuthService.is_admin(current_user) else {"owner": current_user.get("username")}
+        return await job_collection.find(query).sort("created_at", -1).limit(limit).to_list(length=limit)
+
+    @staticmethod
+    async def cancel_job(job_id: str, current_user: dict) -> dict:
+        """Cancela un trabajo en cola de inmediato; uno en ejecución se detiene en su siguiente punto de control"""
+        job = await JobService.get_job(job_id, current_user)
+        if job["status"] in FINISHED_STATUSES:
+            raise ConflictException("El trabajo ya ha terminado")
+        now = datetime.utcnow()
+        cancelled = await job_collection.find_one_and_update(
+            {"_id": job["_id"], "status": JOB_QUEUED},
+            {"$set": JobService._finished_fields(JOB_CANCELLED, now, cancel_requested=True)},
+            return_document=ReturnDocument.AFTER,
+        )
+        if cancelled:
+            return cancelled
+        updated = await job_collection.find_one_and_update(
+            {"_id": job["_id"], "status": {"$nin": list(FINISHED_STATUSES)}},
+            {"$set": {"cancel_requested": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return updated or await job_collection.find_one({"_id": job["_id"]})
+
+    @staticmethod
+    async def claim(worker_id: str) -> Optional[dict]:
+        """Reclama el trabajo en cola más antiguo o uno en ejecución cuyo lease expiró"""
+        now = datetime.utcnow()
+        return await job_collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": JOB_QUEUED},
+                    {
+                        "status": JOB_RUNNING,
+                        "lease_expires_at": {"$lt": now},
+                        "attempts": {"$lt": settings.JOB_MAX_ATTEMPTS},
+                        "cancel_requested": False,
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @staticmethod
+    async def report(job: dict, progress: Optional[dict] = None):
+        """Punto de control: guarda el progreso, renueva el lease y detiene el trabajo si se canceló"""
+        update = {"lease_expires_at": datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)}
+        if progress is not None:
+            update["progress"] = progress
+        current = await job_collection.find_one_and_update(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "status": JOB_RUNNING},
+            {"$set": update},
+            projection={"cancel_requested": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if current is None:
+            raise JobLeaseLost()
+        if current.get("cancel_requested"):
+            raise JobCancelled()
+
+    @staticmethod
+    async def finish(job: dict, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        fields = JobService._finished_fields(status, datetime.utcnow(), result=result, error=error)
+        if result is not None:
+            fields["progress"] = result
+        await job_collection.update_one(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "status": JOB_RUNNING}, {"$set": fields}
+        )
+
+    @staticmethod
+    async def expire_abandoned() -> int:
+        """Cierra los trabajos de workers caídos que ya no se van a retomar (cancelados o sin intentos)"""
+        now = datetime.utcnow()
+        abandoned = {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}}
+        cancelled = await job_collection.update_many(
+            {**abandoned, "cancel_requested": True}, {"$set": JobService._finished_fields(JOB_CANCELLED, now)}
+        )
+        failed = await job_collection.update_many(
+            {**abandoned, "attempts": {"$gte": settings.JOB_MAX_ATTEMPTS}},
+            {"$set": JobService._finished_fields(JOB_FAILED, now, error="Se agotaron los intentos")},
+        )
+        return cancelled.modified_count + failed.modified_count
+
+    @staticmethod
+    def _finished_fields(status: str, now: datetime, **fields) -> dict:
+        # expires_at alimenta el índice TTL que elimina los trabajos terminados
+        return {
+            "status": status,
+            "finished_at": now,
+            "expires_at": now + timedelta(seconds=settings.JOB_RETENTION_SECONDS),
+            **fields,
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, Dict
+
+from app.config import settings
+from app.services.folder_service import FolderService
+from app.services.job_service import JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, JobCancelled, JobLeaseLost, JobService
+
+logger = logging.getLogger(__name__)
+
+# Operación de cada tipo de trabajo; recibe el documento del trabajo y devuelve el resumen final
+HANDLERS: Dict[str, Callable[[dict], Awaitable[dict]]] = {
+    "delete_folder": FolderService.run_delete_job,
+    "copy_folder": FolderService.run_copy_job,
+}
+
+
+class JobWorker:
+    """Pool de corrutinas que ejecuta los trabajos de la cola.
+
+    Se arranca dentro de la API (RUN_JOBS_IN_API) o en un proceso aparte con `python worker.py`; varios
+    procesos pueden consumir la misma cola porque cada trabajo se reclama de forma atómica.
+    """
+
+    @staticmethod
+    async def run(concurrency: int = settings.JOB_CONCURRENCY):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        logger.info("Worker de trabajos %s con %d en paralelo", worker_id, concurrency)
+        await asyncio.gather(*(JobWorker._loop(f"{worker_id}:{slot}") for slot in range(concurrency)))
+
+    @staticmethod
+    async def _loop(worker_id: str):
+        while True:
+            try:
+                job = await JobService.claim(worker_id)
+                if job is None:
+                    await JobService.expire_abandoned()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error al consultar la cola de trabajos")
+                job = None
+            if job is None:
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+                continue
+            try:
+                await JobWorker.execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # El trabajo queda en ejecución y se retoma cuando expire su lease
+                logger.exception("No se pudo registrar el final del trabajo %s", job["_id"])
+
+    @staticmethod
+    async def execute(job: dict):
+        """Ejecuta un trabajo reclamado renovando su lease hasta que termina"""
+        heartbeat = asyncio.create_task(JobWorker._heartbeat(job))
+        try:
+            handler = HANDLERS.get(job["type"])
+            if handler is None:
+                raise ValueError(f"Tipo de trabajo desconocido: {job['type']}")
+            result = await handler(job)
+        except JobCancelled:
+            logger.info("Trabajo %s cancelado", job["_id"])
+            await JobService.finish(job, JOB_CANCELLED)
+        except JobLeaseLost:
+            logger.warning("Trabajo %s retomado por otro worker", job["_id"])
+        except Exception as e:
+            logger.exception("Error en el trabajo %s", job["_id"])
+            await JobService.finish(job, JOB_FAILED, error=getattr(e, "detail", None) or str(e))
+        else:
+            await JobService.finish(job, JOB_COMPLETED, result=result)
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    async def _heartbeat(job: dict):
+        """Renueva el lease aunque un paso largo tarde en llegar al siguiente punto de control"""
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                await JobService.report(job)
+            except JobCancelled:
+                # La cancelación la aplica el propio trabajo en su punto de control
+                continue
+            except JobLeaseLost:
+                return
+            except Exception:
+                logger.exception("No se pudo renovar el lease del trabajo %s", job["_id"])
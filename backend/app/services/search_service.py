@@ -0,0 +1,119 @@
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database import file_collection
+from app.services.auth_service import AuthService
+from app.services.base_service import BaseService
+from app.utils.exceptions import ValidationException
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.search import normalize, query_terms, search_fields
+from app.utils.validators import validate_object_id
+
+
+class SearchService(BaseService):
+    """Búsqueda de archivos por nombre sobre el índice multikey (owner, search_terms, _id).
+
+    Cada término de la consulta debe ser prefijo de alguna palabra del nombre. Los candidatos se
+    toman del índice (los más recientes primero, hasta SEARCH_MAX_CANDIDATES) y solo sobre ellos se
+    calcula la relevancia, por lo que el coste no crece con el número total de archivos del usuario.
+    """
+
+    @staticmethod
+    def build_query(
+        current_user: dict,
+        q: str,
+        folder_id: Optional[str] = None,
+        file_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        size_min: Optional[int] = None,
+        size_max: Optional[int] = None,
+    ) -> dict:
+        terms = query_terms(q)
+        if not terms:
+            raise ValidationException("La búsqueda debe contener al menos una letra o número")
+
+        query = {"search_terms": {"$all": terms}, "deleted_at": None}
+        if not AuthService.is_admin(current_user):
+            query["owner"] = current_user.get("username")
+        if folder_id and folder_id != "root":
+            # Búsqueda dentro de una carpeta y todas sus subcarpetas
+            query["ancestors"] = validate_object_id(folder_id, "ID de carpeta")
+        if file_type:
+            # 'image/' filtra por familia; 'image/png' por tipo exacto
+            if file_type.endswith("/"):
+                query["file_type"] = {"$gte": file_type, "$lt": file_type + "\uffff"}
+            else:
+                query["file_type"] = file_type
+        if date_from or date_to:
+            query["upload_date"] = {
+                **({"$gte": date_from} if date_from else {}),
+                **({"$lte": date_to} if date_to else {}),
+            }
+        if size_min is not None or size_max is not None:
+            query["size"] = {
+                **({"$gte": size_min} if size_min is not None else {}),
+                **({"$lte": size_max} if size_max is not None else {}),
+            }
+        return query
+
+    @staticmethod
+    async def search(current_user: dict, q: str, limit: int = 50, cursor: Optional[str] = None, **filters) -> dict:
+        """Resultados ordenados por relevancia con paginación por cursor"""
+        offset = 0
+        if cursor:
+            offset = decode_cursor(cursor).get("offset")
+            if not isinstance(offset, int) or offset < 0:
+                raise ValidationException("Cursor de paginación inválido")
+
+        query = SearchService.build_query(current_user, q, **filters)
+        needle = normalize(q.strip())
+        pipeline = [
+            {"$match": query},
+            {"$sort": {"_id": -1}},
+            {"$limit": settings.SEARCH_MAX_CANDIDATES},
+            {
+                "$addFields": {
+                    "score": {
+                        "$add": [
+                            {"$cond": [{"$eq": ["$search_name", needle]}, 100, 0]},
+                            {"$cond": [{"$eq": [{"$indexOfCP": ["$search_name", needle]}, 0]}, 50, 0]},
+                            {"$cond": [{"$gt": [{"$indexOfCP": ["$search_name", needle]}, 0]}, 20, 0]},
+                        ]
+                    },
+                    "name_length": {"$strLenCP": "$search_name"},
+                }
+            },
+            # A igual relevancia, nombres más cortos (más parecidos a la consulta) y más recientes
+            {"$sort": {"score": -1, "name_length": 1, "_id": -1}},
+            {"$skip": offset},
+            {"$limit": limit + 1},
+            {"$project": {"search_terms": 0, "search_name": 0, "ancestors": 0, "name_length": 0}},
+        ]
+        items = await file_collection.aggregate(pipeline).to_list(limit + 1)
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor({"offset": offset + limit})
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    async def backfill(batch_size: int = 1000) -> dict:
+        """Calcula los campos de búsqueda de los archivos creados antes de que existieran"""
+        summary = {"files_updated": 0}
+        operations = []
+        cursor = file_collection.find({"search_terms": {"$exists": False}}, {"filename": 1})
+        async for file_doc in cursor.batch_size(batch_size):
+            operations.append(UpdateOne({"_id": file_doc["_id"]}, {"$set": search_fields(file_doc["filename"])}))
+            if len(operations) >= batch_size:
+                await file_collection.bulk_write(operations, ordered=False)
+                summary["files_updated"] += len(operations)
+                operations = []
+        if operations:
+            await file_collection.bulk_write(operations, ordered=False)
+            summary["files_updated"] += len(operations)
+        return summary
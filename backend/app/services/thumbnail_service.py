@@ -0,0 +1,144 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+from app.database import file_collection
+from app.services.base_service import BaseService
+from app.services.file_service import FileService
+from app.storage import storage
+from app.utils.exceptions import InternalServerException, NotFoundException, ValidationException
+from app.utils.thumbnails import (
+    THUMBNAIL_CONTENT_TYPE,
+    UnsupportedImageError,
+    is_thumbnail_source,
+    render_thumbnails,
+    rendition_name,
+)
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+# Generaciones en curso por blob: las peticiones simultáneas de la misma imagen esperan a la misma
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Pool de procesos creado en el primer uso, para no lanzar procesos al importar la app"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+class ThumbnailService(BaseService):
+    """Miniaturas de imágenes en los tamaños de THUMBNAIL_SIZES.
+
+    Se generan una vez por blob (los archivos copiados comparten las del original) en un pool de
+    procesos, se guardan como objetos propios en `thumbnails/<blob>/<tamaño>.webp` y se anotan en el
+    campo `thumbnails` de los archivos: un diccionario tamaño -> objeto, vacío si la imagen no se pudo
+    decodificar. El recolector de blobs elimina las miniaturas junto con el blob original.
+    """
+
+    @staticmethod
+    def shutdown():
+        global _executor
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+    @staticmethod
+    def supports(file_doc: dict) -> bool:
+        return is_thumbnail_source(file_doc.get("file_type")) and file_doc["size"] <= settings.THUMBNAIL_MAX_SOURCE_SIZE
+
+    @staticmethod
+    async def get_thumbnail(file_id: str, size: str, current_user: dict) -> Tuple[dict, str]:
+        """Archivo y objeto de su miniatura `size`, generándola si aún no existe"""
+        if size not in settings.THUMBNAIL_SIZES:
+            raise ValidationException(f"Tamaño de miniatura no válido: {size}")
+        file_doc = await FileService.get_file(file_id, current_user)
+        if not ThumbnailService.supports(file_doc):
+            raise NotFoundException("Miniatura no disponible")
+
+        renditions = file_doc.get("thumbnails")
+        if renditions is None:
+            renditions = await ThumbnailService.ensure(file_doc)
+        if size not in renditions:
+            raise NotFoundException("Miniatura no disponible")
+        return file_doc, renditions[size]
+
+    @staticmethod
+    async def open(object_name: str):
+        try:
+            return await storage.get_object(object_name)
+        except Exception as e:
+            raise InternalServerException(f"Error al leer la miniatura: {str(e)}")
+
+    @staticmethod
+    async def ensure(file_doc: dict) -> Dict[str, str]:
+        """Miniaturas del blob del archivo; una sola generación por blob aunque lleguen varias peticiones"""
+        object_name = file_doc["object_name"]
+        task = _pending.get(object_name)
+        if task is None:
+            task = asyncio.ensure_future(ThumbnailService._generate(file_doc))
+            _pending[object_name] = task
+            task.add_done_callback(lambda _: _pending.pop(object_name, None))
+        # Si el cliente se desconecta, la generación continúa para el resto de peticiones
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def generate_for(file_docs: Iterable[dict]):
+        """Genera en segundo plano las miniaturas de archivos recién subidos; los errores solo se registran"""
+        for file_doc in file_docs:
+            if not ThumbnailService.supports(file_doc) or file_doc.get("thumbnails") is not None:
+                continue
+            try:
+                await ThumbnailService.ensure(file_doc)
+            except Exception:
+                logger.exception("No se pudieron generar las miniaturas de %s", file_doc["object_name"])
+
+    @staticmethod
+    async def _generate(file_doc: dict) -> Dict[str, str]:
+        object_name = file_doc["object_name"]
+        # Otro archivo con el mismo contenido (copia o subida repetida) puede tenerlas ya
+        existing = await file_collection.find_one(
+            {"object_name": object_name, "thumbnails": {"$ne": None}}, {"thumbnails": 1}
+        )
+        if existing:
+            renditions = existing["thumbnails"]
+        else:
+            renditions = await ThumbnailService._render(object_name)
+        await file_collection.update_many(
+            {"object_name": object_name, "thumbnails": None}, {"$set": {"thumbnails": renditions}}
+        )
+        return renditions
+
+    @staticmethod
+    async def _render(object_name: str) -> Dict[str, str]:
+        data = await ThumbnailService._read(object_name)
+        loop = asyncio.get_running_loop()
+        try:
+            images = await loop.run_in_executor(_get_executor(), render_thumbnails, data, settings.THUMBNAIL_SIZES)
+        except UnsupportedImageError as e:
+            # Se anota para no volver a intentarlo en cada petición
+            logger.info("%s no es una imagen válida para miniaturas: %s", object_name, e)
+            images = {}
+
+        renditions = {}
+        for size, content in images.items():
+            rendition = rendition_name(object_name, size)
+            await storage.put_object(
+                rendition, io.BytesIO(content), length=len(content), content_type=THUMBNAIL_CONTENT_TYPE
+            )
+            renditions[size] = rendition
+        return renditions
+
+    @staticmethod
+    async def _read(object_name: str) -> bytes:
+        response = await storage.get_object(object_name)
+        data = bytearray()
+        async for chunk in storage.iter_response(response, chunk_size=1024 * 1024):
+            data += chunk
+        return bytes(data)
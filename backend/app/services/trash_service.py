@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.database import file_collection, folder_collection
+from app.services.base_service import BaseService
+from app.services.blob_service import BlobService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_service import FolderService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.usage_service import UsageService
+from app.utils.exceptions import NotFoundException
+from app.utils.validators import validate_object_id
+
+logger = logging.getLogger(__name__)
+
+# Un lote reclamado por un recolector que cayó se puede volver a reclamar pasado este tiempo
+PURGE_CLAIM_TIMEOUT = timedelta(hours=1)
+
+
+class TrashService(BaseService):
+    """Papelera de archivos con borrado lógico.
+
+    Eliminar un archivo solo marca `deleted_at` y `purge_at` (TRASH_RETENTION_DAYS después). Todas las
+    consultas de listados, búsqueda y operaciones filtran `deleted_at: None`, que forma parte de sus
+    índices, así que los archivos de la papelera no se leen. Los contadores de carpetas y los totales
+    recursivos dejan de contarlos en ese momento; el uso del usuario, cuando se purgan.
+
+    El recolector (`collect`, periódico y `python -m app.cli purge-trash`) elimina los archivos vencidos
+    en lotes con delete_many y libera sus blobs en bloque; el recolector de blobs borra después los
+    objetos con borrados multi-objeto. Vaciar la papelera solo adelanta `purge_at`.
+    """
+
+    @staticmethod
+    async def trash_files(files: List[dict]):
+        """Mueve a la papelera archivos ya cargados y validados.
+
+        Solo se descuentan de los contadores los que mueve esta llamada: si otra petición ya movió alguno,
+        ella lo descontó. `trash_claim` identifica los que se marcaron en esta escritura.
+        """
+        now = datetime.utcnow()
+        claim = ObjectId()
+        ids = [file_doc["_id"] for file_doc in files]
+        result = await file_collection.update_many(
+            {"_id": {"$in": ids}, "deleted_at": None},
+            {
+                "$set": {
+                    "deleted_at": now,
+                    "purge_at": now + timedelta(days=settings.TRASH_RETENTION_DAYS),
+                    "trash_claim": claim,
+                }
+            },
+        )
+        if result.modified_count < len(ids):
+            trashed = set(await file_collection.distinct("_id", {"_id": {"$in": ids}, "trash_claim": claim}))
+            files = [file_doc for file_doc in files if file_doc["_id"] in trashed]
+        deltas = {}
+        for file_doc in files:
+            key = FolderStatsService.key(file_doc.get("folder_id"), file_doc.get("owner"))
+            deltas.setdefault(key, {"files": 0})["files"] -= 1
+        await FolderStatsService.adjust_many(deltas)
+        await FolderRollupService.files_changed(files, sign=-1)
+
+    @staticmethod
+    async def list_trash(current_user: dict, limit: int = 100) -> List[dict]:
+        """Archivos de la papelera del usuario, los eliminados más recientemente primero"""
+        query = {
+            "owner": current_user.get("username"),
+            "deleted_at": {"$exists": True},
+            "purge_at": {"$gt": datetime.utcnow()},
+        }
+        return await file_collection.find(query).sort("deleted_at", -1).to_list(limit)
+
+    @staticmethod
+    async def restore_file(file_id: str, current_user: dict) -> dict:
+        """Devuelve el archivo a su carpeta, o a la raíz si la carpeta ya no existe"""
+        file_oid = validate_object_id(file_id, "ID de archivo")
+        in_trash = {"_id": file_oid, "deleted_at": {"$exists": True}, "purge_at": {"$gt": datetime.utcnow()}}
+        file_doc = await file_collection.find_one(in_trash)
+        TrashService._check_ownership(file_doc, current_user, "Archivo no encontrado en la papelera")
+
+        folder = None
+        if file_doc.get("folder_id"):
+            folder = await folder_collection.find_one({"_id": file_doc["folder_id"]})
+        location = {"folder_id": folder["_id"] if folder else None, **FolderService.child_location(folder)}
+        restored = await file_collection.find_one_and_update(
+            in_trash,
+            {"$set": location, "$unset": {"deleted_at": "", "purge_at": "", "trash_claim": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if restored is None:
+            raise NotFoundException("Archivo no encontrado en la papelera")
+        await FolderStatsService.adjust(restored["folder_id"], restored.get("owner"), files=1)
+        await FolderRollupService.files_changed([restored])
+        return restored
+
+    @staticmethod
+    async def empty_trash(current_user: dict) -> dict:
+        """Programa la purga inmediata de la papelera del usuario; el recolector elimina los archivos"""
+        now = datetime.utcnow()
+        result = await file_collection.update_many(
+            {"owner": current_user.get("username"), "deleted_at": {"$exists": True}, "purge_at": {"$gt": now}},
+            {"$set": {"purge_at": now}},
+        )
+        return {"files": result.modified_count}
+
+    @staticmethod
+    async def collect(now: Optional[datetime] = None, batch_size: Optional[int] = None) -> dict:
+        """Elimina definitivamente los archivos vencidos, en lotes separados por TRASH_GC_BATCH_DELAY_SECONDS.
+
+        Cada lote se reclama antes de borrarlo para que dos procesos no liberen dos veces el mismo blob.
+        """
+        now = now or datetime.utcnow()
+        batch_size = batch_size or settings.TRASH_GC_BATCH_SIZE
+        summary = {"purged": 0}
+        while True:
+            # El ID del reclamo lleva su fecha: los de un recolector caído se retoman tras PURGE_CLAIM_TIMEOUT
+            stale_claim = ObjectId.from_datetime(now - PURGE_CLAIM_TIMEOUT)
+            expired = {
+                "purge_at": {"$lte": now},
+                "$or": [{"purge_claim": None}, {"purge_claim": {"$lt": stale_claim}}],
+            }
+            candidates = [doc["_id"] for doc in await file_collection.find(expired, {"_id": 1}).to_list(batch_size)]
+            if not candidates:
+                break
+            claim = ObjectId()
+            await file_collection.update_many({"_id": {"$in": candidates}, **expired}, {"$set": {"purge_claim": claim}})
+            claimed_filter = {"_id": {"$in": candidates}, "purge_claim": claim}
+            claimed = await file_collection.find(
+                claimed_filter, {"_id": 1, "object_name": 1, "owner": 1, "size": 1, "file_type": 1}
+            ).to_list(None)
+            if claimed:
+                result = await file_collection.delete_many(claimed_filter)
+                await BlobService.release_many(file_doc["object_name"] for file_doc in claimed)
+                await UsageService.files_removed(claimed)
+                summary["purged"] += result.deleted_count
+            if len(candidates) < batch_size:
+                break
+            await asyncio.sleep(settings.TRASH_GC_BATCH_DELAY_SECONDS)
+        if summary["purged"]:
+            logger.info("Papelera: %d archivos eliminados definitivamente", summary["purged"])
+        return summary
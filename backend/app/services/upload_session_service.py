@@ -0,0 +1,331 @@
+import math
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from minio.datatypes import Part
+from minio.error import S3Error
+
+from app.config import settings
+from app.database import file_collection, folder_collection, upload_session_collection
+from app.models.upload_session import CreateUploadSession
+from app.services.base_service import BaseService
+from app.services.blob_service import BlobService
+from app.services.folder_rollup_service import FolderRollupService
+from app.services.folder_service import FolderService
+from app.services.folder_stats_service import FolderStatsService
+from app.services.usage_service import UsageService
+from app.storage import storage
+from app.utils.exceptions import AppException, ConflictException, InternalServerException, ValidationException
+from app.utils.search import search_fields
+from app.utils.validators import validate_object_id
+
+# Una finalización que no termina en este tiempo se da por interrumpida (el proceso cayó a mitad)
+STALE_COMPLETION = timedelta(hours=1)
+
+
+class UploadSessionService(BaseService):
+    """Subidas reanudables por partes respaldadas por multipart uploads de MinIO.
+
+    El estado de cada sesión (upload_id de MinIO y partes recibidas) se guarda en MongoDB,
+    por lo que una sesión sobrevive a un reinicio del worker y puede continuarse desde cualquiera.
+    """
+
+    @staticmethod
+    def _to_response(session: dict) -> dict:
+        parts = session.get("parts", {})
+        session["uploaded_parts"] = sorted(
+            ({"part_number": int(number), **part} for number, part in parts.items()),
+            key=lambda part: part["part_number"],
+        )
+        return session
+
+    @staticmethod
+    def _expected_part_size(session: dict, part_number: int) -> int:
+        if part_number < session["total_parts"]:
+            return session["part_size"]
+        return session["size"] - session["part_size"] * (session["total_parts"] - 1)
+
+    @staticmethod
+    async def _get_active_session(session_id: str, current_user: dict) -> dict:
+        session_oid = validate_object_id(session_id, "ID de sesión de subida")
+        session = await upload_session_collection.find_one({"_id": session_oid})
+        UploadSessionService._check_ownership(session, current_user, "Sesión de subida no encontrada")
+        if session["status"] != "active":
+            raise ConflictException("La sesión de subida ya no está activa")
+        return session
+
+    @staticmethod
+    async def _new_session(data: CreateUploadSession, current_user: dict) -> dict:
+        """Valida tamaño y carpeta destino y reserva el object_name de la futura subida"""
+        if data.size > settings.MAX_FILE_SIZE:
+            raise ValidationException(
+                f"El archivo es demasiado grande (máximo {settings.MAX_FILE_SIZE // (1024 * 1024)}MB)"
+            )
+        # El tamaño se declara al crear la sesión: la cuota se comprueba antes de recibir ninguna parte
+        await UsageService.check_quota(current_user, data.size)
+
+        folder_oid = None
+        folder = None
+        if data.folder_id and data.folder_id != "root":
+            folder_oid = validate_object_id(data.folder_id, "ID de carpeta")
+            folder = await folder_collection.find_one({"_id": folder_oid})
+            UploadSessionService._check_ownership(folder, current_user, "Carpeta no encontrada")
+        location = FolderService.child_location(folder)
+
+        now = datetime.utcnow()
+        return {
+            "filename": data.filename,
+            "size": data.size,
+            "file_type": data.content_type or "application/octet-stream",
+            "folder_id": folder_oid,
+            "path": location["path"],
+            "ancestors": location["ancestors"],
+            "object_name": f"{ObjectId()}-{data.filename}",
+            "parts": {},
+            "status": "active",
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+            "owner": current_user.get("username"),
+        }
+
+    @staticmethod
+    async def create_session(data: CreateUploadSession, current_user: dict) -> dict:
+        session = await UploadSessionService._new_session(data, current_user)
+        session["mode"] = "multipart"
+        session["part_size"] = settings.UPLOAD_PART_SIZE
+        session["total_parts"] = max(1, math.ceil(data.size / settings.UPLOAD_PART_SIZE))
+
+        try:
+            session["upload_id"] = await storage.create_multipart_upload(session["object_name"], session["file_type"])
+        except Exception as e:
+            raise InternalServerException(f"Error al iniciar la subida: {str(e)}")
+
+        result = await upload_session_collection.insert_one(session)
+        session["_id"] = result.inserted_id
+        return UploadSessionService._to_response(session)
+
+    @staticmethod
+    async def create_direct_session(data: CreateUploadSession, current_user: dict) -> dict:
+        """Reserva una subida directa al almacenamiento mediante una URL PUT prefirmada.
+
+        El registro en file_collection solo se crea cuando el cliente llama a complete y el
+        objeto subido se ha verificado; las reservas no completadas las elimina la limpieza periódica.
+        """
+        session = await UploadSessionService._new_session(data, current_user)
+        url_expires_at = session["created_at"] + timedelta(seconds=settings.PRESIGNED_UPLOAD_EXPIRE_SECONDS)
+        session["mode"] = "presigned"
+        session["part_size"] = data.size
+        session["total_parts"] = 1
+        session["expires_at"] = url_expires_at + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+        result = await upload_session_collection.insert_one(session)
+        session["_id"] = result.inserted_id
+        session["upload_url"] = storage.presigned_put_url(
+            session["object_name"], settings.PRESIGNED_UPLOAD_EXPIRE_SECONDS
+        )
+        session["url_expires_at"] = url_expires_at
+        return UploadSessionService._to_response(session)
+
+    @staticmethod
+    async def get_session(session_id: str, current_user: dict) -> dict:
+        session_oid = validate_object_id(session_id, "ID de sesión de subida")
+        session = await upload_session_collection.find_one({"_id": session_oid})
+        UploadSessionService._check_ownership(session, current_user, "Sesión de subida no encontrada")
+        return UploadSessionService._to_response(session)
+
+    @staticmethod
+    async def upload_part(session_id: str, part_number: int, chunks: AsyncIterator[bytes], current_user: dict) -> dict:
+        """Sube una parte. Volver a enviar el mismo número de parte la reemplaza (reintento)"""
+        session = await UploadSessionService._get_active_session(session_id, current_user)
+        if session.get("mode") == "presigned":
+            raise ValidationException("Esta sesión se sube directamente al almacenamiento con su URL prefirmada")
+        if part_number < 1 or part_number > session["total_parts"]:
+            raise ValidationException(f"Número de parte inválido (1-{session['total_parts']})")
+
+        expected_size = UploadSessionService._expected_part_size(session, part_number)
+        data = bytearray()
+        async for chunk in chunks:
+            data.extend(chunk)
+            if len(data) > expected_size:
+                raise ValidationException(f"La parte {part_number} debe tener {expected_size} bytes")
+        if len(data) != expected_size:
+            raise ValidationException(f"La parte {part_number} debe tener {expected_size} bytes")
+
+        try:
+            etag = await storage.upload_part(session["object_name"], session["upload_id"], part_number, bytes(data))
+        except Exception as e:
+            raise InternalServerException(f"Error al subir la parte {part_number}: {str(e)}")
+
+        now = datetime.utcnow()
+        # Cada parte se registra con un $set independiente, así las partes pueden llegar en paralelo
+        await upload_session_collection.update_one(
+            {"_id": session["_id"], "status": "active"},
+            {
+                "$set": {
+                    f"parts.{part_number}": {"size": len(data), "etag": etag},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+                }
+            },
+        )
+        return {"part_number": part_number, "size": len(data), "etag": etag}
+
+    @staticmethod
+    async def complete_session(session_id: str, current_user: dict) -> dict:
+        session = await UploadSessionService._get_active_session(session_id, current_user)
+        parts = session.get("parts", {})
+        if session.get("mode") != "presigned":
+            missing = [n for n in range(1, session["total_parts"] + 1) if str(n) not in parts]
+            if missing:
+                raise ValidationException(f"Faltan partes por subir: {missing[:20]}")
+
+        # Transición atómica para que dos peticiones concurrentes no completen la misma sesión
+        claimed = await upload_session_collection.find_one_and_update(
+            {"_id": session["_id"], "status": "active"},
+            {"$set": {"status": "completing", "updated_at": datetime.utcnow()}},
+        )
+        if not claimed:
+            raise ConflictException("La sesión de subida ya no está activa")
+
+        # La carpeta destino puede haberse movido mientras se subían las partes; si se eliminó, el
+        # archivo se guarda en la raíz (como al restaurarlo de la papelera) en lugar de perder la subida
+        folder = None
+        if session["folder_id"]:
+            folder = await folder_collection.find_one({"_id": session["folder_id"]})
+        location = FolderService.child_location(folder)
+
+        try:
+            size, file_type, etag = await UploadSessionService._finish_upload(session)
+            file_metadata = {
+                "filename": session["filename"],
+                "size": size,
+                "upload_date": datetime.utcnow(),
+                "file_type": file_type,
+                "object_name": session["object_name"],
+                "folder_id": folder["_id"] if folder else None,
+                "path": location["path"],
+                "ancestors": location["ancestors"],
+                "owner": session["owner"],
+                "etag": etag,
+                **search_fields(session["filename"]),
+            }
+            await BlobService.register(session["object_name"], size, file_type)
+            try:
+                result = await file_collection.insert_one(file_metadata)
+            except Exception:
+                # Sin documento que la use, la referencia se devuelve para que el reintento no la duplique
+                await BlobService.release(session["object_name"])
+                raise
+            await FolderStatsService.adjust(file_metadata["folder_id"], session["owner"], files=1)
+            await UsageService.files_added([file_metadata])
+            await FolderRollupService.files_changed([file_metadata])
+            await upload_session_collection.delete_one({"_id": session["_id"]})
+            return await file_collection.find_one({"_id": result.inserted_id})
+
+        except Exception as e:
+            # La sesión vuelve a estar activa para que el cliente pueda reintentar
+            await upload_session_collection.update_one(
+                {"_id": session["_id"], "status": "completing"}, {"$set": {"status": "active"}}
+            )
+            if isinstance(e, AppException):
+                raise
+            raise InternalServerException(f"Error al completar la subida: {str(e)}")
+
+    @staticmethod
+    async def _finish_upload(session: dict):
+        """Cierra la subida en el almacenamiento y devuelve (tamaño, tipo, etag) del objeto resultante"""
+        if session.get("mode") == "presigned":
+            return await UploadSessionService._verify_direct_upload(session)
+        parts = session["parts"]
+        write_result = await storage.complete_multipart_upload(
+            session["object_name"],
+            session["upload_id"],
+            [Part(n, parts[str(n)]["etag"]) for n in range(1, session["total_parts"] + 1)],
+        )
+        return session["size"], session["file_type"], write_result.etag
+
+    @staticmethod
+    async def _verify_direct_upload(session: dict):
+        """Comprueba con stat_object el objeto subido con la URL prefirmada"""
+        try:
+            stat = await storage.stat_object(session["object_name"])
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                raise ValidationException("El archivo aún no se ha subido al almacenamiento")
+            raise
+
+        if stat.size > settings.MAX_FILE_SIZE or stat.size != session["size"]:
+            # El objeto no corresponde a lo reservado: se descarta para no dejar datos huérfanos
+            await UploadSessionService._discard(session)
+            raise ValidationException(
+                f"El tamaño subido ({stat.size} bytes) no coincide con el declarado ({session['size']} bytes)"
+            )
+
+        declared_type = session["file_type"]
+        stored_type = (stat.content_type or "").split(";")[0].strip()
+        generic_types = ("", "application/octet-stream", "binary/octet-stream")
+        if declared_type not in generic_types and stored_type not in generic_types and stored_type != declared_type:
+            await UploadSessionService._discard(session)
+            raise ValidationException(
+                f"El tipo de contenido subido ({stored_type}) no coincide con el declarado ({declared_type})"
+            )
+        file_type = (
+            stored_type if declared_type in generic_types and stored_type not in generic_types else declared_type
+        )
+        return stat.size, file_type, stat.etag
+
+    @staticmethod
+    async def abort_session(session_id: str, current_user: dict):
+        session = await UploadSessionService._get_active_session(session_id, current_user)
+        await UploadSessionService._discard(session)
+
+    @staticmethod
+    async def _discard(session: dict):
+        try:
+            if session.get("mode") == "presigned":
+                await storage.remove_object(session["object_name"])
+            else:
+                await storage.abort_multipart_upload(session["object_name"], session["upload_id"])
+        except Exception:
+            pass  # La subida pudo haber sido abortada, expirada o nunca realizada
+        await upload_session_collection.delete_one({"_id": session["_id"]})
+
+    @staticmethod
+    async def _recover_completion(session: dict):
+        """Resuelve una finalización que quedó a medias porque el proceso cayó durante complete_session"""
+        if await file_collection.find_one({"object_name": session["object_name"]}, {"_id": 1}):
+            # El archivo llegó a guardarse: el objeto le pertenece y solo queda eliminar la sesión
+            await upload_session_collection.delete_one({"_id": session["_id"]})
+            return
+        if await BlobService.is_registered(session["object_name"]):
+            # Registrado sin archivo: sin referencias, el recolector de blobs elimina el objeto
+            await BlobService.release(session["object_name"])
+            await upload_session_collection.delete_one({"_id": session["_id"]})
+            return
+        if session.get("mode") != "presigned":
+            # La subida multiparte pudo completarse antes de la caída: abortarla ya no borra el objeto
+            try:
+                await storage.remove_object(session["object_name"])
+            except Exception:
+                pass
+        await UploadSessionService._discard(session)
+
+    @staticmethod
+    async def cleanup_stale_sessions(now: Optional[datetime] = None) -> int:
+        """Descarta en MinIO y elimina las sesiones y subidas directas que superaron su tiempo de vida.
+
+        Las sesiones que se estaban completando no se descartan a ciegas: su objeto puede pertenecer ya
+        a un archivo. Se revisan solo si llevan más de STALE_COMPLETION sin terminar.
+        """
+        now = now or datetime.utcnow()
+        removed = 0
+        async for session in upload_session_collection.find({"status": "active", "expires_at": {"$lt": now}}):
+            await UploadSessionService._discard(session)
+            removed += 1
+        stalled = {"status": "completing", "updated_at": {"$lt": now - STALE_COMPLETION}}
+        async for session in upload_session_collection.find(stalled):
+            await UploadSessionService._recover_completion(session)
+            removed += 1
+        return removed
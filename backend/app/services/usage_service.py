@@ -0,0 +1,161 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+
+from app.config import settings
+from app.database import file_collection, folder_collection, usage_collection
+from app.services.auth_service import AuthService
+from app.utils.exceptions import QuotaExceededException
+
+UsageDelta = Dict[str, int]
+
+
+class UsageService:
+    """Uso de almacenamiento por usuario, mantenido con $inc en cada operación.
+
+    Cada documento de `user_usage` usa como _id el nombre de usuario y guarda los bytes, archivos y
+    carpetas que posee, con un desglose por tipo (`by_type.<tipo>.bytes|files`, donde el tipo es la
+    parte principal del MIME: image, video, text...). Leer el uso es una sola consulta por _id.
+    Los bytes son lógicos: una copia cuenta aunque comparta el blob del original.
+
+    `python -m app.cli reconcile-usage` (y la tarea periódica USAGE_RECONCILE_INTERVAL_SECONDS)
+    recalcula los documentos a partir de los archivos y carpetas para corregir desviaciones.
+    """
+
+    @staticmethod
+    def category(file_type: Optional[str]) -> str:
+        """Tipo principal del MIME, usado como clave del desglose ('image/png' -> 'image')"""
+        major = (file_type or "").split("/")[0].strip().lower()
+        return major if major.isalnum() else "other"
+
+    @staticmethod
+    def _add_files(deltas: Dict[str, UsageDelta], file_docs: Iterable[dict], sign: int):
+        for file_doc in file_docs:
+            delta = deltas.setdefault(file_doc.get("owner"), {})
+            category = UsageService.category(file_doc.get("file_type"))
+            for field, value in (
+                ("bytes", file_doc.get("size", 0)),
+                ("files", 1),
+                (f"by_type.{category}.bytes", file_doc.get("size", 0)),
+                (f"by_type.{category}.files", 1),
+            ):
+                delta[field] = delta.get(field, 0) + sign * value
+
+    @staticmethod
+    async def adjust_many(deltas: Dict[Optional[str], UsageDelta]):
+        """Aplica los incrementos de varios usuarios en una sola escritura en lote"""
+        now = datetime.utcnow()
+        operations = []
+        for owner, delta in deltas.items():
+            inc = {field: value for field, value in delta.items() if value}
+            if owner is None or not inc:
+                continue
+            operations.append(UpdateOne({"_id": owner}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True))
+        if operations:
+            await usage_collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def files_added(file_docs: Iterable[dict]):
+        deltas = {}
+        UsageService._add_files(deltas, file_docs, 1)
+        await UsageService.adjust_many(deltas)
+
+    @staticmethod
+    async def files_removed(file_docs: Iterable[dict]):
+        """Resta archivos ya eliminados; los documentos deben incluir owner, size y file_type"""
+        deltas = {}
+        UsageService._add_files(deltas, file_docs, -1)
+        await UsageService.adjust_many(deltas)
+
+    @staticmethod
+    async def folders_changed(counts: Dict[Optional[str], int]):
+        """Suma (o resta, con valores negativos) carpetas por usuario"""
+        await UsageService.adjust_many({owner: {"folders": count} for owner, count in counts.items()})
+
+    @staticmethod
+    def quota_for(user: dict) -> Optional[int]:
+        """Cuota en bytes del usuario (campo `quota_bytes` o DEFAULT_USER_QUOTA_BYTES); None si no tiene límite"""
+        if AuthService.is_admin(user):
+            return None
+        quota = user.get("quota_bytes", settings.DEFAULT_USER_QUOTA_BYTES)
+        return quota if quota and quota > 0 else None
+
+    @staticmethod
+    async def get_usage(user: dict) -> dict:
+        username = user.get("username")
+        usage = await usage_collection.find_one({"_id": username}) or {}
+        return {
+            "username": username,
+            "bytes": usage.get("bytes", 0),
+            "files": usage.get("files", 0),
+            "folders": usage.get("folders", 0),
+            "by_type": usage.get("by_type", {}),
+            "quota_bytes": UsageService.quota_for(user),
+            "updated_at": usage.get("updated_at"),
+        }
+
+    @staticmethod
+    async def remaining_quota(user: dict) -> Optional[int]:
+        """Bytes que el usuario aún puede almacenar; None si no tiene límite"""
+        quota = UsageService.quota_for(user)
+        if quota is None:
+            return None
+        usage = await usage_collection.find_one({"_id": user.get("username")}, {"bytes": 1}) or {}
+        return max(quota - usage.get("bytes", 0), 0)
+
+    @staticmethod
+    async def check_quota(user: dict, incoming_bytes: int = 0) -> Optional[int]:
+        """Rechaza la operación si `incoming_bytes` no cabe en la cuota; devuelve los bytes disponibles.
+
+        Se llama antes de aceptar contenido. Con incoming_bytes=0 (tamaño desconocido) solo se exige que
+        quede espacio; el límite exacto lo aplica después la lectura del stream con los bytes devueltos.
+        """
+        remaining = await UsageService.remaining_quota(user)
+        if remaining is not None and (incoming_bytes > remaining or remaining == 0):
+            raise QuotaExceededException()
+        return remaining
+
+    @staticmethod
+    async def reconcile() -> dict:
+        """Recalcula el uso de todos los usuarios a partir de los archivos y carpetas existentes"""
+        usage: Dict[str, dict] = {}
+
+        def entry(owner: str) -> dict:
+            return usage.setdefault(owner, {"bytes": 0, "files": 0, "folders": 0, "by_type": {}})
+
+        pipeline = [
+            {
+                "$group": {
+                    "_id": {"owner": "$owner", "file_type": "$file_type"},
+                    "bytes": {"$sum": "$size"},
+                    "files": {"$sum": 1},
+                }
+            }
+        ]
+        async for group in file_collection.aggregate(pipeline, allowDiskUse=True):
+            owner = group["_id"].get("owner")
+            if owner is None:
+                continue
+            totals = entry(owner)
+            by_type = totals["by_type"].setdefault(
+                UsageService.category(group["_id"].get("file_type")), {"bytes": 0, "files": 0}
+            )
+            for field in ("bytes", "files"):
+                totals[field] += group[field]
+                by_type[field] += group[field]
+
+        async for group in folder_collection.aggregate([{"$group": {"_id": "$owner", "folders": {"$sum": 1}}}]):
+            if group["_id"] is not None:
+                entry(group["_id"])["folders"] = group["folders"]
+
+        now = datetime.utcnow()
+        operations = [
+            ReplaceOne({"_id": owner}, {**totals, "updated_at": now, "reconciled_at": now}, upsert=True)
+            for owner, totals in usage.items()
+        ]
+        if operations:
+            await usage_collection.bulk_write(operations, ordered=False)
+        # Usuarios que ya no tienen nada
+        result = await usage_collection.delete_many({"_id": {"$nin": list(usage)}})
+        return {"users_updated": len(operations), "users_removed": result.deleted_count}
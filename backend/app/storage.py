@@ -0,0 +1,140 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional
+
+from minio import Minio
+from minio.api import CopySource
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
+
+from app.config import settings
+from app.database import minio_client, minio_public_client
+
+
+class AsyncStorage:
+    """Adaptador asíncrono sobre el cliente de MinIO.
+
+    El SDK de MinIO es síncrono; cada llamada se ejecuta en un pool de hilos acotado
+    para no bloquear el event loop mientras se espera a la red.
+    """
+
+    def __init__(self, client: Minio, bucket_name: str, max_workers: int, presign_client: Optional[Minio] = None):
+        self.client = client
+        self.presign_client = presign_client or client
+        self.bucket_name = bucket_name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+
+    async def run(self, func, *args, **kwargs):
+        """Ejecuta una función bloqueante en el pool de almacenamiento"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def bucket_exists(self) -> bool:
+        return await self.run(self.client.bucket_exists, self.bucket_name)
+
+    async def put_object(
+        self,
+        object_name: str,
+        data: BinaryIO,
+        length: int = -1,
+        content_type: str = "application/octet-stream",
+        part_size: int = 0,
+    ):
+        """Sube un stream; con length=-1 se envía por partes de `part_size` (memoria acotada)"""
+        return await self.run(
+            self.client.put_object,
+            self.bucket_name,
+            object_name,
+            data=data,
+            length=length,
+            part_size=part_size or settings.UPLOAD_PART_SIZE,
+            num_parallel_uploads=1,
+            content_type=content_type,
+        )
+
+    async def copy_object(self, object_name: str, source_object_name: str):
+        return await self.run(
+            self.client.copy_object, self.bucket_name, object_name, CopySource(self.bucket_name, source_object_name)
+        )
+
+    async def remove_object(self, object_name: str):
+        return await self.run(self.client.remove_object, self.bucket_name, object_name)
+
+    async def remove_objects(self, object_names: List[str]) -> List[str]:
+        """Elimina varios objetos con una sola petición multi-objeto; devuelve los que fallaron"""
+        if not object_names:
+            return []
+
+        def _remove():
+            errors = self.client.remove_objects(self.bucket_name, [DeleteObject(name) for name in object_names])
+            # remove_objects es perezoso: hay que consumir el iterador para que se ejecute
+            return [error.name for error in errors]
+
+        return await self.run(_remove)
+
+    async def stat_object(self, object_name: str):
+        return await self.run(self.client.stat_object, self.bucket_name, object_name)
+
+    async def get_object(self, object_name: str, offset: int = 0, length: int = 0):
+        """Abre el objeto (opcionalmente un rango); el cuerpo se lee después con `iter_response`"""
+        return await self.run(self.client.get_object, self.bucket_name, object_name, offset=offset, length=length)
+
+    async def iter_response(self, response, chunk_size: int = 32 * 1024) -> AsyncIterator[bytes]:
+        """Itera el cuerpo de una respuesta de `get_object` leyendo cada bloque fuera del event loop"""
+        try:
+            stream = response.stream(chunk_size)
+            while True:
+                chunk = await self.run(next, stream, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    def presigned_get_url(
+        self, object_name: str, expires_seconds: int, response_headers: Optional[Dict[str, str]] = None
+    ) -> str:
+        """URL prefirmada de descarga; `response_headers` sobrescribe cabeceras como Content-Disposition"""
+        return self.presign_client.presigned_get_object(
+            self.bucket_name,
+            object_name,
+            expires=timedelta(seconds=expires_seconds),
+            response_headers=response_headers,
+        )
+
+    def presigned_put_url(self, object_name: str, expires_seconds: int) -> str:
+        """URL prefirmada para que el cliente suba el objeto directamente al almacenamiento"""
+        return self.presign_client.presigned_put_object(
+            self.bucket_name, object_name, expires=timedelta(seconds=expires_seconds)
+        )
+
+    # El SDK solo expone la subida multiparte completa dentro de put_object; para recibir las partes en
+    # peticiones separadas se usan sus métodos internos. Sus firmas no forman parte de la API pública:
+    # la versión de minio está fijada en requirements.txt y tests/test_storage.py las comprueba.
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        return await self.run(
+            self.client._create_multipart_upload, self.bucket_name, object_name, {"Content-Type": content_type}
+        )
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        return await self.run(
+            self.client._upload_part, self.bucket_name, object_name, data, None, upload_id, part_number
+        )
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Part]):
+        return await self.run(self.client._complete_multipart_upload, self.bucket_name, object_name, upload_id, parts)
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str):
+        return await self.run(self.client._abort_multipart_upload, self.bucket_name, object_name, upload_id)
+
+
+storage = AsyncStorage(
+    minio_client, settings.BUCKET_NAME, settings.STORAGE_MAX_WORKERS, presign_client=minio_public_client
+)
+
+
+def get_storage() -> AsyncStorage:
+    return storage
@@ -42,8 +42,22 @@ class ConflictException(AppException):
         super().__init__(status_code=409, detail=detail)
 
 
+class QuotaExceededException(AppException):
+    """Excepción de cuota de almacenamiento superada"""
+
+    def __init__(self, detail: str = "Cuota de almacenamiento superada"):
+        super().__init__(status_code=507, detail=detail)
+
+
 class InternalServerException(AppException):
     """Excepción de error interno del servidor"""
 
     def __init__(self, detail: str = "Error interno del servidor"):
         super().__init__(status_code=500, detail=detail)
+
+
+class RangeNotSatisfiableException(AppException):
+    """Excepción de rango de bytes no satisfacible"""
+
+    def __init__(self, size: int, detail: str = "Rango no satisfacible"):
+        super().__init__(status_code=416, detail=detail, headers={"Content-Range": f"bytes */{size}"})
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+from urllib.parse import quote
+
+from app.utils.exceptions import RangeNotSatisfiableException
+
+
+def format_http_date(value: datetime) -> str:
+    """Formatea una fecha (UTC naive o aware) como fecha HTTP (RFC 7231)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    """Convierte una fecha HTTP a datetime UTC naive; None si no es válida"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def quote_etag(etag: str) -> str:
+    return f'"{etag}"'
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """Comprueba si un If-None-Match / If-Range contiene el ETag dado"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: datetime) -> bool:
+    """Evalúa If-None-Match (prioritario) e If-Modified-Since para responder 304"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date(headers.get("if-modified-since"))
+    # Las fechas HTTP tienen resolución de segundos
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Interpreta un Range de un único intervalo y devuelve (inicio, fin) inclusivos.
+
+    Devuelve None si la cabecera no existe, está mal formada o pide varios intervalos
+    (se responde el recurso completo). Lanza 416 si el intervalo no es satisfacible.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes=") :].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    start_text, end_text = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not start_text:
+            # Sufijo: los últimos N bytes
+            suffix = int(end_text)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiableException(size)
+            return max(0, size - suffix), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableException(size)
+    if start < 0 or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def resolve_range(
+    headers: Mapping[str, str], size: int, etag: str, last_modified: datetime
+) -> Optional[Tuple[int, int]]:
+    """Aplica Range respetando If-Range: si el validador no coincide se sirve el recurso completo"""
+    if_range = headers.get("if-range")
+    if if_range:
+        if if_range.strip().startswith(('"', "W/")):
+            if not etag_matches(if_range, etag, weak=False):
+                return None
+        else:
+            since = parse_http_date(if_range)
+            if since is None or last_modified.replace(microsecond=0) > since:
+                return None
+    return parse_range(headers.get("range"), size)
+
+
+def content_disposition(filename: str, inline: bool = False) -> str:
+    """Cabecera Content-Disposition segura para nombres con caracteres no ASCII (RFC 6266)"""
+    disposition = "inline" if inline else "attachment"
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace('"', "'")
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
@@ -0,0 +1,60 @@
+import base64
+import binascii
+from typing import List, Optional, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING, DESCENDING
+
+from app.utils.exceptions import ValidationException
+
+SORT_KEYS = ["name", "size", "upload_date", "type"]
+SORT_PATTERN = f"^({'|'.join(SORT_KEYS)})$"
+
+# Campo real por colección para cada criterio de ordenación. Las carpetas no tienen tamaño ni tipo,
+# así que en esos casos se ordenan por nombre.
+FILE_SORT_FIELDS = {"name": "filename", "size": "size", "upload_date": "upload_date", "type": "file_type"}
+FOLDER_SORT_FIELDS = {"name": "name", "size": "name", "upload_date": "created_date", "type": "name"}
+
+
+def sort_spec(field: str, order: str) -> List[Tuple[str, int]]:
+    """Ordenación estable: el _id desempata documentos con el mismo valor"""
+    direction = DESCENDING if order == "desc" else ASCENDING
+    return [(field, direction), ("_id", direction)]
+
+
+def encode_cursor(data: dict) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(data).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValidationException("Cursor de paginación inválido")
+    if not isinstance(data, dict):
+        raise ValidationException("Cursor de paginación inválido")
+    return data
+
+
+def cursor_for(doc: dict, field: str, **extra) -> str:
+    """Cursor que apunta justo después de `doc` en la ordenación por `field`"""
+    return encode_cursor({"value": doc.get(field), "id": doc["_id"], **extra})
+
+
+def keyset_filter(query: dict, field: str, order: str, after: Optional[dict]) -> dict:
+    """Añade a `query` la condición de keyset para continuar tras el último elemento de la página anterior"""
+    if not after:
+        return query
+    op = "$lt" if order == "desc" else "$gt"
+    keyset = {"$or": [{field: {op: after["value"]}}, {field: after["value"], "_id": {op: after["id"]}}]}
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def check_cursor(after: Optional[dict], sort: str, order: str) -> Optional[dict]:
+    """Rechaza un cursor generado con otra ordenación"""
+    if after and "id" not in after:
+        raise ValidationException("Cursor de paginación inválido")
+    if after and (after.get("sort") != sort or after.get("order") != order):
+        raise ValidationException("El cursor no corresponde a la ordenación solicitada")
+    return after
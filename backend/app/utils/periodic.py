@@ -0,0 +1,17 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(task: Callable[[], Awaitable], interval_seconds: float, name: str = "tarea"):
+    """Ejecuta una corrutina cada `interval_seconds` hasta que se cancela; los errores no detienen el ciclo"""
+    while True:
+        try:
+            await task()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error en la tarea periódica '%s'", name)
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,55 @@
+import re
+import unicodedata
+from typing import List
+
+# Longitud máxima de los prefijos indexados; los términos de búsqueda más largos se recortan
+MAX_PREFIX_LENGTH = 16
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_SUBWORD_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+|[^\W\d_]+")
+# En la consulta (ya en minúsculas) solo se separan letras de dígitos: 'ventas2024' -> ventas, 2024
+_QUERY_RE = re.compile(r"[^\W\d_]+|\d+")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin acentos: 'Informe Año.PDF' -> 'informe ano.pdf'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas de un nombre, incluidas las partes de camelCase y de letras/dígitos.
+
+    'InformeVentas2024_final.pdf' -> informeventas2024, informe, ventas, 2024, final, pdf
+    """
+    stripped = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    tokens = []
+    for word in _WORD_RE.findall(stripped):
+        for token in [word, *_SUBWORD_RE.findall(word)]:
+            token = token.casefold()
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def search_fields(filename: str) -> dict:
+    """Campos de búsqueda que se guardan junto al archivo.
+
+    `search_terms` contiene todos los prefijos de cada palabra (hasta MAX_PREFIX_LENGTH), de modo que
+    una búsqueda por prefijo es una igualdad sobre un índice multikey.
+    """
+    terms = set()
+    for token in tokenize(filename):
+        for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+            terms.add(token[:length])
+    return {"search_name": normalize(filename), "search_terms": sorted(terms)}
+
+
+def query_terms(query: str) -> List[str]:
+    """Términos que deben aparecer todos en `search_terms` para que un archivo coincida"""
+    terms = []
+    for token in _QUERY_RE.findall(normalize(query)):
+        term = token[:MAX_PREFIX_LENGTH]
+        if term not in terms:
+            terms.append(term)
+    return terms
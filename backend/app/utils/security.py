@@ -1,13 +1,19 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import jwt
 from passlib.context import CryptContext
 
 from app.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Los hashes con un coste distinto de BCRYPT_ROUNDS se marcan para rehash
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt libera el GIL: un pool dedicado evita bloquear el event loop y limita cuántos hashes
+# se calculan a la vez; el resto espera en cola sin afectar a las demás peticiones
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -20,6 +26,22 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """Genera el hash de la contraseña en el pool de hashing"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica la contraseña en el pool de hashing.
+
+    Devuelve (válida, nuevo_hash); nuevo_hash no es None cuando el hash almacenado no cumple la política
+    actual (por ejemplo tras cambiar BCRYPT_ROUNDS) y debe guardarse en su lugar.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea token JWT de acceso"""
     to_encode = data.copy()
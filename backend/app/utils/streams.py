@@ -0,0 +1,27 @@
+import hashlib
+from typing import BinaryIO
+
+from app.utils.exceptions import ValidationException
+
+
+class LimitedReader:
+    """Envuelve un stream binario, cuenta y calcula el SHA-256 de los bytes leídos y aborta al superar el límite"""
+
+    def __init__(self, stream: BinaryIO, max_size: int, error_message: str = "El archivo es demasiado grande"):
+        self._stream = stream
+        self._max_size = max_size
+        self._error_message = error_message
+        self._sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read > self._max_size:
+            raise ValidationException(self._error_message)
+        self._sha256.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        """Hash del contenido leído hasta el momento (completo una vez agotado el stream)"""
+        return self._sha256.hexdigest()
@@ -0,0 +1,62 @@
+import codecs
+from typing import Optional, Tuple
+
+from app.utils.exceptions import ValidationException
+
+# Marcas de orden de bytes, de más larga a más corta (la de UTF-32 LE empieza como la de UTF-16 LE)
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# Si no hay BOM ni charset declarado: UTF-8 y, si no es válido, la codificación habitual de Windows
+_FALLBACK_ENCODINGS = ("utf-8", "cp1252")
+
+
+def declared_charset(content_type: Optional[str]) -> Optional[str]:
+    """Charset de un Content-Type ('text/plain; charset=ISO-8859-1' -> 'iso8859-1'); None si no es válido"""
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            try:
+                return codecs.lookup(value.strip().strip('"')).name
+            except LookupError:
+                return None
+    return None
+
+
+def _decode(data: bytes, encoding: str, final: bool) -> str:
+    """Decodifica estrictamente; con final=False descarta un carácter multibyte cortado al final"""
+    return codecs.getincrementaldecoder(encoding)(errors="strict").decode(data, final=final)
+
+
+def decode_text(data: bytes, truncated: bool, content_type: Optional[str] = None) -> Tuple[str, str]:
+    """Decodifica el comienzo de un archivo de texto y devuelve (texto, codificación).
+
+    Orden: BOM (si el resto es válido en esa codificación), charset del Content-Type, UTF-8 y cp1252;
+    latin-1 como último recurso, que acepta cualquier byte. Si `truncated` es True, los bytes de un
+    carácter incompleto al final se descartan en lugar de convertirse en un carácter de reemplazo.
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            try:
+                text = _decode(data[len(bom) :], encoding, not truncated)
+            except UnicodeDecodeError:
+                # Bytes que solo parecen una BOM (p. ej. un binario que empieza por FF FE)
+                continue
+            return text, encoding.replace("-le", "").replace("-be", "")
+
+    declared = declared_charset(content_type)
+    # Un byte nulo indica contenido binario, salvo en UTF-16/32 declarado sin BOM
+    if b"\x00" in data and not (declared or "").startswith(("utf-16", "utf-32")):
+        raise ValidationException("El archivo no es de texto")
+
+    candidates = [declared, *_FALLBACK_ENCODINGS]
+    for encoding in dict.fromkeys(candidate for candidate in candidates if candidate):
+        try:
+            return _decode(data, encoding, not truncated), encoding
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1"), "latin-1"
@@ -0,0 +1,55 @@
+import io
+from typing import Dict, Optional
+
+# Las miniaturas se guardan en WebP: admite transparencia y pesa menos que JPEG a igual calidad
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+THUMBNAIL_PREFIX = "thumbnails/"
+
+# Formatos que Pillow decodifica y para los que se generan miniaturas
+SOURCE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+# Límite de píxeles para rechazar "bombas de descompresión" (imágenes pequeñas en bytes pero enormes al decodificarse)
+MAX_PIXELS = 100_000_000
+
+
+class UnsupportedImageError(ValueError):
+    """El contenido no es una imagen que se pueda decodificar"""
+
+
+def is_thumbnail_source(content_type: Optional[str]) -> bool:
+    return (content_type or "").split(";")[0].strip().lower() in SOURCE_TYPES
+
+
+def rendition_name(object_name: str, size: str) -> str:
+    """Objeto de la miniatura `size` del blob `object_name`; derivado del blob, no del archivo"""
+    return f"{THUMBNAIL_PREFIX}{object_name}/{size}.webp"
+
+
+def render_thumbnails(data: bytes, sizes: Dict[str, int], quality: int = 80) -> Dict[str, bytes]:
+    """Genera una miniatura WebP por tamaño (lado máximo, sin ampliar). Se ejecuta en el pool de procesos.
+
+    Las imágenes JPEG se decodifican directamente a escala reducida (`draft`) y cada tamaño se obtiene
+    reduciendo el anterior, de mayor a menor, en lugar de volver a partir del original.
+    """
+    # Pillow solo se importa en los procesos que generan miniaturas
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            largest = max(sizes.values())
+            source.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ("RGB", "RGBA"):
+                has_alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise UnsupportedImageError(str(e)) from None
+
+    renditions = {}
+    for name, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        image.thumbnail((size, size))
+        buffer = io.BytesIO()
+        image.save(buffer, "WEBP", quality=quality, method=4)
+        renditions[name] = buffer.getvalue()
+    return renditions
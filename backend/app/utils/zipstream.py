@@ -0,0 +1,214 @@
+import struct
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+# Tipos cuyo contenido ya está comprimido: se guardan sin comprimir (método STORED)
+COMPRESSED_TYPE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+COMPRESSED_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/zstd",
+    "application/pdf",
+    "application/epub+zip",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.oasis.opendocument.text",
+    "application/vnd.oasis.opendocument.spreadsheet",
+    "application/vnd.oasis.opendocument.presentation",
+}
+# Formatos de imagen sin compresión, que sí ganan con deflate
+UNCOMPRESSED_IMAGE_TYPES = {"image/bmp", "image/svg+xml", "image/tiff", "image/x-portable-pixmap"}
+
+STORED, DEFLATED = 0, 8
+
+
+def is_compressed_type(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in UNCOMPRESSED_IMAGE_TYPES:
+        return False
+    return content_type in COMPRESSED_TYPES or content_type.startswith(COMPRESSED_TYPE_PREFIXES)
+
+
+def _dos_datetime(value: Optional[datetime]):
+    """Fecha y hora en formato MS-DOS (resolución de 2 segundos, desde 1980)"""
+    value = value or datetime.utcnow()
+    if value.year < 1980:
+        value = datetime(1980, 1, 1)
+    dos_time = (value.hour << 11) | (value.minute << 5) | (value.second // 2)
+    dos_date = ((value.year - 1980) << 9) | (value.month << 5) | value.day
+    return dos_time, dos_date
+
+
+class _Entry:
+    __slots__ = ("name", "method", "dos_time", "dos_date", "offset", "crc", "compressed_size", "size", "zip64")
+
+    def __init__(self, name: bytes, method: int, modified: Optional[datetime], offset: int, zip64: bool):
+        self.name = name
+        self.method = method
+        self.dos_time, self.dos_date = _dos_datetime(modified)
+        self.offset = offset
+        self.crc = 0
+        self.compressed_size = 0
+        self.size = 0
+        self.zip64 = zip64
+
+
+class ZipStream:
+    """Escritor de ZIP en streaming: cada llamada devuelve los bytes listos para enviar.
+
+    No necesita conocer el CRC ni el tamaño comprimido de antemano (usa descriptores de datos tras
+    cada entrada) ni hace seeks, así que el archivo se genera mientras se lee el contenido, sin
+    ficheros temporales. La memoria solo crece con el directorio central (unas decenas de bytes por
+    entrada). Usa ZIP64 cuando una entrada, un desplazamiento o el número de entradas lo requieren.
+
+        zip_stream = ZipStream()
+        yield zip_stream.start_file("a.txt", modified, compress=True, size_hint=len(data))
+        yield zip_stream.write(data)
+        yield zip_stream.end_file()
+        yield zip_stream.finish()
+    """
+
+    ZIP64_LIMIT = 0xFFFFFFFF
+    ZIP64_COUNT_LIMIT = 0xFFFF
+
+    def __init__(self, compression_level: int = 6):
+        self.compression_level = compression_level
+        self._entries: List[_Entry] = []
+        self._current: Optional[_Entry] = None
+        self._compressor = None
+        self._offset = 0
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def add_directory(self, name: str, modified: Optional[datetime] = None) -> bytes:
+        data = self.start_file(name.rstrip("/") + "/", modified, compress=False, size_hint=0)
+        return data + self.end_file()
+
+    def start_file(self, name: str, modified: Optional[datetime], compress: bool, size_hint: int) -> bytes:
+        """Cabecera local de una entrada; `size_hint` (tamaño sin comprimir) decide si se usa ZIP64"""
+        if self._current is not None:
+            raise RuntimeError("La entrada anterior no se ha cerrado")
+        # deflate puede expandir ligeramente los datos incompresibles
+        zip64 = size_hint * 1.05 > self.ZIP64_LIMIT
+        entry = _Entry(name.encode("utf-8"), DEFLATED if compress else STORED, modified, self._offset, zip64)
+        self._current = entry
+        self._compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, -15) if compress else None
+
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0) if zip64 else b""
+        size_field = 0xFFFFFFFF if zip64 else 0
+        header = struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50,
+            45 if zip64 else 20,
+            0x0808,  # bit 3: CRC y tamaños en el descriptor de datos; bit 11: nombre en UTF-8
+            entry.method,
+            entry.dos_time,
+            entry.dos_date,
+            0,
+            size_field,
+            size_field,
+            len(entry.name),
+            len(extra),
+        )
+        return self._emit(header + entry.name + extra)
+
+    def write(self, data: bytes) -> bytes:
+        entry = self._current
+        entry.crc = zlib.crc32(data, entry.crc)
+        entry.size += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        entry.compressed_size += len(data)
+        return self._emit(data)
+
+    def end_file(self) -> bytes:
+        """Datos pendientes del compresor y descriptor de datos de la entrada actual"""
+        entry = self._current
+        tail = b""
+        if self._compressor is not None:
+            tail = self._compressor.flush()
+            entry.compressed_size += len(tail)
+        if not entry.zip64 and max(entry.size, entry.compressed_size) >= self.ZIP64_LIMIT:
+            raise ValueError("La entrada supera el tamaño declarado y necesitaría ZIP64")
+        if entry.zip64:
+            descriptor = struct.pack("<IIQQ", 0x08074B50, entry.crc, entry.compressed_size, entry.size)
+        else:
+            descriptor = struct.pack("<IIII", 0x08074B50, entry.crc, entry.compressed_size, entry.size)
+        self._entries.append(entry)
+        self._current = None
+        self._compressor = None
+        return self._emit(tail + descriptor)
+
+    def finish(self) -> bytes:
+        """Directorio central y registro de fin de archivo (ZIP64 si hace falta)"""
+        if self._current is not None:
+            raise RuntimeError("La entrada actual no se ha cerrado")
+        central_offset = self._offset
+        records = []
+        for entry in self._entries:
+            extra_values = []
+            size, compressed_size, offset = entry.size, entry.compressed_size, entry.offset
+            if entry.zip64 or size >= self.ZIP64_LIMIT:
+                extra_values.append(size)
+                size = 0xFFFFFFFF
+            if entry.zip64 or compressed_size >= self.ZIP64_LIMIT:
+                extra_values.append(compressed_size)
+                compressed_size = 0xFFFFFFFF
+            if offset >= self.ZIP64_LIMIT:
+                extra_values.append(offset)
+                offset = 0xFFFFFFFF
+            extra = b""
+            if extra_values:
+                extra = struct.pack(f"<HH{len(extra_values)}Q", 0x0001, 8 * len(extra_values), *extra_values)
+            version = 45 if extra_values else 20
+            is_dir = entry.name.endswith(b"/")
+            external_attr = ((0o40755 << 16) | 0x10) if is_dir else (0o100644 << 16)
+            records.append(
+                struct.pack(
+                    "<IHHHHHHIIIHHHHHII",
+                    0x02014B50,
+                    (3 << 8) | version,  # creado en Unix, para conservar los permisos
+                    version,
+                    0x0808,
+                    entry.method,
+                    entry.dos_time,
+                    entry.dos_date,
+                    entry.crc,
+                    compressed_size,
+                    size,
+                    len(entry.name),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    external_attr,
+                    offset,
+                )
+                + entry.name
+                + extra
+            )
+        central = b"".join(records)
+        central_size = len(central)
+        count = len(self._entries)
+
+        end = b""
+        if count >= self.ZIP64_COUNT_LIMIT or central_size >= self.ZIP64_LIMIT or central_offset >= self.ZIP64_LIMIT:
+            zip64_end_offset = central_offset + central_size
+            end += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, central_size, central_offset)
+            end += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+            count = min(count, 0xFFFF)
+            central_size = min(central_size, 0xFFFFFFFF)
+            central_offset = min(central_offset, 0xFFFFFFFF)
+        end += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, central_size, central_offset, 0)
+        self._entries = []
+        return self._emit(central + end)
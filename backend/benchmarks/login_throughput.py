@@ -0,0 +1,76 @@
+"""Benchmark de logins concurrentes: throughput y retraso del event loop.
+
+Compara la verificación de contraseñas en el event loop (comportamiento anterior) con la
+verificación en el pool de hashing. No necesita MongoDB ni MinIO.
+
+Uso (desde backend/):
+    python -m benchmarks.login_throughput --logins 64 --concurrency 16 --rounds 12
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+
+async def _measure(verify, logins: int, concurrency: int) -> dict:
+    loop = asyncio.get_running_loop()
+    max_lag = 0.0
+    interval = 0.01
+
+    async def ticker():
+        nonlocal max_lag
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, loop.time() - start - interval)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await verify()
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    # Deja que el ticker registre el último bloqueo antes de detenerlo
+    await asyncio.sleep(interval * 2)
+    task.cancel()
+    return {"logins_per_second": logins / elapsed, "max_loop_lag_ms": max_lag * 1000}
+
+
+async def main(logins: int, concurrency: int):
+    from app.utils.security import pwd_context, verify_and_update_password
+
+    hashed = pwd_context.hash("benchmark-password")
+
+    async def inline_verify():
+        pwd_context.verify_and_update("benchmark-password", hashed)
+
+    async def pooled_verify():
+        await verify_and_update_password("benchmark-password", hashed)
+
+    for label, verify in [("event loop", inline_verify), ("pool", pooled_verify)]:
+        result = await _measure(verify, logins, concurrency)
+        print(
+            f"{label:>10}: {result['logins_per_second']:8.1f} logins/s, "
+            f"retraso máximo del loop {result['max_loop_lag_ms']:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=None, help="Coste de bcrypt (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, default=None, help="Hilos del pool (PASSWORD_HASH_WORKERS)")
+    args = parser.parse_args()
+    # La configuración se lee al importar app.config
+    if args.rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    asyncio.run(main(args.logins, args.concurrency))
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 import uvicorn
@@ -6,9 +7,19 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database import create_bucket_if_not_exists, user_collection
+from app.indexes import ensure_indexes
 from app.middleware.auth import AuthMiddleware
-from app.routers import auth, files, folders, health
-from app.utils.security import get_password_hash
+from app.routers import auth, batch, files, folders, health, jobs, search, trash, uploads, usage
+from app.services.auth_service import AuthService
+from app.services.blob_service import BlobService
+from app.services.job_worker import JobWorker
+from app.services.thumbnail_service import ThumbnailService
+from app.services.trash_service import TrashService
+from app.services.upload_session_service import UploadSessionService
+from app.services.usage_service import UsageService
+from app.storage import storage
+from app.utils.periodic import run_periodically
+from app.utils.security import hash_password
 
 app = FastAPI(
     title=settings.API_TITLE,
@@ -44,18 +55,28 @@ app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(files.router)
 app.include_router(folders.router)
+app.include_router(uploads.router)
+app.include_router(search.router)
+app.include_router(batch.router)
+app.include_router(usage.router)
+app.include_router(jobs.router)
+app.include_router(trash.router)
+
+background_tasks = []
 
 
 @app.on_event("startup")
 async def startup_event():
-    create_bucket_if_not_exists()
+    await storage.run(create_bucket_if_not_exists)
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes()
 
     admin = await user_collection.find_one({"username": "admin"})
     if not admin:
         await user_collection.insert_one(
             {
                 "username": "admin",
-                "hashed_password": get_password_hash("admin123"),
+                "hashed_password": await hash_password("admin123"),
                 "created_at": datetime.utcnow(),
                 "role": "admin",
             }
@@ -64,6 +85,45 @@ async def startup_event():
     else:
         if admin.get("role") != "admin":
             await user_collection.update_one({"_id": admin["_id"]}, {"$set": {"role": "admin"}})
+            AuthService.invalidate_user("admin")
+
+    background_tasks.append(
+        asyncio.create_task(
+            run_periodically(
+                UploadSessionService.cleanup_stale_sessions,
+                settings.UPLOAD_SESSION_GC_INTERVAL_SECONDS,
+                "limpieza de sesiones de subida",
+            )
+        )
+    )
+    background_tasks.append(
+        asyncio.create_task(
+            run_periodically(
+                BlobService.collect_garbage, settings.BLOB_GC_INTERVAL_SECONDS, "recolección de blobs huérfanos"
+            )
+        )
+    )
+    background_tasks.append(
+        asyncio.create_task(
+            run_periodically(
+                UsageService.reconcile, settings.USAGE_RECONCILE_INTERVAL_SECONDS, "conciliación del uso por usuario"
+            )
+        )
+    )
+    background_tasks.append(
+        asyncio.create_task(
+            run_periodically(TrashService.collect, settings.TRASH_GC_INTERVAL_SECONDS, "purga de la papelera")
+        )
+    )
+    if settings.RUN_JOBS_IN_API:
+        background_tasks.append(asyncio.create_task(JobWorker.run(settings.JOB_CONCURRENCY)))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    ThumbnailService.shutdown()
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.middleware.auth import AuthMiddleware
-from app.routers import auth, files, folders, health
+from app.routers import auth, batch, files, folders, health, jobs, search, trash, uploads, usage
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -48,6 +48,12 @@ app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(files.router)
 app.include_router(folders.router)
+app.include_router(uploads.router)
+app.include_router(search.router)
+app.include_router(batch.router)
+app.include_router(usage.router)
+app.include_router(jobs.router)
+app.include_router(trash.router)
 
 
 # Startup sin dependencias externas para testing
@@ -25,6 +25,32 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Evita que un usuario o un listado cacheado en una prueba se filtre a la siguiente"""
+    from app.services.auth_service import user_cache
+    from app.services.file_service import preview_cache
+    from app.services.folder_service import content_cache
+
+    user_cache.clear()
+    content_cache.clear()
+    preview_cache.clear()
+    yield
+    user_cache.clear()
+    content_cache.clear()
+    preview_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def usage_collection():
+    """Los contadores de uso se actualizan en cada operación; sin MongoDB se escriben en una colección simulada"""
+    with patch("app.services.usage_service.usage_collection") as mock_usage:
+        mock_usage.bulk_write = AsyncMock()
+        mock_usage.find_one = AsyncMock(return_value=None)
+        mock_usage.delete_many = AsyncMock(return_value=MagicMock(deleted_count=0))
+        yield mock_usage
+
+
 @pytest.fixture
 def client():
     """Fixture para cliente de pruebas síncronas"""
@@ -103,6 +129,22 @@ def mock_auth():
         }
 
 
+@pytest.fixture
+def current_user():
+    """Usuario autenticado en las pruebas de endpoints"""
+    return {"username": "ana", "role": "user"}
+
+
+@pytest.fixture
+def auth_headers(current_user):
+    """Cabeceras de una petición autenticada como `current_user` sin consultar la base de datos"""
+    with (
+        patch("app.middleware.auth.decode_access_token", return_value={"sub": current_user["username"]}),
+        patch("app.services.auth_service.AuthService.get_user", new=AsyncMock(return_value=current_user)),
+    ):
+        yield {"Authorization": "Bearer token"}
+
+
 @pytest.fixture
 async def async_client():
     """Fixture para cliente de pruebas asíncronas"""
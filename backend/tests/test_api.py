@@ -1,9 +1,11 @@
 import io
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from bson import ObjectId
 from fastapi.testclient import TestClient
 
+from app.utils.exceptions import ValidationException
 from main_test import app  # Use test version
 
 
@@ -150,6 +152,89 @@ class TestFileEndpoints:
             except Exception:
                 pytest.skip("File service not accessible")
 
+    def test_upload_many_failed_file_does_not_fail_the_batch(self, client, auth_headers):
+        """Test que un archivo rechazado no hace fallar al resto de la subida múltiple"""
+
+        async def store_stream(stream, content_type, max_size, max_size_message):
+            data = stream.read()
+            if data == b"roto":
+                raise ValidationException("El archivo es demasiado grande")
+            return {"object_name": f"blobs/{data.decode()}", "size": len(data), "sha256": data.decode()}
+
+        with (
+            patch("app.services.file_service.BlobService.store_stream", new=store_stream),
+            patch("app.services.file_service.file_collection") as mock_files,
+            patch("app.services.file_service.FolderStatsService.adjust", new=AsyncMock()) as mock_adjust,
+        ):
+            mock_files.insert_many = AsyncMock()
+            response = client.post(
+                "/files/upload-many",
+                headers=auth_headers,
+                files=[
+                    ("files", ("a.txt", b"uno", "text/plain")),
+                    ("files", ("b.txt", b"roto", "text/plain")),
+                    ("files", ("c.txt", b"tres", "text/plain")),
+                ],
+            )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["succeeded"], body["failed"]) == (2, 1)
+        assert [result["status"] for result in body["results"]] == ["ok", "error", "ok"]
+        assert body["results"][1]["detail"] == "El archivo es demasiado grande"
+        assert body["results"][2]["file"]["object_name"] == "blobs/tres"
+
+        mock_files.insert_many.assert_awaited_once()
+        assert [doc["filename"] for doc in mock_files.insert_many.await_args.args[0]] == ["a.txt", "c.txt"]
+        mock_adjust.assert_awaited_once_with(None, "ana", files=2)
+
+    def test_upload_over_quota_is_rejected_before_storing(self, client, auth_headers, current_user, usage_collection):
+        """Test que una subida que supera la cuota se rechaza sin escribir en el almacenamiento"""
+        current_user["quota_bytes"] = 100
+        usage_collection.find_one = AsyncMock(return_value={"_id": "ana", "bytes": 95})
+        with patch("app.services.file_service.BlobService.store_stream", new=AsyncMock()) as store_stream:
+            response = client.post(
+                "/files/upload", headers=auth_headers, files={"file": ("a.txt", b"0123456789", "text/plain")}
+            )
+
+        assert response.status_code == 507
+        store_stream.assert_not_called()
+
+    def test_thumbnail_is_served_with_long_lived_cache(self, client, auth_headers):
+        """Test que la miniatura se sirve con caché inmutable y responde 304 a su ETag"""
+        file_doc = {
+            "_id": "507f1f77bcf86cd799439011",
+            "owner": "ana",
+            "file_type": "image/jpeg",
+            "size": 10,
+            "object_name": "blobs/abc",
+            "etag": "abc",
+            "thumbnails": {"small": "thumbnails/blobs/abc/small.webp"},
+        }
+
+        async def iter_response(response):
+            yield b"webp"
+
+        with (
+            patch("app.services.thumbnail_service.FileService.get_file", new=AsyncMock(return_value=file_doc)),
+            patch("app.services.thumbnail_service.storage") as mock_storage,
+            patch("app.routers.files.storage") as mock_router_storage,
+        ):
+            mock_storage.get_object = AsyncMock(return_value=MagicMock())
+            mock_router_storage.iter_response = iter_response
+            url = f"/files/{file_doc['_id']}/thumbnail?size=small"
+            response = client.get(url, headers=auth_headers)
+            cached = client.get(url, headers={**auth_headers, "If-None-Match": '"abc-small"'})
+            invalid = client.get(f"{url}x", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.content == b"webp"
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+        assert cached.status_code == 304
+        assert invalid.status_code == 400
+        mock_storage.get_object.assert_awaited_once_with("thumbnails/blobs/abc/small.webp")
+
 
 class TestFolderEndpoints:
     """Tests para endpoints de carpetas"""
@@ -242,3 +327,57 @@ class TestFolderEndpoints:
                     pytest.skip("Auth dependencies not available")
             except Exception:
                 pytest.skip("Folder service not accessible")
+
+    def test_unchanged_folder_is_served_from_cache_and_answers_304(self, client, auth_headers):
+        """Test que un listado sin cambios se sirve de la caché y responde 304 a su ETag"""
+        folder_id = str(ObjectId())
+        with (
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+        ):
+            mock_stats.version = AsyncMock(return_value=7)
+            mock_stats.total_items = AsyncMock(return_value=0)
+            mock_folders.find_one = AsyncMock(return_value={"_id": ObjectId(folder_id), "owner": "ana"})
+            for collection in (mock_folders, mock_files):
+                collection.find = MagicMock()
+                collection.find.return_value.sort.return_value.to_list = AsyncMock(return_value=[])
+
+            first = client.get(f"/folders/{folder_id}/content", headers=auth_headers)
+            second = client.get(f"/folders/{folder_id}/content", headers=auth_headers)
+            revalidated = client.get(
+                f"/folders/{folder_id}/content", headers={**auth_headers, "If-None-Match": first.headers["ETag"]}
+            )
+
+        assert first.status_code == 200
+        assert second.json() == first.json()
+        assert second.headers["ETag"] == first.headers["ETag"]
+        assert revalidated.status_code == 304
+        # Solo la primera petición consulta las colecciones
+        assert mock_folders.find.call_count == 1
+        assert mock_stats.total_items.await_count == 1
+
+    def test_large_folder_delete_returns_202_with_job(self, client, auth_headers):
+        """Test que eliminar una carpeta grande encola un trabajo y responde 202"""
+        folder = {"_id": ObjectId(), "owner": "ana", "file_count": 5000, "folder_count": 10}
+        job_id = ObjectId()
+
+        async def insert_one(job):
+            return type("Result", (), {"inserted_id": job_id})()
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.job_service.job_collection") as mock_jobs,
+            patch("app.services.folder_service.FolderService.delete_subtree", new=AsyncMock()) as delete_subtree,
+        ):
+            mock_folders.find_one = AsyncMock(return_value=folder)
+            mock_jobs.insert_one = AsyncMock(side_effect=insert_one)
+            response = client.delete(f"/folders/{folder['_id']}", headers=auth_headers)
+
+        assert response.status_code == 202
+        assert response.headers["location"] == f"/jobs/{job_id}"
+        assert response.json()["_id"] == str(job_id)
+        assert response.json()["status"] == "queued"
+        job = mock_jobs.insert_one.await_args.args[0]
+        assert job["type"] == "delete_folder" and job["params"] == {"folder_id": folder["_id"]}
+        delete_subtree.assert_not_called()
@@ -0,0 +1,43 @@
+"""Tests para las descargas en ZIP"""
+
+import asyncio
+import io
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.archive_service import ArchiveService
+
+
+class TestArchiveService:
+    """Pruebas del ZIP de carpetas y selecciones"""
+
+    @pytest.mark.asyncio
+    async def test_next_object_is_opened_while_current_is_written(self):
+        events = []
+
+        async def get_object(object_name):
+            events.append(f"open {object_name}")
+            return object_name
+
+        async def iter_response(response):
+            # Como en el almacenamiento real, leer cada bloque cede el event loop
+            await asyncio.sleep(0)
+            events.append(f"read {response}")
+            yield response.encode()
+
+        async def entries():
+            yield "a/", None, None
+            for name in ("x", "y", "z"):
+                yield f"a/{name}.txt", {"object_name": name, "file_type": "text/plain", "size": 1}, None
+
+        with patch("app.services.archive_service.storage", new=MagicMock()) as mock_storage:
+            mock_storage.get_object = get_object
+            mock_storage.iter_response = iter_response
+            archive = b"".join([chunk async for chunk in ArchiveService._stream(entries())])
+
+        assert events == ["open x", "open y", "read x", "open z", "read y", "read z"]
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            assert zf.namelist() == ["a/", "a/x.txt", "a/y.txt", "a/z.txt"]
+            assert zf.read("a/y.txt") == b"y"
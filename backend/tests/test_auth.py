@@ -1,11 +1,18 @@
 """Tests para funcionalidades de autenticación"""
 
+import asyncio
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from bson import ObjectId
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
 
+from app.services.auth_service import AuthService
+from app.utils import security
+from app.utils.exceptions import UnauthorizedException
+from app.utils.security import hash_password, verify_and_update_password
 from main_test import app
 
 
@@ -81,3 +88,81 @@ class TestAuthEndpoints:
             if response.status_code != 500:
                 assert response.status_code == 401
                 assert "inválidas" in response.json()["detail"]
+
+
+class TestUserCache:
+    """Pruebas de la caché de usuarios autenticados"""
+
+    @pytest.mark.asyncio
+    async def test_get_user_is_cached_until_invalidated(self):
+        with patch("app.services.auth_service.user_collection") as mock_users:
+            mock_users.find_one = AsyncMock(return_value={"username": "ana", "role": "user"})
+            mock_users.update_one = AsyncMock()
+
+            first = await AuthService.get_user("ana")
+            first["role"] = "modificado"  # las copias devueltas no alteran la caché
+            assert (await AuthService.get_user("ana"))["role"] == "user"
+            assert mock_users.find_one.await_count == 1
+
+            await AuthService.update_user("ana", {"role": "admin"})
+            await AuthService.get_user("ana")
+            assert mock_users.find_one.await_count == 2
+
+    def test_user_resolved_once_per_request(self, client, auth_headers):
+        with patch("app.services.folder_service.FolderService.list_folders", new=AsyncMock(return_value=[])):
+            response = client.get("/folders", headers=auth_headers)
+
+        assert response.status_code == 200
+        # get_user es el simulacro de auth_headers mientras dura la prueba
+        assert AuthService.get_user.await_count == 1
+
+
+class TestPasswordHashing:
+    """Pruebas del hashing de contraseñas fuera del event loop"""
+
+    @pytest.mark.asyncio
+    async def test_hashing_does_not_block_event_loop(self):
+        loop = asyncio.get_running_loop()
+        max_lag = 0.0
+
+        async def ticker():
+            nonlocal max_lag
+            while True:
+                start = loop.time()
+                await asyncio.sleep(0.005)
+                max_lag = max(max_lag, loop.time() - start - 0.005)
+
+        start = time.perf_counter()
+        hashed = await hash_password("secreto")
+        single_hash = time.perf_counter() - start
+
+        task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(verify_and_update_password("secreto", hashed) for _ in range(8)))
+        task.cancel()
+
+        assert all(valid for valid, _ in results)
+        # Con el hash en el event loop el retraso sería de al menos un hash completo
+        assert max_lag < single_hash
+
+    @pytest.mark.asyncio
+    async def test_login_rehashes_when_cost_changes(self):
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secreto")
+        with (
+            patch.object(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5)),
+            patch("app.services.auth_service.user_collection") as mock_users,
+        ):
+            mock_users.find_one = AsyncMock(return_value={"username": "ana", "hashed_password": old_hash})
+            mock_users.update_one = AsyncMock()
+
+            await AuthService.authenticate_user("ana", "secreto")
+
+            new_hash = mock_users.update_one.await_args.args[1]["$set"]["hashed_password"]
+            assert new_hash.startswith("$2b$05$")
+            assert security.pwd_context.verify("secreto", new_hash)
+
+            # Una contraseña incorrecta no provoca rehash
+            mock_users.update_one.reset_mock()
+            AuthService.invalidate_user("ana")
+            with pytest.raises(UnauthorizedException):
+                await AuthService.authenticate_user("ana", "otra")
+            mock_users.update_one.assert_not_awaited()
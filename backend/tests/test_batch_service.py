@@ -0,0 +1,215 @@
+"""Tests para las operaciones en lote"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.batch_service import BatchService
+from app.utils.exceptions import QuotaExceededException
+
+
+class TestBatchOperations:
+    """Pruebas de las operaciones en lote sobre la selección"""
+
+    @pytest.mark.asyncio
+    async def test_move_uses_one_query_and_one_update(self):
+        source_id, target_id = ObjectId(), ObjectId()
+        target = {"_id": target_id, "name": "t", "path": "/t/", "ancestors": [], "owner": "ana"}
+        files = [
+            {"_id": ObjectId(), "folder_id": source_id, "ancestors": [source_id], "owner": "ana"} for _ in range(3)
+        ]
+        foreign = {"_id": ObjectId(), "folder_id": None, "ancestors": [], "owner": "luis"}
+
+        with (
+            patch("app.services.batch_service.folder_collection") as mock_folders,
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch("app.services.batch_service.FolderStatsService.adjust_many", new=AsyncMock()) as mock_adjust,
+            patch("app.services.batch_service.FolderRollupService.apply", new=AsyncMock()) as mock_rollups,
+        ):
+            mock_folders.find_one = AsyncMock(return_value=target)
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=files + [foreign])
+            mock_files.update_many = AsyncMock()
+
+            ids = [str(doc["_id"]) for doc in files + [foreign]] + ["no-es-un-id"]
+            result = await BatchService.move(ids, [], str(target_id), {"username": "ana"})
+
+        assert mock_files.find.call_count == 1
+        query, update = mock_files.update_many.await_args.args
+        assert query == {"_id": {"$in": [doc["_id"] for doc in files]}}
+        assert update["$set"] == {"folder_id": target_id, "path": "/t/", "ancestors": [target_id]}
+        assert mock_adjust.await_args.args[0] == {source_id: {"files": -3}, target_id: {"files": 3}}
+        mock_rollups.assert_awaited_once_with(
+            {source_id: {"total_size": 0, "file_count": -3}, target_id: {"total_size": 0, "file_count": 3}}, "ana"
+        )
+        assert (result["succeeded"], result["failed"]) == (3, 2)
+
+    @pytest.mark.asyncio
+    async def test_items_inside_a_moved_folder_are_skipped(self):
+        parent = {"_id": ObjectId(), "name": "a", "path": "/a/", "ancestors": [], "owner": "ana"}
+        child = {"_id": ObjectId(), "name": "b", "path": "/a/b/", "ancestors": [parent["_id"]], "owner": "ana"}
+        nested_file = {"_id": ObjectId(), "folder_id": child["_id"], "ancestors": [parent["_id"], child["_id"]]}
+
+        with (
+            patch("app.services.batch_service.folder_collection") as mock_folders,
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch("app.services.batch_service.FolderService.move_into", new=AsyncMock()) as mock_move,
+        ):
+            mock_folders.find = MagicMock()
+            mock_folders.find.return_value.to_list = AsyncMock(return_value=[child, parent])
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=[{**nested_file, "owner": "ana"}])
+
+            result = await BatchService.move(
+                [str(nested_file["_id"])], [str(child["_id"]), str(parent["_id"])], None, {"username": "ana"}
+            )
+
+        mock_move.assert_awaited_once()
+        assert mock_move.await_args.args[0] is parent
+        mock_files.update_many.assert_not_called()
+        statuses = {item["id"]: item["status"] for item in result["results"]}
+        assert statuses == {str(parent["_id"]): "ok", str(child["_id"]): "skipped", str(nested_file["_id"]): "skipped"}
+
+    @pytest.mark.asyncio
+    async def test_copy_and_delete_files_in_bulk(self):
+        files = [
+            {
+                "_id": ObjectId(),
+                "filename": f"f{i}.txt",
+                "size": 1,
+                "file_type": "text/plain",
+                "object_name": f"blobs/{i}",
+                "folder_id": None,
+                "ancestors": [],
+                "owner": "ana",
+            }
+            for i in range(2)
+        ]
+        ids = [str(doc["_id"]) for doc in files]
+
+        with (
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch("app.services.folder_service.file_collection", new=mock_files),
+            patch("app.services.trash_service.file_collection", new=mock_files),
+            patch("app.services.batch_service.BlobService") as mock_blobs,
+            patch("app.services.batch_service.FolderStatsService.adjust_many", new=AsyncMock()) as mock_stats,
+        ):
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=files)
+            mock_files.insert_many = AsyncMock()
+            mock_files.update_many = AsyncMock(return_value=MagicMock(modified_count=2))
+            mock_files.delete_many = AsyncMock()
+            mock_blobs.acquire_many = AsyncMock()
+            mock_blobs.release_many = AsyncMock()
+
+            copied = await BatchService.copy(ids, [], None, {"username": "ana"})
+            deleted = await BatchService.delete(ids, [], {"username": "ana"})
+
+        inserted = mock_files.insert_many.await_args.args[0]
+        assert [doc["filename"] for doc in inserted] == ["f0.txt", "f1.txt"]
+        assert [item["new_id"] for item in copied["results"]] == [str(doc["_id"]) for doc in inserted]
+        copy_stats, delete_stats = (call.args[0] for call in mock_stats.await_args_list)
+        assert copy_stats == {"root:ana": {"files": 2}}
+
+        # Eliminar los mueve a la papelera con una sola escritura; los blobs se liberan al purgarlos
+        trash_filter, trash_update = mock_files.update_many.await_args.args
+        assert trash_filter == {"_id": {"$in": [doc["_id"] for doc in files]}, "deleted_at": None}
+        assert set(trash_update["$set"]) == {"deleted_at", "purge_at", "trash_claim"}
+        mock_files.delete_many.assert_not_called()
+        mock_blobs.release_many.assert_not_called()
+        assert delete_stats == {"root:ana": {"files": -2}}
+        assert deleted["succeeded"] == 2
+
+    @pytest.mark.asyncio
+    async def test_copy_quota_counts_selected_folders_once(self):
+        parent = {"_id": ObjectId(), "name": "a", "ancestors": [], "owner": "ana", "total_size": 100}
+        child = {"_id": ObjectId(), "name": "b", "ancestors": [parent["_id"]], "owner": "ana", "total_size": 40}
+        nested_file = {"_id": ObjectId(), "ancestors": [parent["_id"], child["_id"]], "owner": "ana", "size": 10}
+        loose_file = {"_id": ObjectId(), "ancestors": [], "owner": "ana", "size": 5}
+
+        with (
+            patch("app.services.batch_service.folder_collection") as mock_folders,
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch(
+                "app.services.batch_service.UsageService.check_quota",
+                new=AsyncMock(side_effect=QuotaExceededException()),
+            ) as mock_quota,
+            patch("app.services.batch_service.FolderService.copy_into", new=AsyncMock()) as mock_copy,
+        ):
+            mock_folders.find = MagicMock()
+            mock_folders.find.return_value.to_list = AsyncMock(return_value=[child, parent])
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=[nested_file, loose_file])
+
+            with pytest.raises(QuotaExceededException):
+                await BatchService.copy(
+                    [str(nested_file["_id"]), str(loose_file["_id"])],
+                    [str(child["_id"]), str(parent["_id"])],
+                    None,
+                    {"username": "ana"},
+                )
+
+        # Solo la carpeta de arriba y el archivo suelto: el resto ya está incluido en total_size
+        assert mock_quota.await_args.args[1] == 105
+        mock_copy.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unexpected_folder_error_is_reported_per_item(self):
+        failing = {"_id": ObjectId(), "name": "a", "ancestors": [], "owner": "ana"}
+        other = {"_id": ObjectId(), "name": "b", "ancestors": [], "owner": "ana"}
+
+        with (
+            patch("app.services.batch_service.folder_collection") as mock_folders,
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch(
+                "app.services.batch_service.FolderService.move_into",
+                new=AsyncMock(side_effect=[Exception("connection reset"), None]),
+            ),
+        ):
+            mock_folders.find = MagicMock()
+            mock_folders.find.return_value.to_list = AsyncMock(return_value=[failing, other])
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=[])
+
+            result = await BatchService.move([], [str(failing["_id"]), str(other["_id"])], None, {"username": "ana"})
+
+        statuses = {item["id"]: (item["status"], item["detail"]) for item in result["results"]}
+        assert statuses == {str(failing["_id"]): ("error", "connection reset"), str(other["_id"]): ("ok", None)}
+
+    @pytest.mark.asyncio
+    async def test_large_folders_are_queued_as_jobs(self):
+        large = {"_id": ObjectId(), "name": "a", "ancestors": [], "owner": "ana", "file_count": 5000}
+        nested_file = {"_id": ObjectId(), "ancestors": [large["_id"]], "owner": "ana", "size": 1}
+
+        async def enqueue(job_type, params, owner):
+            return {"_id": ObjectId(), "type": job_type, "params": params, "owner": owner}
+
+        with (
+            patch("app.services.batch_service.folder_collection") as mock_folders,
+            patch("app.services.batch_service.file_collection") as mock_files,
+            patch("app.services.folder_service.JobService.enqueue", new=AsyncMock(side_effect=enqueue)) as mock_enqueue,
+            patch("app.services.batch_service.FolderService.copy_into", new=AsyncMock()) as mock_copy,
+            patch("app.services.batch_service.FolderService.delete_subtree", new=AsyncMock()) as mock_delete,
+            patch("app.services.folder_service.settings.JOB_FOLDER_THRESHOLD_ITEMS", 1000),
+        ):
+            mock_folders.find = MagicMock()
+            mock_folders.find.return_value.to_list = AsyncMock(return_value=[large])
+            mock_files.find = MagicMock()
+            mock_files.find.return_value.to_list = AsyncMock(return_value=[nested_file])
+
+            ids = ([str(nested_file["_id"])], [str(large["_id"])])
+            copied = await BatchService.copy(*ids, None, {"username": "ana"})
+            deleted = await BatchService.delete(*ids, {"username": "ana"})
+
+        mock_copy.assert_not_called()
+        mock_delete.assert_not_called()
+        copy_job, delete_job = (call.args for call in mock_enqueue.await_args_list)
+        assert copy_job[0] == "copy_folder" and copy_job[1]["folder_id"] == large["_id"]
+        assert delete_job[0] == "delete_folder" and delete_job[1] == {"folder_id": large["_id"]}
+        for result, job in ((copied, copy_job), (deleted, delete_job)):
+            folder_result, file_result = result["results"]
+            assert (folder_result["status"], file_result["status"]) == ("queued", "skipped")
+            assert folder_result["job_id"] is not None
+            assert (result["queued"], result["skipped"]) == (1, 1)
+        assert copied["results"][0]["new_id"] == str(copy_job[1]["copy_root_id"])
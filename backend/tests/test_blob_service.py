@@ -0,0 +1,69 @@
+"""Tests para el almacenamiento deduplicado de blobs"""
+
+import hashlib
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.blob_service import BlobService
+
+
+class TestBlobService:
+    """Tests para el almacenamiento deduplicado por hash"""
+
+    async def test_duplicate_content_reuses_existing_blob(self):
+        """Test que un contenido ya almacenado solo incrementa la referencia y borra el temporal"""
+        content = b"contenido repetido"
+        digest = hashlib.sha256(content).hexdigest()
+
+        async def fake_put(object_name, reader, **kwargs):
+            while reader.read(4):
+                pass
+
+        with (
+            patch("app.services.blob_service.storage") as mock_storage,
+            patch("app.services.blob_service.blob_collection") as mock_blobs,
+        ):
+            mock_storage.put_object = AsyncMock(side_effect=fake_put)
+            mock_storage.remove_object = AsyncMock()
+            mock_storage.copy_object = AsyncMock()
+            mock_blobs.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+
+            blob = await BlobService.store_stream(io.BytesIO(content), "text/plain", 1024, "grande")
+
+        assert blob == {"object_name": f"blobs/{digest}", "size": len(content), "sha256": digest}
+        mock_storage.copy_object.assert_not_called()
+        mock_storage.remove_object.assert_awaited_once()
+        assert mock_storage.remove_object.await_args.args[0].startswith("tmp/")
+
+    async def test_release_marks_orphans(self):
+        """Test que liberar referencias agrupa por objeto y marca los blobs sin referencias"""
+        with patch("app.services.blob_service.blob_collection") as mock_blobs:
+            mock_blobs.bulk_write = AsyncMock()
+            mock_blobs.update_many = AsyncMock()
+            await BlobService.release_many(["a", "b", "a"])
+
+        requests = mock_blobs.bulk_write.await_args.args[0]
+        assert {r._filter["_id"]: r._doc["$inc"]["refcount"] for r in requests} == {"a": -2, "b": -1}
+        orphan_filter = mock_blobs.update_many.await_args.args[0]
+        assert orphan_filter["refcount"] == {"$lte": 0}
+
+    async def test_collected_blobs_remove_their_thumbnails(self):
+        candidates = [
+            {"_id": "blobs/foto", "content_type": "image/png"},
+            {"_id": "blobs/doc", "content_type": "text/plain"},
+        ]
+        with (
+            patch("app.services.blob_service.blob_collection") as mock_blobs,
+            patch("app.services.blob_service.storage") as mock_storage,
+        ):
+            mock_blobs.find.return_value.to_list = AsyncMock(return_value=candidates)
+            mock_blobs.update_many = AsyncMock()
+            mock_blobs.distinct = AsyncMock(return_value=["blobs/foto", "blobs/doc"])
+            mock_blobs.delete_many = AsyncMock()
+            mock_storage.remove_objects = AsyncMock(return_value=[])
+
+            summary = await BlobService.collect_garbage(batch_size=10)
+
+        assert summary["removed"] == 2
+        removed_thumbnails = mock_storage.remove_objects.await_args_list[1].args[0]
+        assert removed_thumbnails == ["thumbnails/blobs/foto/small.webp", "thumbnails/blobs/foto/large.webp"]
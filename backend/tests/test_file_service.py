@@ -0,0 +1,84 @@
+"""Tests para el servicio de archivos"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.services.file_service import FileService
+
+
+class TestUploadFiles:
+    """Pruebas de la subida de varios archivos en una petición"""
+
+    @pytest.mark.asyncio
+    async def test_rejected_metadata_releases_blob_reference(self):
+        files = [MagicMock(filename=name, size=1, content_type="text/plain") for name in ("a.txt", "b.txt")]
+        blobs = [{"object_name": f"blobs/{i}", "size": 1, "sha256": str(i)} for i in range(2)]
+        error = BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "rechazado"}]})
+
+        with (
+            patch("app.services.file_service.BlobService") as mock_blobs,
+            patch("app.services.file_service.file_collection") as mock_files,
+            patch("app.services.file_service.FolderStatsService.adjust", new=AsyncMock()),
+        ):
+            mock_blobs.store_stream = AsyncMock(side_effect=blobs)
+            mock_blobs.release_many = AsyncMock()
+            mock_files.insert_many = AsyncMock(side_effect=error)
+
+            result = await FileService.upload_files(files, {"username": "ana"})
+
+        assert [item["status"] for item in result["results"]] == ["ok", "error"]
+        mock_blobs.release_many.assert_awaited_once_with(["blobs/1"])
+
+    @pytest.mark.asyncio
+    async def test_undeclared_sizes_cannot_exceed_quota_together(self):
+        # Sin tamaño declarado, cada archivo cabe por separado en la cuota restante pero no los tres juntos
+        files = [MagicMock(filename=f"{i}.txt", size=None, content_type="text/plain") for i in range(3)]
+
+        async def store_stream(stream, content_type, max_size, max_size_message):
+            await asyncio.sleep(0)
+            index = next(i for i, file in enumerate(files) if file.file is stream)
+            return {"object_name": f"blobs/{index}", "size": 4, "sha256": str(index)}
+
+        with (
+            patch("app.services.file_service.UsageService.check_quota", new=AsyncMock(return_value=10)),
+            patch("app.services.file_service.BlobService") as mock_blobs,
+            patch("app.services.file_service.file_collection") as mock_files,
+            patch("app.services.file_service.FolderStatsService.adjust", new=AsyncMock()),
+        ):
+            mock_blobs.store_stream = store_stream
+            mock_blobs.release = AsyncMock()
+            mock_files.insert_many = AsyncMock()
+
+            result = await FileService.upload_files(files, {"username": "ana"})
+
+        assert [item["status"] for item in result["results"]] == ["ok", "ok", "error"]
+        mock_blobs.release.assert_awaited_once_with("blobs/2")
+        assert [doc["filename"] for doc in mock_files.insert_many.await_args.args[0]] == ["0.txt", "1.txt"]
+
+
+class TestTextPreview:
+    """Pruebas de la vista previa de texto"""
+
+    @pytest.mark.asyncio
+    async def test_preview_reads_only_the_head_and_is_cached(self):
+        file_doc = {"object_name": "blobs/log", "size": 10_000_000, "file_type": "text/plain"}
+
+        async def iter_response(response):
+            yield b"linea\n" * 200
+
+        with (
+            patch.object(FileService, "get_file", new=AsyncMock(return_value=file_doc)),
+            patch("app.services.file_service.storage") as mock_storage,
+        ):
+            mock_storage.get_object = AsyncMock(return_value=MagicMock())
+            mock_storage.iter_response = iter_response
+            first = await FileService.get_text_preview("id", {"username": "ana"}, max_bytes=1200)
+            second = await FileService.get_text_preview("id", {"username": "ana"}, max_bytes=1200)
+
+        assert first == second
+        assert first["truncated"] is True and first["size"] == 10_000_000
+        assert first["text"] == "linea\n" * 200
+        mock_storage.get_object.assert_awaited_once_with("blobs/log", offset=0, length=1200)
@@ -0,0 +1,41 @@
+"""Tests para los totales recursivos de carpetas"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.folder_rollup_service import FolderRollupService
+
+
+class TestFolderRollups:
+    """Pruebas de los totales recursivos de las carpetas"""
+
+    def test_file_deltas_reach_every_ancestor(self):
+        root, child = ObjectId(), ObjectId()
+        deltas = FolderRollupService.add_files(
+            {}, [{"size": 10, "ancestors": [root, child]}, {"size": 5, "ancestors": [root]}], sign=-1
+        )
+        assert deltas == {root: {"total_size": -15, "file_count": -2}, child: {"total_size": -10, "file_count": -1}}
+
+    @pytest.mark.asyncio
+    async def test_apply_is_one_bulk_write_and_invalidates_listings(self):
+        common, old_parent, new_parent = ObjectId(), ObjectId(), ObjectId()
+        file_doc = {"size": 7, "ancestors": [common, old_parent], "owner": "ana"}
+        deltas = FolderRollupService.add_files({}, [file_doc], sign=-1)
+        FolderRollupService.add_files(deltas, [{**file_doc, "ancestors": [common, new_parent]}])
+
+        with (
+            patch("app.services.folder_rollup_service.folder_collection") as mock_folders,
+            patch("app.services.folder_rollup_service.FolderStatsService.touch_many", new=AsyncMock()) as touch_many,
+        ):
+            mock_folders.bulk_write = AsyncMock()
+            await FolderRollupService.apply(deltas, "ana")
+
+        operations = mock_folders.bulk_write.await_args.args[0]
+        # La carpeta común a origen y destino no cambia y no se escribe
+        assert {op._filter["_id"]: op._doc["$inc"] for op in operations} == {
+            old_parent: {"total_size": -7, "file_count": -1},
+            new_parent: {"total_size": 7, "file_count": 1},
+        }
+        touch_many.assert_awaited_once_with([old_parent, new_parent, "root:ana"])
@@ -0,0 +1,335 @@
+"""Tests para el servicio de carpetas"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.services.folder_service import FolderService
+from app.utils.exceptions import NotFoundException, ValidationException
+from app.utils.pagination import decode_cursor
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    """Evalúa el subconjunto de filtros de MongoDB que usa el recorrido de subárboles"""
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(_matches(doc, part) for part in condition):
+                return False
+            continue
+        value = doc.get(field)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict) and "$ne" in condition:
+            if condition["$ne"] in values:
+                return False
+        elif condition not in values:
+            return False
+    return True
+
+
+async def _find(docs: list, query: dict):
+    for doc in docs:
+        if _matches(doc, query):
+            yield doc
+
+
+class TestFolderTree:
+    """Pruebas del modelo de árbol con ancestros materializados"""
+
+    def test_child_location(self):
+        root_id, child_id = ObjectId(), ObjectId()
+        assert FolderService.child_location(None) == {"path": "/", "ancestors": []}
+        child = {"_id": child_id, "path": "/a/b/", "ancestors": [root_id]}
+        assert FolderService.child_location(child) == {"path": "/a/b/", "ancestors": [root_id, child_id]}
+
+    @pytest.mark.asyncio
+    async def test_move_into_descendant_is_rejected(self):
+        folder_id, descendant_id = ObjectId(), ObjectId()
+        folder = {"_id": folder_id, "name": "a", "path": "/a/", "ancestors": [], "owner": "user"}
+        descendant = {"_id": descendant_id, "name": "c", "path": "/a/b/c/", "ancestors": [folder_id], "owner": "user"}
+
+        with patch("app.services.folder_service.folder_collection") as mock_folders:
+            mock_folders.find_one = AsyncMock(side_effect=[folder, descendant])
+            with pytest.raises(ValidationException):
+                await FolderService.move_folder(str(folder_id), str(descendant_id), {"username": "user"})
+            mock_folders.update_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_move_rebases_subtree_with_one_update_per_collection(self):
+        root_id, folder_id, target_id = ObjectId(), ObjectId(), ObjectId()
+        folder = {"_id": folder_id, "name": "a", "path": "/r/a/", "ancestors": [root_id], "owner": "user"}
+        target = {"_id": target_id, "name": "t", "path": "/t/", "ancestors": [], "owner": "user"}
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+            patch("app.services.folder_service.FolderRollupService.apply", new=AsyncMock()) as mock_rollups,
+        ):
+            mock_stats.adjust_many = AsyncMock()
+            mock_stats.touch_subtree = AsyncMock()
+            mock_folders.find_one = AsyncMock(side_effect=[folder, target, None, folder])
+            mock_folders.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+            mock_folders.update_many = AsyncMock()
+            mock_files.update_many = AsyncMock()
+
+            await FolderService.move_folder(str(folder_id), str(target_id), {"username": "user"})
+
+        update = mock_folders.update_one.call_args.args[1]["$set"]
+        assert update["path"] == "/t/a/"
+        assert update["ancestors"] == [target_id]
+
+        for collection in (mock_folders, mock_files):
+            collection.update_many.assert_awaited_once()
+            query, pipeline = collection.update_many.call_args.args
+            assert query == {"ancestors": folder_id}
+            rebase = pipeline[0]["$set"]
+            assert rebase["path"]["$concat"][0] == "/t/a/"
+            assert rebase["path"]["$concat"][1]["$substrCP"][1] == len("/r/a/")
+            assert rebase["ancestors"]["$concatArrays"] == [
+                [target_id],
+                {"$slice": ["$ancestors", 1, {"$size": "$ancestors"}]},
+            ]
+        assert mock_stats.touch_subtree.await_args.args[0] == folder_id
+        # El subárbol (la carpeta y su contenido) pasa de la raíz antigua al destino en una sola escritura
+        mock_rollups.assert_awaited_once()
+        rollups = mock_rollups.await_args.args[0]
+        assert rollups[root_id]["folder_count"] == -1 and rollups[target_id]["folder_count"] == 1
+
+
+class TestFolderDelete:
+    """Pruebas del borrado de subárboles en lotes"""
+
+    @staticmethod
+    def _setup(mock_files, mock_folders, folder, files):
+        async def cursor():
+            for file_doc in files:
+                yield file_doc
+
+        mock_folders.find_one = AsyncMock(return_value=folder)
+        mock_folders.delete_many = AsyncMock(return_value=MagicMock(deleted_count=3))
+        mock_folders.distinct = AsyncMock(return_value=[folder["_id"]])
+        mock_files.find.return_value.batch_size.return_value = cursor()
+        mock_files.update_many = AsyncMock()
+
+    @pytest.mark.asyncio
+    async def test_delete_subtree_in_batches(self):
+        folder = {"_id": ObjectId(), "owner": "user", "ancestors": []}
+        files = [{"_id": ObjectId(), "object_name": f"blobs/{n}", "folder_id": folder["_id"]} for n in range(3)]
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.BlobService.release_many", new_callable=AsyncMock) as release_many,
+            patch("app.services.folder_service.settings.BULK_BATCH_SIZE", 2),
+            patch("app.services.folder_service.FolderStatsService", new=AsyncMock()) as mock_stats,
+        ):
+            self._setup(mock_files, mock_folders, folder, files)
+            mock_files.delete_many = AsyncMock(side_effect=[MagicMock(deleted_count=2), MagicMock(deleted_count=1)])
+            summary = await FolderService.delete_folder(str(folder["_id"]), {"username": "user"})
+
+        assert summary["files_deleted"] == 3
+        assert summary["folders_deleted"] == 3
+        assert summary["failed"] == []
+        assert mock_files.delete_many.await_count == 2
+        assert [list(call.args[0]) for call in release_many.await_args_list] == [
+            ["blobs/0", "blobs/1"],
+            ["blobs/2"],
+        ]
+        mock_folders.delete_many.assert_awaited_once_with(
+            {"$or": [{"_id": folder["_id"]}, {"ancestors": folder["_id"]}]}
+        )
+        mock_stats.remove.assert_awaited_once_with([folder["_id"]])
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_reported_and_folders_kept(self):
+        folder = {"_id": ObjectId(), "owner": "user", "ancestors": []}
+        files = [{"_id": ObjectId(), "object_name": f"blobs/{n}", "folder_id": folder["_id"]} for n in range(3)]
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.BlobService.release_many", new_callable=AsyncMock),
+            patch("app.services.folder_service.settings.BULK_BATCH_SIZE", 2),
+            patch("app.services.folder_service.FolderStatsService", new=AsyncMock()) as mock_stats,
+        ):
+            self._setup(mock_files, mock_folders, folder, files)
+            mock_files.delete_many = AsyncMock(side_effect=[Exception("timeout"), MagicMock(deleted_count=1)])
+            summary = await FolderService.delete_folder(str(folder["_id"]), {"username": "user"})
+
+        assert summary["files_deleted"] == 1
+        assert summary["failed"] == [{"stage": "files", "count": 2, "error": "timeout"}]
+        mock_folders.delete_many.assert_not_called()
+        # Solo se descuenta el archivo que sí se eliminó
+        mock_stats.adjust_many.assert_awaited_once_with({folder["_id"]: {"files": -1}})
+
+
+class TestFolderCopy:
+    """Pruebas del motor de copia de carpetas"""
+
+    @pytest.mark.asyncio
+    async def test_unique_name_single_query(self):
+        with patch("app.services.folder_service.folder_collection") as mock_folders:
+            mock_folders.distinct = AsyncMock(return_value=["Docs", "Docs (1)", "Docs (3)"])
+            name = await FolderService._unique_name("Docs", None, "user")
+
+        assert name == "Docs (2)"
+        mock_folders.distinct.assert_awaited_once()
+        query = mock_folders.distinct.call_args.args[1]
+        assert query["name"]["$regex"] == r"^Docs( \(\d+\))?$"
+
+    @pytest.mark.asyncio
+    async def test_copy_subtree_batches_and_reports(self):
+        def aiter(items):
+            async def generator():
+                for item in items:
+                    yield item
+
+            return generator()
+
+        source_id, sub_id = ObjectId(), ObjectId()
+        source = {"_id": source_id, "name": "src", "path": "/src/", "ancestors": []}
+        dest = {"_id": ObjectId(), "name": "src (1)", "path": "/src (1)/", "ancestors": []}
+        subfolder = {"_id": sub_id, "name": "sub", "parent_folder_id": source_id, "ancestors": [source_id]}
+        files = [
+            {
+                "_id": ObjectId(),
+                "filename": f"f{n}.txt",
+                "size": 1,
+                "file_type": "text/plain",
+                "object_name": f"blobs/{n}",
+                "folder_id": source_id if n < 2 else sub_id,
+            }
+            for n in range(3)
+        ]
+        file_error = BulkWriteError(
+            {"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key error index: _id_"}]}
+        )
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.BlobService") as mock_blobs,
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+            patch("app.services.folder_service.FolderRollupService.apply", new=AsyncMock()),
+            patch("app.services.folder_service.settings.BULK_BATCH_SIZE", 2),
+        ):
+            mock_stats.adjust_many = AsyncMock()
+            mock_folders.find = MagicMock(return_value=aiter([subfolder]))
+            mock_folders.insert_many = AsyncMock()
+            mock_files.find.return_value.batch_size.return_value = aiter(files)
+            mock_files.insert_many = AsyncMock(side_effect=[file_error, None])
+            mock_blobs.acquire_many = AsyncMock()
+            mock_blobs.release_many = AsyncMock()
+
+            summary = await FolderService._copy_subtree(source, dest, "user")
+
+        assert summary == {"folders_copied": 2, "files_copied": 3, "failed": []}
+        folder_copy = mock_folders.insert_many.call_args.args[0][0]
+        assert folder_copy["_id"] == FolderService._derived_id(dest["_id"], sub_id)
+        assert folder_copy["path"] == "/src (1)/sub/"
+        assert folder_copy["ancestors"] == [dest["_id"]]
+
+        copied = [doc for call in mock_files.insert_many.call_args_list for doc in call.args[0]]
+        assert {doc["folder_id"] for doc in copied} == {dest["_id"], folder_copy["_id"]}
+        assert mock_blobs.acquire_many.await_count == 2
+        # La copia que ya existía (reintento) devuelve la referencia que se acababa de añadir
+        mock_blobs.release_many.assert_awaited_once_with(["blobs/0"])
+        # Los contadores solo suman lo insertado en esta ejecución
+        deltas = [call.args[0] for call in mock_stats.adjust_many.await_args_list]
+        assert deltas[0] == {dest["_id"]: {"folders": 1}}
+        assert sum(delta.get(dest["_id"], {}).get("files", 0) for delta in deltas) == 1
+        assert sum(delta.get(folder_copy["_id"], {}).get("files", 0) for delta in deltas) == 1
+
+    @pytest.mark.asyncio
+    async def test_copy_into_own_child_does_not_copy_itself(self):
+        source_id, child_id, root_id = ObjectId(), ObjectId(), ObjectId()
+        source = {"_id": source_id, "name": "a", "path": "/a/", "ancestors": []}
+        child = {"_id": child_id, "name": "b", "parent_folder_id": source_id, "ancestors": [source_id]}
+        # Raíz de la copia ya creada dentro de /a/b/ (forma parte del subárbol del origen)
+        dest = {"_id": root_id, "name": "a", "parent_folder_id": child_id, "path": "/a/b/a/"}
+        dest["ancestors"] = [source_id, child_id]
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+            patch("app.services.folder_service.FolderRollupService.apply", new=AsyncMock()),
+        ):
+            mock_stats.adjust_many = AsyncMock()
+            mock_folders.find = MagicMock(side_effect=lambda query, projection: _find([child, dest], query))
+            mock_folders.insert_many = AsyncMock()
+            mock_files.find.return_value.batch_size.return_value = _find([], {})
+
+            summary = await FolderService._copy_subtree(source, dest, "user")
+
+        assert summary == {"folders_copied": 2, "files_copied": 0, "failed": []}
+        copied = mock_folders.insert_many.await_args.args[0]
+        assert [(doc["name"], doc["path"]) for doc in copied] == [("b", "/a/b/a/b/")]
+
+
+class TestFolderContent:
+    """Pruebas del listado paginado de una carpeta"""
+
+    @pytest.mark.asyncio
+    async def test_folder_content_moves_from_folders_to_files(self):
+        folders = [{"_id": ObjectId(), "name": "a", "ancestors": []}]
+        files = [{"_id": ObjectId(), "filename": f"{n}.txt", "folder_id": None} for n in range(2)]
+
+        def cursor_returning(items):
+            cursor = MagicMock()
+            cursor.sort.return_value.to_list = AsyncMock(return_value=items)
+            return cursor
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+        ):
+            mock_folders.find.return_value = cursor_returning(folders)
+            mock_files.find.return_value = cursor_returning(files)
+            mock_stats.total_items = AsyncMock(return_value=12)
+
+            page = await FolderService.get_folder_content("root", {"username": "user"}, limit=3)
+
+        assert page["total_items"] == 12
+        assert len(page["folders"]) == 1 and len(page["files"]) == 2
+        mock_files.find.return_value.sort.return_value.to_list.assert_awaited_once_with(2)
+        next_cursor = decode_cursor(page["next_cursor"])
+        assert next_cursor["phase"] == "files"
+        assert next_cursor["value"] == "1.txt"
+
+    @pytest.mark.asyncio
+    async def test_content_etag_follows_version_and_scope(self):
+        folder_id = str(ObjectId())
+        admin = {"username": "root", "role": "admin"}
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.FolderStatsService.version", new=AsyncMock(return_value=3)),
+        ):
+            mock_folders.find_one = AsyncMock(return_value={"_id": ObjectId(folder_id), "owner": "ana"})
+            etag = await FolderService.content_etag(folder_id, {"username": "ana"})
+            assert etag == await FolderService.content_etag(folder_id, {"username": "ana"})
+            assert etag != await FolderService.content_etag(folder_id, admin)
+            assert etag != await FolderService.content_etag(folder_id, {"username": "ana"}, limit=10)
+            with patch("app.services.folder_service.FolderStatsService.version", new=AsyncMock(return_value=4)):
+                assert etag != await FolderService.content_etag(folder_id, {"username": "ana"})
+            with patch("app.services.folder_service.FolderStatsService.version", new=AsyncMock(return_value=None)):
+                assert await FolderService.content_etag(folder_id, {"username": "ana"}) is None
+
+    @pytest.mark.asyncio
+    async def test_other_users_folder_is_not_probed(self):
+        folder_id = str(ObjectId())
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.FolderStatsService") as mock_stats,
+        ):
+            mock_folders.find_one = AsyncMock(return_value={"_id": ObjectId(folder_id), "owner": "ana"})
+            with pytest.raises(NotFoundException):
+                await FolderService.content_etag(folder_id, {"username": "luis"})
+            with pytest.raises(NotFoundException):
+                await FolderService.get_folder_content(folder_id, {"username": "luis"})
+
+        mock_stats.version.assert_not_called()
+        mock_stats.total_items.assert_not_called()
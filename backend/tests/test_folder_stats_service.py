@@ -0,0 +1,26 @@
+"""Tests para los contadores de carpetas"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.folder_stats_service import FolderStatsService
+
+
+class TestFolderStats:
+    """Pruebas de los contadores y versiones de carpetas"""
+
+    @pytest.mark.asyncio
+    async def test_every_adjustment_bumps_version(self):
+        folder_id = ObjectId()
+        with patch("app.services.folder_stats_service.folder_stats_collection") as mock_stats:
+            mock_stats.bulk_write = AsyncMock()
+            await FolderStatsService.touch(folder_id, "ana")
+            await FolderStatsService.adjust(None, "ana", files=1)
+
+        touch, adjust = (call.args[0][0] for call in mock_stats.bulk_write.await_args_list)
+        assert touch._filter == {"_id": folder_id}
+        assert touch._doc == {"$inc": {"version": 1}}
+        assert adjust._filter == {"_id": "root:ana"}
+        assert adjust._doc == {"$inc": {"files": 1, "version": 1}}
@@ -0,0 +1,63 @@
+"""Tests para el registro de índices"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from app import indexes
+
+
+class TestIndexRegistry:
+    """Pruebas del registro declarativo de índices"""
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes_continues_after_failure(self):
+        async def create_indexes(models):
+            if models[0].document["name"] == "owner_parent_name_unique":
+                raise OperationFailure("E11000 duplicate key")
+
+        collection = MagicMock()
+        collection.create_indexes = AsyncMock(side_effect=create_indexes)
+        db = MagicMock()
+        db.get_collection.return_value = collection
+
+        with (
+            patch.object(indexes, "INDEXES", {"folders": indexes.INDEXES["folders"]}),
+            patch.object(indexes, "db", db),
+        ):
+            summary = await indexes.ensure_indexes()
+
+        assert summary["folders"]["errors"][0]["index"] == "owner_parent_name_unique"
+        declared = [model.document["name"] for model in indexes.INDEXES["folders"]]
+        assert summary["folders"]["ensured"] == declared[1:]
+
+    @pytest.mark.asyncio
+    async def test_index_report_missing_undeclared_unused(self):
+        async def aiter(items):
+            for item in items:
+                yield item
+
+        collection = MagicMock()
+        collection.list_indexes = MagicMock(
+            return_value=aiter([{"name": "_id_"}, {"name": "username_unique"}, {"name": "legacy_idx"}])
+        )
+        collection.aggregate = MagicMock(
+            return_value=aiter(
+                [
+                    {"name": "_id_", "accesses": {"ops": 10, "since": None}},
+                    {"name": "username_unique", "accesses": {"ops": 0, "since": None}},
+                    {"name": "legacy_idx", "accesses": {"ops": 3, "since": None}},
+                ]
+            )
+        )
+        db = MagicMock()
+        db.get_collection.return_value = collection
+        registry = {"users": indexes.INDEXES["users"] + indexes.INDEXES["upload_sessions"]}
+
+        with patch.object(indexes, "INDEXES", registry), patch.object(indexes, "db", db):
+            report = await indexes.index_report()
+
+        assert report["users"]["missing"] == ["expires_at", "status_updated_at"]
+        assert report["users"]["undeclared"] == ["legacy_idx"]
+        assert report["users"]["unused"] == ["username_unique"]
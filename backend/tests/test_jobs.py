@@ -0,0 +1,74 @@
+"""Tests para los trabajos en segundo plano"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.folder_service import FolderService
+from app.services.job_worker import JobWorker
+
+
+class TestJobs:
+    """Pruebas de los trabajos en segundo plano para carpetas grandes"""
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_delete_at_next_batch(self):
+        folder = {"_id": ObjectId(), "owner": "ana", "ancestors": []}
+        files = [{"_id": ObjectId(), "object_name": f"blobs/{n}", "folder_id": folder["_id"]} for n in range(4)]
+        job = {"_id": ObjectId(), "type": "delete_folder", "params": {"folder_id": folder["_id"]}, "worker_id": "w"}
+
+        async def cursor():
+            for file_doc in files:
+                yield file_doc
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.file_collection") as mock_files,
+            patch("app.services.folder_service.BlobService.release_many", new=AsyncMock()),
+            patch("app.services.folder_service.FolderStatsService", new=AsyncMock()),
+            patch("app.services.folder_service.FolderRollupService.apply", new=AsyncMock()),
+            patch("app.services.folder_service.settings.BULK_BATCH_SIZE", 2),
+            patch("app.services.job_service.job_collection") as mock_jobs,
+        ):
+            mock_folders.find_one = AsyncMock(return_value=folder)
+            mock_folders.delete_many = AsyncMock()
+            mock_files.find.return_value.batch_size.return_value = cursor()
+            mock_files.delete_many = AsyncMock(return_value=MagicMock(deleted_count=2))
+            mock_jobs.find_one_and_update = AsyncMock(return_value={"cancel_requested": True})
+            mock_jobs.update_one = AsyncMock()
+            await JobWorker.execute(job)
+
+        # El primer lote se eliminó; el resto y las carpetas se conservan
+        assert mock_files.delete_many.await_count == 1
+        mock_folders.delete_many.assert_not_called()
+        progress = mock_jobs.find_one_and_update.await_args.args[1]["$set"]["progress"]
+        assert progress["files_deleted"] == 2
+        finished = mock_jobs.update_one.await_args.args[1]["$set"]
+        assert finished["status"] == "cancelled"
+
+    @pytest.mark.asyncio
+    async def test_resumed_copy_reuses_root_created_by_previous_attempt(self):
+        source = {"_id": ObjectId(), "name": "src", "path": "/src/", "ancestors": []}
+        copy_root = {"_id": ObjectId(), "name": "src (1)", "path": "/src (1)/", "ancestors": []}
+        job = {
+            "_id": ObjectId(),
+            "owner": "ana",
+            "worker_id": "w",
+            "params": {"folder_id": source["_id"], "parent_folder_id": None, "copy_root_id": copy_root["_id"]},
+        }
+        summary = {"folders_copied": 1, "files_copied": 0, "failed": []}
+
+        with (
+            patch("app.services.folder_service.folder_collection") as mock_folders,
+            patch("app.services.folder_service.FolderService._create_copy_root", new=AsyncMock()) as create_root,
+            patch(
+                "app.services.folder_service.FolderService._copy_subtree", new=AsyncMock(return_value=summary)
+            ) as copy_subtree,
+        ):
+            mock_folders.find_one = AsyncMock(side_effect=[source, copy_root])
+            result = await FolderService.run_copy_job(job)
+
+        create_root.assert_not_called()
+        assert copy_subtree.await_args.args[:3] == (source, copy_root, "ana")
+        assert result == {"folder_id": str(copy_root["_id"]), **summary}
@@ -0,0 +1,39 @@
+"""Tests para el servicio de búsqueda"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.search_service import SearchService
+from app.utils.exceptions import ValidationException
+from app.utils.pagination import decode_cursor
+
+
+class TestSearch:
+    """Pruebas de la búsqueda indexada por nombre"""
+
+    def test_build_query_filters(self):
+        folder_id = str(ObjectId())
+        query = SearchService.build_query(
+            {"username": "user"}, "Foto playa", folder_id=folder_id, file_type="image/", size_min=10
+        )
+        assert query["search_terms"] == {"$all": ["foto", "playa"]}
+        assert query["owner"] == "user"
+        assert query["ancestors"] == ObjectId(folder_id)
+        assert query["file_type"]["$gte"] == "image/"
+        assert query["size"] == {"$gte": 10}
+
+        with pytest.raises(ValidationException):
+            SearchService.build_query({"username": "user"}, "...")
+
+    @pytest.mark.asyncio
+    async def test_search_paginates_by_offset(self):
+        with patch("app.services.search_service.file_collection") as mock_files:
+            mock_files.aggregate.return_value.to_list = AsyncMock(return_value=[{"_id": n} for n in range(3)])
+            page = await SearchService.search({"username": "user"}, "informe", limit=2)
+
+        assert len(page["items"]) == 2
+        assert decode_cursor(page["next_cursor"]) == {"offset": 2}
+        pipeline = mock_files.aggregate.call_args.args[0]
+        assert pipeline[0] == {"$match": {"search_terms": {"$all": ["informe"]}, "deleted_at": None, "owner": "user"}}
@@ -0,0 +1,37 @@
+"""Tests para el adaptador asíncrono de almacenamiento"""
+
+import inspect
+from unittest.mock import MagicMock
+
+from minio import Minio
+
+from app.storage import AsyncStorage
+
+
+class TestAsyncStorage:
+    """Tests para el adaptador asíncrono de almacenamiento"""
+
+    async def test_iter_response_reads_chunks_and_releases_connection(self):
+        """Test que itera el cuerpo por bloques y libera la conexión al terminar"""
+        response = MagicMock()
+        response.stream.return_value = iter([b"abc", b"def"])
+        storage = AsyncStorage(MagicMock(), "bucket", max_workers=2)
+
+        chunks = [chunk async for chunk in storage.iter_response(response, chunk_size=3)]
+
+        assert chunks == [b"abc", b"def"]
+        response.stream.assert_called_once_with(3)
+        response.close.assert_called_once()
+        response.release_conn.assert_called_once()
+
+    def test_private_multipart_methods_keep_their_signatures(self):
+        """Test que los métodos internos de MinIO usados en la subida multiparte aceptan los argumentos esperados"""
+        expected = {
+            "_create_multipart_upload": ["bucket_name", "object_name", "headers"],
+            "_upload_part": ["bucket_name", "object_name", "data", "headers", "upload_id", "part_number"],
+            "_complete_multipart_upload": ["bucket_name", "object_name", "upload_id", "parts"],
+            "_abort_multipart_upload": ["bucket_name", "object_name", "upload_id"],
+        }
+        for name, params in expected.items():
+            signature = inspect.signature(getattr(Minio, name))
+            assert list(signature.parameters)[1 : len(params) + 1] == params, name
@@ -0,0 +1,34 @@
+"""Tests para el servicio de miniaturas"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.thumbnail_service import ThumbnailService
+
+
+class TestThumbnailService:
+    """Pruebas de las miniaturas de imágenes"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_render_once(self):
+        file_doc = {"object_name": "blobs/abc", "file_type": "image/png", "size": 10}
+
+        async def render(object_name):
+            await asyncio.sleep(0)
+            return {"small": f"thumbnails/{object_name}/small.webp"}
+
+        with (
+            patch("app.services.thumbnail_service.file_collection") as mock_files,
+            patch.object(ThumbnailService, "_render", new=AsyncMock(side_effect=render)) as mock_render,
+        ):
+            mock_files.find_one = AsyncMock(return_value=None)
+            mock_files.update_many = AsyncMock()
+            first, second = await asyncio.gather(ThumbnailService.ensure(file_doc), ThumbnailService.ensure(file_doc))
+
+        assert first == second == {"small": "thumbnails/blobs/abc/small.webp"}
+        mock_render.assert_awaited_once_with("blobs/abc")
+        mock_files.update_many.assert_awaited_once_with(
+            {"object_name": "blobs/abc", "thumbnails": None}, {"$set": {"thumbnails": first}}
+        )
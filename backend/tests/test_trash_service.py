@@ -0,0 +1,205 @@
+"""Tests para la papelera"""
+
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.folder_service import FolderService
+from app.services.trash_service import TrashService
+
+_OPERATORS = {
+    "$eq": lambda doc, field, values, operand: operand in values,
+    "$ne": lambda doc, field, values, operand: operand not in values,
+    "$in": lambda doc, field, values, operand: any(item in operand for item in values),
+    "$exists": lambda doc, field, values, operand: (field in doc) == operand,
+    "$gt": lambda doc, field, values, operand: doc.get(field) is not None and doc[field] > operand,
+}
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    """Evalúa el subconjunto de filtros de MongoDB que usan el borrado de carpetas y la papelera"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, part) for part in condition):
+                return False
+            continue
+        value = doc.get(field)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if not all(_OPERATORS[operator](doc, field, values, operand) for operator, operand in condition.items()):
+            return False
+    return True
+
+
+class _Collection:
+    """Colección en memoria con las operaciones que usan el borrado de carpetas y la papelera"""
+
+    def __init__(self, docs: list):
+        self.docs = docs
+
+    def find(self, query: dict, projection=None):
+        found = [doc for doc in self.docs if _matches(doc, query)]
+
+        async def each():
+            for doc in found:
+                yield doc
+
+        cursor = MagicMock()
+        cursor.batch_size.return_value = each()
+        return cursor
+
+    async def find_one(self, query: dict):
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+    async def distinct(self, field: str, query: dict):
+        return [doc[field] for doc in self.docs if _matches(doc, query)]
+
+    async def delete_many(self, query: dict):
+        kept = [doc for doc in self.docs if not _matches(doc, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs[:] = kept
+        return MagicMock(deleted_count=deleted)
+
+    async def update_many(self, query: dict, update: dict):
+        matched = [doc for doc in self.docs if _matches(doc, query)]
+        for doc in matched:
+            doc.update(update["$set"])
+        return MagicMock(modified_count=len(matched))
+
+    async def find_one_and_update(self, query: dict, update: dict, return_document=None):
+        doc = await self.find_one(query)
+        if doc is not None:
+            doc.update(update.get("$set", {}))
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+        return doc
+
+
+class TestTrash:
+    """Pruebas de la papelera y su recolector"""
+
+    @pytest.mark.asyncio
+    async def test_restore_returns_file_to_root_when_folder_is_gone(self):
+        gone = ObjectId()
+        trashed = {"_id": ObjectId(), "owner": "ana", "size": 5, "folder_id": gone, "ancestors": [gone]}
+        restored = {**trashed, "folder_id": None, "path": "/", "ancestors": []}
+
+        with (
+            patch("app.services.trash_service.file_collection") as mock_files,
+            patch("app.services.trash_service.folder_collection") as mock_folders,
+            patch("app.services.trash_service.FolderStatsService.adjust", new=AsyncMock()) as adjust,
+            patch("app.services.trash_service.FolderRollupService.apply", new=AsyncMock()),
+        ):
+            mock_files.find_one = AsyncMock(return_value=trashed)
+            mock_files.find_one_and_update = AsyncMock(return_value=restored)
+            mock_folders.find_one = AsyncMock(return_value=None)
+            result = await TrashService.restore_file(str(trashed["_id"]), {"username": "ana"})
+
+        assert result == restored
+        update = mock_files.find_one_and_update.await_args.args[1]
+        assert update["$set"] == {"folder_id": None, "path": "/", "ancestors": []}
+        assert set(update["$unset"]) == {"deleted_at", "purge_at", "trash_claim"}
+        adjust.assert_awaited_once_with(None, "ana", files=1)
+
+    @pytest.mark.asyncio
+    async def test_file_trashed_by_another_request_is_not_counted_twice(self):
+        folder_id = ObjectId()
+        files = [{"_id": ObjectId(), "folder_id": folder_id, "ancestors": [folder_id], "owner": "ana", "size": 5}]
+        files.append({**files[0], "_id": ObjectId()})
+        # Otra petición movió el segundo a la papelera después de que esta lo cargara
+        stored = _Collection([{**files[0], "deleted_at": None}, {**files[1], "deleted_at": datetime.utcnow()}])
+
+        with (
+            patch("app.services.trash_service.file_collection", new=stored),
+            patch("app.services.trash_service.FolderStatsService.adjust_many", new=AsyncMock()) as adjust_many,
+            patch("app.services.trash_service.FolderRollupService.files_changed", new=AsyncMock()) as rollups,
+        ):
+            await TrashService.trash_files(files)
+
+        adjust_many.assert_awaited_once_with({folder_id: {"files": -1}})
+        assert [doc["_id"] for doc in rollups.await_args.args[0]] == [files[0]["_id"]]
+
+    @pytest.mark.asyncio
+    async def test_trashed_file_survives_folder_delete_and_is_restored_to_root(self):
+        folder = {"_id": ObjectId(), "name": "docs", "path": "/docs/", "ancestors": [], "owner": "ana"}
+        now = datetime.utcnow()
+        trashed = {
+            "_id": ObjectId(),
+            "object_name": "blobs/trashed",
+            "folder_id": folder["_id"],
+            "path": "/docs/",
+            "ancestors": [folder["_id"]],
+            "owner": "ana",
+            "size": 5,
+            "deleted_at": now,
+            "purge_at": now + timedelta(days=30),
+        }
+        live = {**trashed, "_id": ObjectId(), "object_name": "blobs/live", "deleted_at": None}
+        del live["purge_at"]
+        files, folders = _Collection([trashed, live]), _Collection([folder])
+
+        with (
+            patch("app.services.folder_service.file_collection", new=files),
+            patch("app.services.folder_service.folder_collection", new=folders),
+            patch("app.services.trash_service.file_collection", new=files),
+            patch("app.services.trash_service.folder_collection", new=folders),
+            patch("app.services.folder_service.BlobService.release_many", new=AsyncMock()) as release_many,
+            patch("app.services.folder_service.FolderStatsService", new=AsyncMock()),
+            patch("app.services.folder_service.FolderRollupService.apply", new=AsyncMock()),
+            patch("app.services.trash_service.FolderStatsService.adjust", new=AsyncMock()),
+            patch("app.services.trash_service.FolderRollupService.apply", new=AsyncMock()),
+        ):
+            summary = await FolderService.delete_folder(str(folder["_id"]), {"username": "ana"})
+            assert [doc["_id"] for doc in files.docs] == [trashed["_id"]]
+            restored = await TrashService.restore_file(str(trashed["_id"]), {"username": "ana"})
+
+        assert (summary["files_deleted"], summary["folders_deleted"], summary["failed"]) == (1, 1, [])
+        # Solo se libera el blob del archivo que no estaba en la papelera
+        assert [list(call.args[0]) for call in release_many.await_args_list] == [["blobs/live"]]
+        assert (restored["folder_id"], restored["path"], restored["ancestors"]) == (None, "/", [])
+        assert "deleted_at" not in restored
+
+    @pytest.mark.asyncio
+    async def test_collector_purges_claimed_batches_with_pauses(self, usage_collection):
+        expired = [
+            {"_id": ObjectId(), "object_name": f"blobs/{n}", "owner": "ana", "size": 10, "file_type": "text/plain"}
+            for n in range(3)
+        ]
+        batches = [expired[:2], expired[2:]]
+
+        def find(query, projection):
+            cursor = MagicMock()
+            if "purge_claim" in query and not isinstance(query["purge_claim"], dict):
+                # Documentos reclamados del lote actual
+                wanted = set(query["_id"]["$in"])
+                cursor.to_list = AsyncMock(return_value=[doc for doc in expired if doc["_id"] in wanted])
+            else:
+                cursor.to_list = AsyncMock(return_value=batches.pop(0) if batches else [])
+            return cursor
+
+        with (
+            patch("app.services.trash_service.file_collection") as mock_files,
+            patch("app.services.trash_service.BlobService.release_many", new=AsyncMock()) as release_many,
+            patch("app.services.trash_service.asyncio.sleep", new=AsyncMock()) as sleep,
+        ):
+            mock_files.find = MagicMock(side_effect=find)
+            mock_files.update_many = AsyncMock()
+            mock_files.delete_many = AsyncMock(side_effect=[MagicMock(deleted_count=2), MagicMock(deleted_count=1)])
+            summary = await TrashService.collect(batch_size=2)
+
+        assert summary == {"purged": 3}
+        assert mock_files.delete_many.await_count == 2
+        assert [list(call.args[0]) for call in release_many.await_args_list] == [
+            ["blobs/0", "blobs/1"],
+            ["blobs/2"],
+        ]
+        # Pausa entre lotes completos, no tras el último
+        sleep.assert_awaited_once()
+        # El uso del usuario se descuenta al purgar, no al mover a la papelera
+        assert (
+            sum(op._doc["$inc"]["bytes"] for call in usage_collection.bulk_write.await_args_list for op in call.args[0])
+            == -30
+        )
@@ -0,0 +1,157 @@
+"""Tests para las sesiones de subida"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.services.upload_session_service import UploadSessionService
+from app.utils.exceptions import InternalServerException, ValidationException
+
+
+class TestUploadSessionParts:
+    """Tests para el cálculo de partes de una sesión de subida"""
+
+    def test_expected_part_size(self):
+        """Test que la última parte recibe el resto del archivo"""
+        session = {"size": 12, "part_size": 5, "total_parts": 3}
+        assert UploadSessionService._expected_part_size(session, 1) == 5
+        assert UploadSessionService._expected_part_size(session, 2) == 5
+        assert UploadSessionService._expected_part_size(session, 3) == 2
+
+
+class TestDirectUploads:
+    """Tests para la verificación de subidas directas con URL prefirmada"""
+
+    async def test_direct_upload_size_mismatch_is_discarded(self):
+        """Test que una subida directa con tamaño distinto al declarado se rechaza y se elimina"""
+        session = {"_id": "s1", "mode": "presigned", "object_name": "obj", "size": 10, "file_type": "text/plain"}
+        stat = MagicMock(size=12, content_type="text/plain", etag="e")
+        with (
+            patch("app.services.upload_session_service.storage") as mock_storage,
+            patch("app.services.upload_session_service.upload_session_collection") as mock_sessions,
+        ):
+            mock_storage.stat_object = AsyncMock(return_value=stat)
+            mock_storage.remove_object = AsyncMock()
+            mock_sessions.delete_one = AsyncMock()
+            with pytest.raises(ValidationException):
+                await UploadSessionService._verify_direct_upload(session)
+            mock_storage.remove_object.assert_awaited_once_with("obj")
+            mock_sessions.delete_one.assert_awaited_once()
+
+    async def test_direct_upload_uses_stored_content_type(self):
+        """Test que se usa el tipo almacenado cuando el declarado es genérico"""
+        session = {"_id": "s1", "mode": "presigned", "object_name": "obj", "size": 10}
+        session["file_type"] = "application/octet-stream"
+        stat = MagicMock(size=10, content_type="image/png", etag="e")
+        with patch("app.services.upload_session_service.storage") as mock_storage:
+            mock_storage.stat_object = AsyncMock(return_value=stat)
+            assert await UploadSessionService._verify_direct_upload(session) == (10, "image/png", "e")
+
+
+class TestCompleteSession:
+    """Tests para la finalización de sesiones de subida"""
+
+    @staticmethod
+    def _session(**fields):
+        return {
+            "_id": ObjectId(),
+            "mode": "presigned",
+            "status": "active",
+            "filename": "a.txt",
+            "object_name": "obj-a.txt",
+            "size": 10,
+            "file_type": "text/plain",
+            "folder_id": None,
+            "path": "/",
+            "ancestors": [],
+            "owner": "ana",
+            **fields,
+        }
+
+    async def test_failed_insert_releases_blob_reference(self):
+        """Test que si no se guardan los metadatos la referencia al blob se devuelve y la sesión se reactiva"""
+        session = self._session()
+        with (
+            patch("app.services.upload_session_service.upload_session_collection") as mock_sessions,
+            patch("app.services.upload_session_service.file_collection") as mock_files,
+            patch("app.services.upload_session_service.BlobService") as mock_blobs,
+            patch.object(
+                UploadSessionService, "_verify_direct_upload", new=AsyncMock(return_value=(10, "text/plain", "e"))
+            ),
+        ):
+            mock_sessions.find_one = AsyncMock(return_value=session)
+            mock_sessions.find_one_and_update = AsyncMock(return_value=session)
+            mock_sessions.update_one = AsyncMock()
+            mock_files.insert_one = AsyncMock(side_effect=Exception("timeout"))
+            mock_blobs.register = AsyncMock()
+            mock_blobs.release = AsyncMock()
+            with pytest.raises(InternalServerException):
+                await UploadSessionService.complete_session(str(session["_id"]), {"username": "ana"})
+
+        mock_blobs.register.assert_awaited_once_with("obj-a.txt", 10, "text/plain")
+        mock_blobs.release.assert_awaited_once_with("obj-a.txt")
+        mock_sessions.update_one.assert_awaited_once_with(
+            {"_id": session["_id"], "status": "completing"}, {"$set": {"status": "active"}}
+        )
+
+    async def test_upload_into_deleted_folder_is_saved_in_root(self):
+        """Test que si la carpeta destino se eliminó durante la subida el archivo se guarda en la raíz"""
+        gone = ObjectId()
+        session = self._session(folder_id=gone, path="/docs/", ancestors=[gone])
+        with (
+            patch("app.services.upload_session_service.upload_session_collection") as mock_sessions,
+            patch("app.services.upload_session_service.folder_collection") as mock_folders,
+            patch("app.services.upload_session_service.file_collection") as mock_files,
+            patch("app.services.upload_session_service.BlobService.register", new=AsyncMock()),
+            patch("app.services.upload_session_service.FolderStatsService.adjust", new=AsyncMock()) as adjust,
+            patch("app.services.upload_session_service.FolderRollupService.apply", new=AsyncMock()) as rollups,
+            patch.object(
+                UploadSessionService, "_verify_direct_upload", new=AsyncMock(return_value=(10, "text/plain", "e"))
+            ),
+        ):
+            mock_sessions.find_one = AsyncMock(return_value=session)
+            mock_sessions.find_one_and_update = AsyncMock(return_value=session)
+            mock_sessions.delete_one = AsyncMock()
+            mock_folders.find_one = AsyncMock(return_value=None)
+            mock_files.insert_one = AsyncMock(return_value=MagicMock(inserted_id=ObjectId()))
+            mock_files.find_one = AsyncMock()
+            await UploadSessionService.complete_session(str(session["_id"]), {"username": "ana"})
+
+        inserted = mock_files.insert_one.await_args.args[0]
+        assert (inserted["folder_id"], inserted["path"], inserted["ancestors"]) == (None, "/", [])
+        adjust.assert_awaited_once_with(None, "ana", files=1)
+        assert gone not in rollups.await_args.args[0]
+
+
+class TestSessionCleanup:
+    """Tests para la limpieza de sesiones caducadas"""
+
+    async def test_stalled_completion_keeps_object_of_saved_file(self):
+        """Test que una finalización interrumpida con archivo guardado solo elimina la sesión"""
+        expired = {"_id": ObjectId(), "mode": "presigned", "object_name": "obj-a"}
+        stalled = {"_id": ObjectId(), "mode": "presigned", "object_name": "obj-b", "status": "completing"}
+
+        def find(query):
+            async def cursor():
+                yield expired if query["status"] == "active" else stalled
+
+            return cursor()
+
+        with (
+            patch("app.services.upload_session_service.upload_session_collection") as mock_sessions,
+            patch("app.services.upload_session_service.file_collection") as mock_files,
+            patch("app.services.upload_session_service.storage") as mock_storage,
+        ):
+            mock_sessions.find = MagicMock(side_effect=find)
+            mock_sessions.delete_one = AsyncMock()
+            mock_files.find_one = AsyncMock(return_value={"_id": ObjectId()})
+            mock_storage.remove_object = AsyncMock()
+            removed = await UploadSessionService.cleanup_stale_sessions()
+
+        assert removed == 2
+        assert mock_sessions.find.call_args_list[0].args[0]["status"] == "active"
+        mock_files.find_one.assert_awaited_once_with({"object_name": "obj-b"}, {"_id": 1})
+        # Solo se borra el objeto de la sesión activa caducada
+        mock_storage.remove_object.assert_awaited_once_with("obj-a")
+        assert mock_sessions.delete_one.await_count == 2
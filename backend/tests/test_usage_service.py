@@ -0,0 +1,60 @@
+"""Tests para el uso de almacenamiento y las cuotas"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.usage_service import UsageService
+
+
+class TestUsage:
+    """Pruebas del uso de almacenamiento y las cuotas por usuario"""
+
+    @pytest.mark.asyncio
+    async def test_file_changes_update_usage_in_one_bulk_write(self, usage_collection):
+        await UsageService.files_removed(
+            [
+                {"owner": "ana", "size": 100, "file_type": "image/png"},
+                {"owner": "ana", "size": 50, "file_type": "text/plain; charset=utf-8"},
+                {"owner": "luis", "size": 7, "file_type": "application/pdf"},
+            ]
+        )
+
+        operations = usage_collection.bulk_write.await_args.args[0]
+        increments = {op._filter["_id"]: op._doc["$inc"] for op in operations}
+        assert increments["ana"] == {
+            "bytes": -150,
+            "files": -2,
+            "by_type.image.bytes": -100,
+            "by_type.image.files": -1,
+            "by_type.text.bytes": -50,
+            "by_type.text.files": -1,
+        }
+        assert increments["luis"]["by_type.application.bytes"] == -7
+
+    @pytest.mark.asyncio
+    async def test_reconcile_rebuilds_usage_from_documents(self, usage_collection):
+        def aggregate(groups):
+            async def cursor(*args, **kwargs):
+                for group in groups:
+                    yield group
+
+            return cursor
+
+        file_groups = [
+            {"_id": {"owner": "ana", "file_type": "image/png"}, "bytes": 10, "files": 2},
+            {"_id": {"owner": "ana", "file_type": "image/jpeg"}, "bytes": 5, "files": 1},
+        ]
+        folder_groups = [{"_id": "ana", "folders": 4}]
+        with (
+            patch("app.services.usage_service.file_collection") as mock_files,
+            patch("app.services.usage_service.folder_collection") as mock_folders,
+        ):
+            mock_files.aggregate = MagicMock(side_effect=aggregate(file_groups))
+            mock_folders.aggregate = MagicMock(side_effect=aggregate(folder_groups))
+            summary = await UsageService.reconcile()
+
+        assert summary == {"users_updated": 1, "users_removed": 0}
+        replacement = usage_collection.bulk_write.await_args.args[0][0]._doc
+        assert (replacement["bytes"], replacement["files"], replacement["folders"]) == (15, 3, 4)
+        assert replacement["by_type"] == {"image": {"bytes": 15, "files": 3}}
@@ -0,0 +1,243 @@
+"""Tests para utilidades del backend"""
+
+import codecs
+import io
+import os
+import zipfile
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+
+from app.utils.cache import TTLCache
+from app.utils.exceptions import RangeNotSatisfiableException, ValidationException
+from app.utils.http import content_disposition, etag_matches, is_not_modified, parse_range, resolve_range
+from app.utils.pagination import check_cursor, cursor_for, decode_cursor, keyset_filter
+from app.utils.search import query_terms, search_fields
+from app.utils.streams import LimitedReader
+from app.utils.text import decode_text
+from app.utils.thumbnails import UnsupportedImageError, render_thumbnails
+from app.utils.zipstream import ZipStream, is_compressed_type
+
+
+class TestLimitedReader:
+    """Tests para el lector con límite de tamaño"""
+
+    def test_counts_bytes_read(self):
+        """Test que cuenta los bytes leídos en varias lecturas"""
+        reader = LimitedReader(io.BytesIO(b"0123456789"), max_size=10)
+        assert reader.read(4) == b"0123"
+        assert reader.read(10) == b"456789"
+        assert reader.read(10) == b""
+        assert reader.bytes_read == 10
+
+    def test_aborts_when_limit_exceeded(self):
+        """Test que aborta la lectura al superar el límite"""
+        reader = LimitedReader(io.BytesIO(b"x" * 20), max_size=8, error_message="demasiado grande")
+        reader.read(8)
+        with pytest.raises(ValidationException) as exc_info:
+            reader.read(8)
+        assert exc_info.value.detail == "demasiado grande"
+
+
+class TestHttpHelpers:
+    """Tests para Range, ETag y peticiones condicionales"""
+
+    def test_parse_range_variants(self):
+        """Test rangos abiertos, cerrados y por sufijo"""
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=990-2000", 1000) == (990, 999)
+
+    def test_parse_range_ignored_when_invalid(self):
+        """Test que los rangos mal formados o múltiples devuelven el recurso completo"""
+        assert parse_range(None, 1000) is None
+        assert parse_range("bytes=0-1,5-9", 1000) is None
+        assert parse_range("items=0-1", 1000) is None
+        assert parse_range("bytes=abc-", 1000) is None
+
+    def test_parse_range_unsatisfiable(self):
+        """Test que un inicio fuera del archivo devuelve 416"""
+        with pytest.raises(RangeNotSatisfiableException) as exc_info:
+            parse_range("bytes=1000-", 1000)
+        assert exc_info.value.status_code == 416
+        assert exc_info.value.headers["Content-Range"] == "bytes */1000"
+
+    def test_etag_matches(self):
+        """Test comparación de ETags fuertes, débiles y comodín"""
+        assert etag_matches('"abc"', "abc")
+        assert etag_matches('W/"abc", "def"', "abc")
+        assert not etag_matches('W/"abc"', "abc", weak=False)
+        assert etag_matches("*", "abc")
+        assert not etag_matches('"xyz"', "abc")
+
+    def test_is_not_modified(self):
+        """Test que If-None-Match tiene prioridad sobre If-Modified-Since"""
+        modified = datetime(2024, 1, 1, 12, 0, 0, 500)
+        since = "Mon, 01 Jan 2024 12:00:00 GMT"
+        assert is_not_modified({"if-none-match": '"abc"'}, "abc", modified)
+        assert not is_not_modified({"if-none-match": '"old"', "if-modified-since": since}, "abc", modified)
+        assert is_not_modified({"if-modified-since": since}, "abc", modified)
+        assert not is_not_modified({"if-modified-since": "Sun, 31 Dec 2023 00:00:00 GMT"}, "abc", modified)
+
+    def test_if_range_mismatch_serves_full_file(self):
+        """Test que un If-Range que no coincide ignora el Range"""
+        modified = datetime(2024, 1, 1)
+        headers = {"range": "bytes=0-9", "if-range": '"old"'}
+        assert resolve_range(headers, 100, "abc", modified) is None
+        headers["if-range"] = '"abc"'
+        assert resolve_range(headers, 100, "abc", modified) == (0, 9)
+
+    def test_content_disposition_non_ascii(self):
+        """Test que los nombres no ASCII se codifican según RFC 6266"""
+        header = content_disposition("año.pdf", inline=True)
+        assert header.startswith('inline; filename="a?o.pdf"')
+        assert "filename*=UTF-8''a%C3%B1o.pdf" in header
+
+
+class TestPagination:
+    """Pruebas de la paginación por cursor"""
+
+    def test_cursor_roundtrip_keeps_types(self):
+        doc = {"_id": ObjectId(), "upload_date": datetime(2024, 5, 1, 12, 30)}
+        data = decode_cursor(cursor_for(doc, "upload_date", sort="upload_date", order="desc"))
+        assert data["id"] == doc["_id"]
+        assert data["value"].replace(tzinfo=None) == doc["upload_date"]
+        assert data["order"] == "desc"
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValidationException):
+            decode_cursor("no-es-un-cursor")
+        with pytest.raises(ValidationException):
+            check_cursor({"id": 1, "sort": "size", "order": "asc"}, "name", "asc")
+
+    def test_keyset_filter(self):
+        after = {"value": "b.txt", "id": 7}
+        assert keyset_filter({"owner": "u"}, "filename", "desc", after) == {
+            "$and": [
+                {"owner": "u"},
+                {"$or": [{"filename": {"$lt": "b.txt"}}, {"filename": "b.txt", "_id": {"$lt": 7}}]},
+            ]
+        }
+        assert keyset_filter({"owner": "u"}, "filename", "asc", None) == {"owner": "u"}
+
+
+class TestSearchTerms:
+    """Pruebas de la normalización de nombres para la búsqueda"""
+
+    def test_search_fields_fold_case_accents_and_split_words(self):
+        fields = search_fields("InformeVentas_Año2024.PDF")
+        assert fields["search_name"] == "informeventas_ano2024.pdf"
+        terms = set(fields["search_terms"])
+        for query in ["informe", "VENTAS", "año", "ano 2024", "pdf", "informeventas"]:
+            assert all(term in terms for term in query_terms(query)), query
+        assert not all(term in terms for term in query_terms("ventas 2023"))
+
+    def test_query_terms_ignore_regex_syntax(self):
+        assert query_terms("(a+)+$ .*") == ["a"]
+        assert query_terms("***") == []
+
+
+class TestTTLCache:
+    """Pruebas de la caché con expiración"""
+
+    def test_ttl_cache_expiry_and_lru(self):
+        cache = TTLCache(maxsize=2, ttl_seconds=10)
+        with patch("app.utils.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            assert cache.get("a") == 1  # "a" pasa a ser la más reciente
+            cache.set("c", 3)
+            assert cache.get("b") is None
+        with patch("app.utils.cache.time.monotonic", return_value=111):
+            assert cache.get("a") is None
+        assert len(cache) == 1
+
+
+class TestZipStream:
+    """Pruebas del ZIP generado en streaming"""
+
+    @staticmethod
+    def _build(zip_stream, entries):
+        chunks = []
+        for name, data in entries:
+            if data is None:
+                chunks.append(zip_stream.add_directory(name))
+                continue
+            chunks.append(zip_stream.start_file(name, datetime(2024, 5, 1, 10, 30), compress=True, size_hint=len(data)))
+            for start in range(0, len(data), 1000):
+                chunks.append(zip_stream.write(data[start : start + 1000]))
+            chunks.append(zip_stream.end_file())
+        chunks.append(zip_stream.finish())
+        return b"".join(chunks)
+
+    @pytest.mark.parametrize("force_zip64", [False, True])
+    def test_archive_is_readable(self, force_zip64):
+        class SmallLimits(ZipStream):
+            ZIP64_LIMIT = 1000
+            ZIP64_COUNT_LIMIT = 2
+
+        data = os.urandom(2000) + b"texto " * 1000
+        zip_stream = SmallLimits() if force_zip64 else ZipStream()
+        archive = self._build(zip_stream, [("docs", None), ("docs/informe año.txt", data), ("vacío.txt", b"")])
+
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ["docs/", "docs/informe año.txt", "vacío.txt"]
+            assert zf.read("docs/informe año.txt") == data
+            assert zf.getinfo("docs/informe año.txt").compress_size < len(data)
+        # El registro de fin ZIP64 solo aparece cuando hace falta
+        assert (b"PK\x06\x06" in archive) is force_zip64
+
+    def test_compressed_types_are_stored(self):
+        assert is_compressed_type("image/jpeg")
+        assert is_compressed_type("application/zip")
+        assert not is_compressed_type("image/svg+xml")
+        assert not is_compressed_type("text/plain; charset=utf-8")
+
+
+class TestThumbnailRendering:
+    """Pruebas de la generación de miniaturas"""
+
+    def test_render_keeps_aspect_ratio_and_alpha(self):
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGBA", (2000, 1000), (255, 0, 0, 128)).save(buffer, "PNG")
+
+        renditions = render_thumbnails(buffer.getvalue(), {"small": 256, "large": 1024})
+
+        sizes = {}
+        for name, content in renditions.items():
+            with Image.open(io.BytesIO(content)) as image:
+                assert image.format == "WEBP"
+                sizes[name] = (image.size, image.mode)
+        assert sizes == {"small": ((256, 128), "RGBA"), "large": ((1024, 512), "RGBA")}
+
+    def test_render_rejects_invalid_images(self):
+        pytest.importorskip("PIL")
+        with pytest.raises(UnsupportedImageError):
+            render_thumbnails(b"no es una imagen", {"small": 256})
+
+
+class TestTextDecoding:
+    """Pruebas de la decodificación de la vista previa de texto"""
+
+    def test_truncated_multibyte_character_is_dropped(self):
+        data = "Año ñandú".encode("utf-8")[:-1]
+        assert decode_text(data, truncated=True) == ("Año ñand", "utf-8")
+
+    def test_encoding_detection(self):
+        assert decode_text("hola".encode("utf-16"), truncated=False) == ("hola", "utf-16")
+        assert decode_text("café".encode("cp1252"), truncated=False) == ("café", "cp1252")
+        assert decode_text("€".encode("iso8859-15"), False, "text/plain; charset=ISO-8859-15") == ("€", "iso8859-15")
+        with pytest.raises(ValidationException):
+            decode_text(b"\x89PNG\r\n\x1a\n\x00\x00", truncated=False)
+
+    def test_invalid_data_after_bom_falls_back(self):
+        text, encoding = decode_text(codecs.BOM_UTF8 + b"abc\xff\xfe", truncated=False)
+        assert (text, encoding) == ("ï»¿abcÿþ", "cp1252")
+        # Un binario que empieza por la BOM de UTF-16 LE no es texto
+        with pytest.raises(ValidationException):
+            decode_text(b"\xff\xfe\x00\xd8\x41\x00", truncated=False)
@@ -0,0 +1,32 @@
+"""Worker de trabajos en segundo plano en un proceso aparte de la API.
+
+Uso: python worker.py [--concurrency N]
+
+Con RUN_JOBS_IN_API=false la API solo encola los trabajos y se ejecutan aquí. Se pueden lanzar varios
+workers sobre la misma base de datos; si uno cae, otro retoma sus trabajos cuando expira el lease.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.indexes import ensure_indexes
+from app.services.job_worker import JobWorker
+
+
+async def main(concurrency: int):
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes()
+    await JobWorker.run(concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python worker.py", description="Worker de trabajos en segundo plano")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY, help="Trabajos en paralelo")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(main(args.concurrency))
+    except KeyboardInterrupt:
+        pass
@@ -36,20 +36,33 @@ export async function register(username, password) {
     return resp.json();
 }
 
-export async function getFolderContent(folderId = 'root') {
-    const response = await authFetch(`${API_URL}/folders/${folderId}/content`);
-    if (!response.ok) throw new Error('Error al cargar el contenido de la carpeta.');
-    return response.json();
+export async function getFolderContent(folderId = 'root', { sort = 'name', order = 'asc', limit = 500 } = {}) {
+    // El backend pagina por cursor: se recorren las páginas hasta que next_cursor es null
+    const content = { folders: [], files: [], folder_id: folderId, total_items: 0 };
+    let cursor = null;
+    do {
+        const params = new URLSearchParams({ sort, order, limit: String(limit), ...(cursor && { cursor }) });
+        const response = await authFetch(`${API_URL}/folders/${folderId}/content?${params}`);
+        if (!response.ok) throw new Error('Error al cargar el contenido de la carpeta.');
+        const page = await response.json();
+        content.folders.push(...page.folders);
+        content.files.push(...page.files);
+        content.total_items = page.total_items;
+        cursor = page.next_cursor;
+    } while (cursor);
+    return content;
 }
 
-export async function searchFiles(term, folderId) {
+export async function searchFiles(term, folderId, filters = {}) {
     const params = new URLSearchParams({
-        search: term,
+        q: term,
         ...(folderId && folderId !== 'root' && { folder_id: folderId }),
+        ...filters,
     });
-    const response = await authFetch(`${API_URL}/files?${params}`);
+    const response = await authFetch(`${API_URL}/search?${params}`);
     if (!response.ok) throw new Error('Error en la búsqueda.');
-    return response.json();
+    const data = await response.json();
+    return data.items;
 }
 
 export async function getFolderDetails(folderId) {
@@ -77,9 +90,34 @@ export async function createFolder(name, parentFolderId) {
     return response.json();
 }
 
+export async function getJob(jobId) {
+    const response = await authFetch(`${API_URL}/jobs/${jobId}`);
+    if (!response.ok) throw new Error('Error al consultar el trabajo');
+    return response.json();
+}
+
+export async function cancelJob(jobId) {
+    const response = await authFetch(`${API_URL}/jobs/${jobId}/cancel`, { method: 'POST' });
+    if (!response.ok) throw new Error('Error al cancelar el trabajo');
+    return response.json();
+}
+
+// Las carpetas grandes se eliminan o copian en segundo plano (202 con el trabajo): se consulta su
+// estado hasta que termina y se devuelve el mismo resumen que la respuesta síncrona
+async function waitForJob(job, intervalMs = 1000) {
+    while (!['completed', 'failed', 'cancelled'].includes(job.status)) {
+        await new Promise((resolve) => setTimeout(resolve, intervalMs));
+        job = await getJob(job._id);
+    }
+    if (job.status === 'failed') throw new Error(job.error || 'La operación ha fallado');
+    if (job.status === 'cancelled') throw new Error('La operación se ha cancelado');
+    return job.result;
+}
+
 export async function deleteFolder(folderId) {
     const response = await authFetch(`${API_URL}/folders/${folderId}`, { method: 'DELETE' });
     if (!response.ok) throw new Error('Error al eliminar la carpeta.');
+    if (response.status === 202) return waitForJob(await response.json());
     // Las respuestas 204 No Content no tienen JSON
     if (response.status === 204) return {};
     return response.json();
@@ -130,6 +168,115 @@ export function uploadFileWithProgress(file, folderId, onProgress) {
     });
 }
 
+export function uploadFilesWithProgress(files, folderId, onProgress) {
+    // Varios archivos en una sola petición; el backend devuelve el resultado de cada uno
+    return new Promise((resolve, reject) => {
+        const xhr = new XMLHttpRequest();
+        const formData = new FormData();
+
+        for (const file of files) formData.append('files', file);
+        if (folderId && folderId !== 'root') formData.append('folder_id', folderId);
+
+        xhr.upload.addEventListener('progress', (e) => {
+            if (e.lengthComputable) onProgress(Math.round((e.loaded / e.total) * 100));
+        });
+
+        xhr.addEventListener('load', () => {
+            let response = {};
+            try {
+                response = JSON.parse(xhr.responseText);
+            } catch {
+                reject(new Error(`HTTP Error ${xhr.status}: ${xhr.statusText}`));
+                return;
+            }
+            if (xhr.status >= 200 && xhr.status < 300) resolve(response);
+            else reject(new Error(response.detail || `Error ${xhr.status}: ${xhr.statusText}`));
+        });
+
+        xhr.addEventListener('error', () => reject(new Error('Error de red durante la subida')));
+        xhr.addEventListener('abort', () => reject(new Error('Subida cancelada')));
+
+        xhr.open('POST', `${API_URL}/files/upload-many`);
+        const token = get(authToken);
+        if (token) xhr.setRequestHeader('Authorization', `Bearer ${token}`);
+        xhr.send(formData);
+    });
+}
+
+async function uploadPartWithRetry(sessionId, partNumber, blob, retries = 3) {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const resp = await authFetch(`${API_URL}/uploads/${sessionId}/parts/${partNumber}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: blob,
+            });
+            if (resp.ok) return resp.json();
+            // Los errores de validación no se resuelven reintentando
+            if (resp.status < 500) {
+                const err = await resp.json().catch(() => ({}));
+                throw Object.assign(new Error(err.detail || `Error ${resp.status}`), { fatal: true });
+            }
+            throw new Error(`Error ${resp.status} al subir la parte ${partNumber}`);
+        } catch (error) {
+            if (error.fatal || attempt >= retries) throw error;
+            await new Promise((r) => setTimeout(r, 1000 * attempt));
+        }
+    }
+}
+
+export async function uploadFileResumable(file, folderId, onProgress, { concurrency = 3, sessionId = null } = {}) {
+    let session;
+    if (sessionId) {
+        const resp = await authFetch(`${API_URL}/uploads/${sessionId}`);
+        if (!resp.ok) throw new Error('No se pudo reanudar la subida');
+        session = await resp.json();
+    } else {
+        const resp = await authFetch(`${API_URL}/uploads`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                filename: file.name,
+                size: file.size,
+                content_type: file.type || null,
+                folder_id: folderId && folderId !== 'root' ? folderId : null,
+            }),
+        });
+        if (!resp.ok) {
+            const err = await resp.json().catch(() => ({}));
+            throw new Error(err.detail || 'Error al iniciar la subida');
+        }
+        session = await resp.json();
+    }
+
+    const done = new Set(session.uploaded_parts.map((p) => p.part_number));
+    const pending = [];
+    for (let n = 1; n <= session.total_parts; n++) if (!done.has(n)) pending.push(n);
+
+    let uploadedBytes = session.uploaded_parts.reduce((acc, p) => acc + p.size, 0);
+    const report = () => onProgress(file.size ? Math.round((uploadedBytes / file.size) * 100) : 100);
+    report();
+
+    const worker = async () => {
+        while (pending.length > 0) {
+            const partNumber = pending.shift();
+            const start = (partNumber - 1) * session.part_size;
+            const blob = file.slice(start, Math.min(start + session.part_size, file.size));
+            await uploadPartWithRetry(session._id, partNumber, blob);
+            uploadedBytes += blob.size;
+            report();
+        }
+    };
+    await Promise.all(Array.from({ length: Math.min(concurrency, pending.length) }, worker));
+
+    const resp = await authFetch(`${API_URL}/uploads/${session._id}/complete`, { method: 'POST' });
+    if (!resp.ok) {
+        const err = await resp.json().catch(() => ({}));
+        throw new Error(err.detail || 'Error al completar la subida');
+    }
+    return resp.json();
+}
+
 export async function deleteFile(fileId) {
     const response = await authFetch(`${API_URL}/files/delete/${fileId}`, { method: 'DELETE' });
     if (!response.ok) throw new Error('Error al eliminar el archivo.');
@@ -138,6 +285,24 @@ export async function deleteFile(fileId) {
     return response.json();
 }
 
+export async function getTrash() {
+    const response = await authFetch(`${API_URL}/trash`);
+    if (!response.ok) throw new Error('Error al cargar la papelera');
+    return response.json();
+}
+
+export async function restoreFile(fileId) {
+    const response = await authFetch(`${API_URL}/trash/${fileId}/restore`, { method: 'POST' });
+    if (!response.ok) throw new Error('Error al restaurar el archivo');
+    return response.json();
+}
+
+export async function emptyTrash() {
+    const response = await authFetch(`${API_URL}/trash`, { method: 'DELETE' });
+    if (!response.ok) throw new Error('Error al vaciar la papelera');
+    return response.json();
+}
+
 export async function renameFile(fileId, newFilename) {
     const response = await authFetch(`${API_URL}/files/edit/${fileId}`, {
         method: 'PUT',
@@ -152,11 +317,10 @@ export async function renameFile(fileId, newFilename) {
 }
 
 export async function downloadFile(fileId, filename) {
-    const resp = await authFetch(`${API_URL}/files/download/${fileId}`);
+    // La descarga va directamente al almacenamiento con una URL prefirmada de corta duración
+    const resp = await authFetch(`${API_URL}/files/${fileId}/download-url`);
     if (!resp.ok) throw new Error('Error al descargar el archivo');
-
-    const blob = await resp.blob();
-    const url = URL.createObjectURL(blob);
+    const { url } = await resp.json();
 
     const a = document.createElement('a');
     a.href = url;
@@ -164,12 +328,55 @@ export async function downloadFile(fileId, filename) {
     document.body.appendChild(a);
     a.click();
     document.body.removeChild(a);
+}
 
+async function saveBlob(response, filename) {
+    const blob = await response.blob();
+    const url = URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = filename;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
     URL.revokeObjectURL(url);
 }
 
+export async function downloadFolderArchive(folderId, folderName) {
+    // El ZIP se genera en streaming en el servidor mientras se descarga
+    const response = await authFetch(`${API_URL}/folders/${folderId}/archive`);
+    if (!response.ok) throw new Error('Error al descargar la carpeta');
+    await saveBlob(response, `${folderName}.zip`);
+}
+
+export async function downloadSelectionArchive(fileIds, folderIds) {
+    const response = await authFetch(`${API_URL}/batch/archive`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ file_ids: fileIds, folder_ids: folderIds }),
+    });
+    if (!response.ok) throw new Error('Error al descargar la selección');
+    await saveBlob(response, 'archivos.zip');
+}
+
+// Miniatura WebP generada por el backend; el navegador la cachea (Cache-Control immutable)
+export async function getFileThumbnail(fileId, size = 'small') {
+    const resp = await authFetch(`${API_URL}/files/${fileId}/thumbnail?size=${size}`);
+    if (!resp.ok) throw new Error('Miniatura no disponible');
+    const blob = await resp.blob();
+    return URL.createObjectURL(blob);
+}
+
 export async function getFilePreviewContent(file) {
     const fileType = file.file_type.toLowerCase();
+    if (fileType.startsWith('image/')) {
+        // La miniatura grande basta para la vista previa; si no existe (SVG, imagen inválida) se usa el original
+        try {
+            return await getFileThumbnail(file._id, 'large');
+        } catch (error) {
+            // Se descarga el original
+        }
+    }
     if (fileType.startsWith('image/') || fileType === 'application/pdf') {
         const resp = await authFetch(`${API_URL}/files/download/${file._id}?inline=true`);
         if (!resp.ok) throw new Error('No se pudo cargar la vista previa');
@@ -177,9 +384,12 @@ export async function getFilePreviewContent(file) {
         return URL.createObjectURL(blob);
     }
     if (fileType.startsWith('text/') || fileType.includes('json') || fileType.includes('javascript')) {
-        const resp = await authFetch(`${API_URL}/files/download/${file._id}`);
+        // Solo el comienzo del archivo; el backend decodifica y recorta en un límite de carácter
+        const resp = await authFetch(`${API_URL}/files/${file._id}/preview`);
         if (!resp.ok) throw new Error('Error al cargar el archivo');
-        return resp.text();
+        const preview = await resp.json();
+        if (!preview.truncated) return preview.text;
+        return `${preview.text}\n\n… Vista previa parcial: descarga el archivo para verlo completo (${preview.size} bytes)`;
     }
     throw new Error('Tipo de archivo no soportado para previsualización');
 }
@@ -221,6 +431,40 @@ export async function copyFolder(folderId, targetFolderId) {
         body: JSON.stringify({ parent_folder_id: targetFolderId }),
     });
     if (!response.ok) throw new Error('Error al copiar carpeta');
+    if (response.status === 202) return waitForJob(await response.json());
+    return response.json();
+}
+
+async function batchRequest(action, body) {
+    // Una sola petición para toda la selección; el backend devuelve el resultado de cada elemento
+    const response = await authFetch(`${API_URL}/batch/${action}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || 'Error en la operación en lote');
+    }
+    return response.json();
+}
+
+export async function batchMove(fileIds, folderIds, targetFolderId) {
+    return batchRequest('move', { file_ids: fileIds, folder_ids: folderIds, destination_folder_id: targetFolderId });
+}
+
+export async function batchCopy(fileIds, folderIds, targetFolderId) {
+    return batchRequest('copy', { file_ids: fileIds, folder_ids: folderIds, destination_folder_id: targetFolderId });
+}
+
+export async function batchDelete(fileIds, folderIds) {
+    return batchRequest('delete', { file_ids: fileIds, folder_ids: folderIds });
+}
+
+// Espacio usado por el usuario actual: un solo documento en el backend
+export async function getUsage() {
+    const response = await authFetch(`${API_URL}/usage`);
+    if (!response.ok) throw new Error('Error al cargar el uso de almacenamiento');
     return response.json();
 }
 
@@ -6,6 +6,7 @@ export const successMessage = writable('');
 export const uploadProgress = writable(null);
 export const viewMode = writable('list'); // 'list' or 'grid'
 export const showCreateFolder = writable(false);
+export const showTrash = writable(false);
 
 // Preview Modal
 export const showPreview = writable(false);